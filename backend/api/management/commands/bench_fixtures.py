@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from connections.models import Connection
+from dashboards.models import Dashboard, DashboardItem
+from queries.models import Query
+from visualizations.models import Visualization
+
+User = get_user_model()
+
+REGIONS = ['north', 'south', 'east', 'west', 'central']
+REGION_WEIGHTS = [0.3, 0.25, 0.2, 0.15, 0.1]
+CHANNELS = ['web', 'mobile', 'store', 'partner']
+CHANNEL_WEIGHTS = [0.45, 0.3, 0.2, 0.05]
+PRODUCTS = 500
+CUSTOMERS = 100000
+DAYS = 730
+
+# (name, sql, visualization type, visualization config) for each saved query
+QUERY_TEMPLATES = [
+    ('Daily revenue', 'SELECT date(created_at) AS day, amount FROM orders',
+     'line', {'xAxis': 'day', 'yAxis': ['amount'], 'aggregation': 'sum', 'sortBy': 'day'}),
+    ('Revenue by region', 'SELECT region, channel, amount FROM orders',
+     'bar', {'xAxis': 'region', 'yAxis': ['amount'], 'groupBy': 'channel', 'aggregation': 'sum'}),
+    ('Top products', 'SELECT product, quantity FROM orders',
+     'horizontal_bar', {'xAxis': 'product', 'yAxis': ['quantity'], 'aggregation': 'sum',
+                        'sortBy': 'quantity', 'sortOrder': 'desc', 'limit': 20}),
+    ('Channel share', 'SELECT channel, id FROM orders',
+     'pie', {'xAxis': 'channel', 'yAxis': ['id'], 'aggregation': 'count'}),
+    ('Order size', 'SELECT quantity, amount FROM orders WHERE id % 50 = 0',
+     'scatter', {'xAxis': 'quantity', 'yAxis': ['amount']}),
+    ('Recent orders', 'SELECT * FROM orders ORDER BY id DESC LIMIT 1000',
+     'table', {}),
+]
+
+
+def write_source_database(path, rows, seed, chunk_size=200000):
+    """Write an ``orders`` table of ``rows`` synthetic sales to a fresh SQLite file"""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2023-01-01T00:00:00')
+    db = sqlite3.connect(path)
+    try:
+        db.execute('PRAGMA journal_mode = OFF')
+        db.execute('PRAGMA synchronous = OFF')
+        db.execute("""
+            CREATE TABLE orders (
+                id INTEGER PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                region TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                product TEXT NOT NULL,
+                customer_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                amount REAL NOT NULL
+            )
+        """)
+        for offset in range(0, rows, chunk_size):
+            size = min(chunk_size, rows - offset)
+            seconds = np.sort(rng.integers(0, DAYS * 86400, size))
+            created_at = (start + seconds.astype('timedelta64[s]')).astype(str)
+            regions = rng.choice(REGIONS, size, p=REGION_WEIGHTS)
+            channels = rng.choice(CHANNELS, size, p=CHANNEL_WEIGHTS)
+            # A few products and customers account for most orders
+            products = np.minimum(rng.zipf(1.3, size), PRODUCTS)
+            customers = np.minimum(rng.zipf(1.1, size), CUSTOMERS)
+            quantities = rng.geometric(0.4, size)
+            amounts = np.round(quantities * rng.lognormal(3, 0.8, size), 2)
+            db.executemany('INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)', zip(
+                range(offset + 1, offset + size + 1), created_at.tolist(), regions.tolist(), channels.tolist(),
+                [f'product-{product}' for product in products.tolist()], customers.tolist(),
+                quantities.tolist(), amounts.tolist()
+            ))
+        db.execute('CREATE INDEX orders_created_at ON orders (created_at)')
+        db.execute('CREATE INDEX orders_region ON orders (region)')
+        db.execute('ANALYZE')
+        db.commit()
+    finally:
+        db.close()
+
+
+class Command(BaseCommand):
+    help = 'Generate benchmark fixtures: users, connections, queries, visualizations, dashboards and source databases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--connections-per-user', type=int, default=2)
+        parser.add_argument('--queries-per-connection', type=int, default=6)
+        parser.add_argument('--dashboards-per-user', type=int, default=3)
+        parser.add_argument('--items-per-dashboard', type=int, default=12)
+        parser.add_argument('--source-databases', type=int, default=4, help='SQLite files shared by the connections')
+        parser.add_argument('--rows', type=int, default=2000000, help='Rows per source database')
+        parser.add_argument('--output', default=str(settings.BASE_DIR / 'bench'),
+                            help='Directory for source databases and the fixture manifest')
+        parser.add_argument('--prefix', default='bench', help='Email prefix of the generated users')
+        parser.add_argument('--password', default='bench-password', help='Password of every generated user')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Delete users generated by an earlier run first')
+        parser.add_argument('--skip-sources', action='store_true', help='Keep existing source databases')
+
+    def handle(self, *args, **options):
+        output = os.path.abspath(options['output'])
+        os.makedirs(output, exist_ok=True)
+        prefix = options['prefix']
+        rng = np.random.default_rng(options['seed'])
+
+        if options['clear']:
+            deleted, _ = User.objects.filter(email__startswith=f'{prefix}-', email__endswith='@example.com').delete()
+            self.stdout.write(f'Deleted {deleted} objects from an earlier run')
+
+        sources = [os.path.join(output, f'source_{index}.sqlite3') for index in range(options['source_databases'])]
+        for index, path in enumerate(sources):
+            if options['skip_sources'] and os.path.exists(path):
+                continue
+            started = time.monotonic()
+            write_source_database(path, options['rows'], options['seed'] + index)
+            self.stdout.write(f"Wrote {options['rows']:,} rows to {path} in {time.monotonic() - started:.1f}s")
+
+        started = time.monotonic()
+        counts = self.create_fixtures(options, sources, rng)
+        self.stdout.write(f'Created fixtures in {time.monotonic() - started:.1f}s')
+
+        manifest = {
+            'prefix': prefix,
+            'password': options['password'],
+            'users': options['users'],
+            'rowsPerSource': options['rows'],
+            'sources': sources,
+            'counts': counts,
+        }
+        manifest_path = os.path.join(output, 'fixtures.json')
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{count:,} {name}' for name, count in counts.items()) + f'; manifest in {manifest_path}'
+        ))
+
+    @transaction.atomic
+    def create_fixtures(self, options, sources, rng):
+        prefix = options['prefix']
+        # Hashing once keeps thousands of users fast to create; they all share the password
+        password = make_password(options['password'])
+        users = [
+            User(username=f'{prefix}-{index}@example.com', email=f'{prefix}-{index}@example.com',
+                 name=f'Bench User {index}', password=password)
+            for index in range(options['users'])
+        ]
+        User.objects.bulk_create(users, batch_size=1000)
+
+        connections, queries, visualizations, dashboards, items = [], [], [], [], []
+        for user_index, user in enumerate(users):
+            user_visualizations = []
+            for connection_index in range(options['connections_per_user']):
+                connection = Connection(
+                    user=user, name=f'Warehouse {connection_index}', type='sqlite',
+                    database=sources[(user_index + connection_index) % len(sources)]
+                )
+                connections.append(connection)
+                for query_index in range(options['queries_per_connection']):
+                    name, sql, chart_type, config = QUERY_TEMPLATES[query_index % len(QUERY_TEMPLATES)]
+                    query = Query(user=user, connection=connection, name=f'{name} {query_index}', sql=sql)
+                    queries.append(query)
+                    visualization = Visualization(query=query, name=name, type=chart_type, config=config)
+                    visualizations.append(visualization)
+                    user_visualizations.append(visualization)
+
+            for dashboard_index in range(options['dashboards_per_user']):
+                dashboard = Dashboard(user=user, name=f'Dashboard {dashboard_index}')
+                dashboards.append(dashboard)
+                chosen = rng.choice(len(user_visualizations), options['items_per_dashboard'])
+                for position, visualization_index in enumerate(chosen.tolist()):
+                    items.append(DashboardItem(
+                        dashboard=dashboard, visualization=user_visualizations[visualization_index],
+                        position={'x': (position % 2) * 6, 'y': (position // 2) * 4, 'w': 6, 'h': 4}
+                    ))
+
+        for model, objects in ((Connection, connections), (Query, queries), (Visualization, visualizations),
+                               (Dashboard, dashboards), (DashboardItem, items)):
+            model.objects.bulk_create(objects, batch_size=1000)
+
+        return {
+            'users': len(users),
+            'connections': len(connections),
+            'queries': len(queries),
+            'visualizations': len(visualizations),
+            'dashboards': len(dashboards),
+            'dashboardItems': len(items),
+        }
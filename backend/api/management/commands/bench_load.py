@@ -0,0 +1,366 @@
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import django
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import Client
+
+from dashboards.models import Dashboard
+from queries.models import Query
+
+User = get_user_model()
+
+SCENARIOS = ('login', 'list', 'dashboard', 'execute')
+LIST_PATHS = ('/api/connections/', '/api/queries/', '/api/visualizations/', '/api/dashboards/')
+PERCENTILES = (50, 90, 95, 99)
+# Compared against a baseline: (result key, label, whether higher is better)
+COMPARED = (('rps', 'rps', True), ('latencyMs.p50', 'p50', False), ('latencyMs.p95', 'p95', False),
+            ('latencyMs.p99', 'p99', False), ('peakRssBytes', 'peak RSS', False))
+
+
+class InProcessTransport:
+    """Requests through Django's test client, in this process"""
+
+    def __init__(self):
+        self.client = Client(HTTP_HOST=next((host for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost'))
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        response = self.client.generic(
+            method, path, json.dumps(body) if body is not None else '', content_type='application/json', **headers
+        )
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, content
+
+    def close(self):
+        close_old_connections()
+
+
+class HttpTransport:
+    """Requests to a running server over one keep-alive connection"""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(url.netloc, timeout=300)
+        self.prefix = url.path.rstrip('/')
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = json.dumps(body).encode() if body is not None else None
+        try:
+            self.connection.request(method, self.prefix + path, payload, headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # The server closed an idle keep-alive connection; reconnect once
+            self.connection.close()
+            self.connection.request(method, self.prefix + path, payload, headers)
+            response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def close(self):
+        self.connection.close()
+
+
+def read_peak_rss(pid):
+    """Peak resident set size of ``pid`` in bytes, or None when it can't be read"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if pid == os.getpid():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Kilobytes on Linux
+    return None
+
+
+def reset_peak_rss(pid):
+    """Restart peak RSS tracking for ``pid`` so each run reports its own peak (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize_latencies(latencies):
+    if not latencies:
+        return None
+    values = np.asarray(latencies) * 1000
+    summary = {f'p{percentile}': value for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    summary['mean'] = values.mean()
+    summary['max'] = values.max()
+    return {key: round(float(value), 2) for key, value in summary.items()}
+
+
+def lookup(result, path):
+    for key in path.split('.'):
+        result = (result or {}).get(key)
+    return result
+
+
+class Command(BaseCommand):
+    help = ('Drive the login, list, dashboard and execute endpoints at set concurrency levels and '
+            'write throughput, latency percentiles and peak RSS to a JSON report')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fixtures', default=str(settings.BASE_DIR / 'bench' / 'fixtures.json'),
+                            help='Manifest written by bench_fixtures')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma-separated, from: {', '.join(SCENARIOS)}")
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated concurrency levels')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds per scenario and concurrency level')
+        parser.add_argument('--requests', type=int,
+                            help='Requests per scenario and concurrency level, instead of --duration')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per worker before each run')
+        parser.add_argument('--refresh', action='store_true', help='Bypass the result cache in the execute scenario')
+        parser.add_argument('--base-url', help='Target a running server (e.g. http://localhost:8000) instead of '
+                                               'calling the app in this process')
+        parser.add_argument('--server-pid', type=int, action='append', default=[],
+                            help="Server process whose peak RSS is reported; repeat for each worker. "
+                                 "Defaults to this process when running in-process")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Report path; defaults to bench/results-<timestamp>.json')
+        parser.add_argument('--baseline', help='Earlier report to compare against')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        if not options['base_url'] and not options['server_pid']:
+            options['server_pid'] = [os.getpid()]
+
+        try:
+            with open(options['fixtures']) as f:
+                manifest = json.load(f)
+        except OSError:
+            raise CommandError(f"No fixture manifest at {options['fixtures']}; run bench_fixtures first")
+
+        self.options = options
+        self.password = manifest['password']
+        self.targets = self.load_targets(manifest['prefix'], max(levels), random.Random(options['seed']))
+
+        started_at = datetime.now(timezone.utc)
+        results = []
+        for scenario in scenarios:
+            for concurrency in levels:
+                result = self.run(scenario, concurrency)
+                results.append(result)
+                latency = result['latencyMs'] or {}
+                self.stdout.write(
+                    f"{scenario:<10} c={concurrency:<4} {result['requests']:>7} req {result['errors']:>5} err "
+                    f"{result['rps']:>9.1f} rps  p50 {latency.get('p50', 0):>8.1f}ms  "
+                    f"p95 {latency.get('p95', 0):>8.1f}ms  p99 {latency.get('p99', 0):>8.1f}ms"
+                )
+
+        report = {
+            'startedAt': started_at.isoformat(),
+            'gitCommit': get_git_commit(),
+            'target': options['base_url'] or 'in-process',
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'cpuCount': os.cpu_count(),
+            'fixtures': manifest['counts'],
+            'rowsPerSource': manifest['rowsPerSource'],
+            'options': {key: options[key] for key in ('duration', 'requests', 'warmup', 'refresh', 'seed')},
+            'results': results,
+        }
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                report['comparison'] = self.compare(json.load(f), results)
+
+        output = options['output'] or str(
+            settings.BASE_DIR / 'bench' / f"results-{started_at.strftime('%Y%m%dT%H%M%S')}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {output}'))
+
+    def load_targets(self, prefix, count, rng):
+        """Pick ``count`` generated users along with their dashboards and parameterless queries"""
+        emails = list(
+            User.objects.filter(email__startswith=f'{prefix}-', email__endswith='@example.com')
+            .values_list('email', flat=True)
+        )
+        if not emails:
+            raise CommandError(f'No fixture users with the prefix {prefix!r}; run bench_fixtures first')
+        targets = []
+        for email in rng.sample(emails, min(count, len(emails))):
+            targets.append({
+                'email': email,
+                'dashboards': [
+                    str(pk) for pk in Dashboard.objects.filter(user__email=email).values_list('id', flat=True)
+                ],
+                'queries': [
+                    str(pk) for pk, parameters in
+                    Query.objects.filter(user__email=email).values_list('id', 'parameters')
+                    if not any(parameter.get('required') for parameter in parameters or [])
+                ],
+            })
+        close_old_connections()
+        return targets
+
+    def make_transport(self):
+        if self.options['base_url']:
+            return HttpTransport(self.options['base_url'])
+        return InProcessTransport()
+
+    def login(self, transport, target):
+        status, content = transport.request('POST', '/api/auth/login', {
+            'email': target['email'], 'password': self.password
+        })
+        if status != 200:
+            raise CommandError(f"Login failed for {target['email']} with status {status}: {content[:200]!r}")
+        return json.loads(content)['data']['token']
+
+    def next_request(self, scenario, target, rng):
+        """(method, path, body) of one request in ``scenario``"""
+        if scenario == 'login':
+            return 'POST', '/api/auth/login', {'email': target['email'], 'password': self.password}
+        if scenario == 'list':
+            return 'GET', rng.choice(LIST_PATHS), None
+        if scenario == 'dashboard':
+            return 'GET', f"/api/dashboards/{rng.choice(target['dashboards'])}/", None
+        body = {'refresh': True} if self.options['refresh'] else {}
+        return 'POST', f"/api/queries/{rng.choice(target['queries'])}/execute/", body
+
+    def run(self, scenario, concurrency):
+        """Run ``scenario`` with ``concurrency`` workers; each worker is one user"""
+        budget = self.options['requests']
+        counter = iter(range(budget)) if budget else None
+        counter_lock = threading.Lock()
+        ready = threading.Barrier(concurrency + 1)
+        start = threading.Event()
+        latencies = [[] for _ in range(concurrency)]
+        errors = [0] * concurrency
+        statuses = [Counter() for _ in range(concurrency)]
+        failures = []
+
+        def claim():
+            if counter is None:
+                return time.monotonic() < deadline
+            with counter_lock:
+                return next(counter, None) is not None
+
+        def worker(index):
+            target = self.targets[index % len(self.targets)]
+            rng = random.Random(self.options['seed'] + index)
+            transport = self.make_transport()
+            try:
+                token = self.login(transport, target)
+                for _ in range(self.options['warmup']):
+                    method, path, body = self.next_request(scenario, target, rng)
+                    transport.request(method, path, body, token)
+            except Exception as e:
+                failures.append(e)
+                ready.abort()
+                transport.close()
+                return
+            ready.wait()
+            start.wait()
+            try:
+                while claim():
+                    method, path, body = self.next_request(scenario, target, rng)
+                    began = time.monotonic()
+                    try:
+                        status, _ = transport.request(method, path, body, token)
+                    except Exception:
+                        status = 'exception'
+                    latencies[index].append(time.monotonic() - began)
+                    statuses[index][status] += 1
+                    if status == 'exception' or status >= 400:
+                        errors[index] += 1
+            finally:
+                transport.close()
+
+        threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            ready.wait()
+        except threading.BrokenBarrierError:
+            for thread in threads:
+                thread.join()
+            raise CommandError(f'{scenario} setup failed: {failures[0]}')
+
+        for pid in self.options['server_pid']:
+            reset_peak_rss(pid)
+        began = time.monotonic()
+        deadline = began + self.options['duration']
+        start.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - began
+
+        peaks = {str(pid): read_peak_rss(pid) for pid in self.options['server_pid']}
+        known = [peak for peak in peaks.values() if peak is not None]
+        merged = [latency for worker_latencies in latencies for latency in worker_latencies]
+        status_counts = sum(statuses, Counter())
+        return {
+            'scenario': scenario,
+            'concurrency': concurrency,
+            'requests': len(merged),
+            'errors': sum(errors),
+            'statuses': {str(status): count for status, count in sorted(status_counts.items(), key=str)},
+            'durationSeconds': round(elapsed, 3),
+            'rps': round(len(merged) / elapsed, 2) if elapsed else 0,
+            'latencyMs': summarize_latencies(merged),
+            'peakRssBytes': max(known) if known else None,
+            'peakRssByPid': peaks,
+        }
+
+    def compare(self, baseline, results):
+        """Percentage change of each result from the baseline run at the same scenario and concurrency"""
+        previous = {(result['scenario'], result['concurrency']): result for result in baseline['results']}
+        comparison = []
+        self.stdout.write(f"Compared with {baseline.get('gitCommit') or 'baseline'} ({baseline.get('startedAt')}):")
+        for result in results:
+            before = previous.get((result['scenario'], result['concurrency']))
+            if before is None:
+                continue
+            changes = {}
+            for key, label, higher_is_better in COMPARED:
+                old, new = lookup(before, key), lookup(result, key)
+                if old and new is not None:
+                    changes[label] = {
+                        'baseline': old, 'current': new, 'changePercent': round((new - old) / old * 100, 1),
+                        'improved': new > old if higher_is_better else new < old,
+                    }
+            comparison.append({
+                'scenario': result['scenario'], 'concurrency': result['concurrency'], 'changes': changes
+            })
+            self.stdout.write(f"  {result['scenario']:<10} c={result['concurrency']:<4} " + '  '.join(
+                f"{label} {change['changePercent']:+.1f}%" for label, change in changes.items()
+            ))
+        return comparison
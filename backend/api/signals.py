@@ -0,0 +1,33 @@
+"""User model signal handlers"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+from vizly.metadata import invalidate_metadata, invalidate_metadata_entries
+
+# Fields that decide whether, and as what, a user is authenticated. Saves
+# limited to other fields, such as the last_login update on every sign-in,
+# only drop the cached user, keeping the rest of their metadata.
+AUTH_FIELDS = {'password', 'is_active', 'is_staff', 'is_superuser', 'role'}
+
+
+@receiver(post_save, sender=User)
+def invalidate_metadata_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or AUTH_FIELDS & set(update_fields):
+        invalidate_metadata(instance.pk)
+    else:
+        invalidate_metadata_entries(instance.pk, [('user', instance.pk)])
+
+
+@receiver(post_delete, sender=User)
+def invalidate_metadata_on_delete(sender, instance, **kwargs):
+    invalidate_metadata(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_metadata_on_permission_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # Reverse changes (group.user_set.add(user)) list the users in pk_set
+        for user_id in (pk_set or ()) if reverse else [instance.pk]:
+            invalidate_metadata(user_id)
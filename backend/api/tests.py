@@ -0,0 +1,98 @@
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import Group, update_last_login
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import CachedJWTAuthentication
+from dashboards.models import DashboardItem
+from queries.views import get_user_query
+from vizly.testing import TEST_CACHES, VizlyTestCase
+
+
+@override_settings(METADATA_CACHE_TTL=60)
+class CachedJWTAuthenticationTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.auth = CachedJWTAuthentication()
+        self.token = AccessToken.for_user(self.user)
+        self.query = self.create_query(self.create_source())
+
+    def test_cached_user_leaves_out_the_password_hash(self):
+        self.auth.get_user(self.token)
+        with self.assertNumQueries(0):
+            user = self.auth.get_user(self.token)
+        self.assertEqual(user, self.user)
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertNotIn(self.user.password.encode(), pickle.dumps(user))
+
+    def test_sign_ins_only_drop_the_cached_user(self):
+        self.auth.get_user(self.token)
+        get_user_query(self.user, self.query.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.user)
+
+        with self.assertNumQueries(0):
+            get_user_query(self.user, self.query.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.auth.get_user(self.token).last_login, self.user.last_login)
+
+    def test_authorization_changes_retire_the_metadata(self):
+        get_user_query(self.user, self.query.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(Group.objects.create(name='analysts'))
+        with self.assertNumQueries(1):
+            get_user_query(self.user, self.query.pk)
+
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['is_active'])
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+
+# Transactional, so bench_load's worker threads see the fixtures
+@override_settings(CACHES=TEST_CACHES, QUERY_RUN_HISTORY=False, METADATA_CACHE_TTL=0)
+class BenchCommandTests(TransactionTestCase):
+    def setUp(self):
+        self.output = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.output, ignore_errors=True)
+        self.call('bench_fixtures', users=2, rows=50, source_databases=1, dashboards_per_user=1,
+                  items_per_dashboard=3, output=str(self.output))
+
+    def call(self, name, **options):
+        with open(os.devnull, 'w') as devnull:
+            call_command(name, stdout=devnull, **options)
+
+    def test_fixtures(self):
+        manifest = json.loads((self.output / 'fixtures.json').read_text())
+        self.assertEqual(manifest['counts']['queries'], 24)
+        self.assertEqual(DashboardItem.objects.count(), 6)
+        with sqlite3.connect(manifest['sources'][0]) as db:
+            self.assertEqual(db.execute('SELECT count(*) FROM orders').fetchone(), (50,))
+        db.close()
+
+    def test_load(self):
+        report_path = self.output / 'report.json'
+        self.call('bench_load', fixtures=str(self.output / 'fixtures.json'), scenarios='list,execute',
+                  concurrency='1', requests=5, warmup=0, output=str(report_path))
+        report = json.loads(report_path.read_text())
+        self.assertEqual(
+            [(result['scenario'], result['requests'], result['errors']) for result in report['results']],
+            [('list', 5, 0), ('execute', 5, 0)]
+        )
+
+        self.call('bench_load', fixtures=str(self.output / 'fixtures.json'), scenarios='list', concurrency='1',
+                  requests=5, warmup=0, output=str(self.output / 'again.json'), baseline=str(report_path))
+        comparison = json.loads((self.output / 'again.json').read_text())['comparison']
+        self.assertEqual([(entry['scenario'], entry['concurrency']) for entry in comparison], [('list', 1)])
+        self.assertIn('rps', comparison[0]['changes'])
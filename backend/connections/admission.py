@@ -0,0 +1,209 @@
+"""Admission control for source database executions.
+
+Every execution takes a slot from its user's limit and from its connection's
+limit before checking out a database connection. Slots are leases in the
+``admission`` cache (``cache.add`` with a timeout), which needs atomic
+``add`` and ``incr``: on Redis (``REDIS_URL``) the limits hold across
+every worker and node, while the file cache used without it only keeps
+them per host. A slot held by a worker that died frees itself after
+``ADMISSION_LEASE_TIMEOUT``.
+
+Requests over a connection's limit wait in a bounded queue that is served
+round-robin across users. Each waiting request gets a round one past its
+user's previous waiting request (or past the round being served), and it
+may take a slot only when no request from an earlier round is still
+waiting. A user with five queued requests therefore gets one in per round,
+alongside every other waiting user.
+
+``admit`` guards sync executions and ``aadmit`` the async views; both run
+the same wait loops.
+"""
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager, closing, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+cache = ConnectionProxy(caches, 'admission')
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when an execution is not admitted; ``retry_after`` is in seconds"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = settings.ADMISSION_RETRY_AFTER if retry_after is None else retry_after
+
+
+def get_connection_limit(connection):
+    """Concurrent executions allowed on a connection: its own limit, else ADMISSION_CONNECTION_CONCURRENCY"""
+    if connection.max_concurrency is not None:
+        return connection.max_concurrency
+    return settings.ADMISSION_CONNECTION_CONCURRENCY
+
+
+def _acquire_slot(prefix, limit, token):
+    """Lease a free slot under ``prefix`` and return its key, or None when all are taken"""
+    keys = [f'{prefix}:slot:{index}' for index in range(limit)]
+    taken = cache.get_many(keys)
+    for key in keys:
+        if key not in taken and cache.add(key, token, settings.ADMISSION_LEASE_TIMEOUT):
+            return key
+    return None
+
+
+def _release_slot(key, token):
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+def _incr(key, ttl):
+    if cache.add(key, 1, ttl):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, ttl)  # Expired since add(); count from scratch
+
+
+def _decr(key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        pass  # Expired while waiting; nothing left to count down
+
+
+def _next_delay(delay):
+    return min(delay * 2, settings.ADMISSION_POLL_INTERVAL)
+
+
+def _user_slot_steps(user, token, deadline):
+    prefix = f'admission:user:{user.pk}'
+    delay = 0.01
+    while True:
+        key = _acquire_slot(prefix, settings.ADMISSION_USER_CONCURRENCY, token)
+        if key is not None:
+            return key
+        if time.monotonic() >= deadline:
+            raise AdmissionRejectedError('Too many queries running for this user, try again later')
+        yield delay
+        delay = _next_delay(delay)
+
+
+def _connection_slot_steps(connection, user, limit, token, deadline):
+    prefix = f'admission:connection:{connection.id}'
+    round_key = f'{prefix}:round'
+    user_round_key = f"{prefix}:user:{user.pk if user is not None else 'system'}:round"
+    size = settings.ADMISSION_QUEUE_SIZE
+    # Queue bookkeeping outlives the longest possible wait, then expires
+    ttl = settings.ADMISSION_WAIT_TIMEOUT * 2 + 60
+
+    # Join the round after this user's last waiting request, or after the one being served
+    rounds = cache.get_many([round_key, user_round_key])
+    served = rounds.get(round_key, 0)
+    turn = max(served, rounds.get(user_round_key, 0)) + 1
+    cache.set(user_round_key, turn, ttl)
+    waiting_key = f'{prefix}:waiting:{turn}'
+    _incr(waiting_key, ttl)
+
+    try:
+        # Waiting requests span at most ``size`` rounds either side of this one
+        queued = cache.get_many([f'{prefix}:waiting:{index}' for index in range(max(1, turn - size), turn + size + 1)])
+        if sum(queued.values()) > size:
+            raise AdmissionRejectedError('Too many queries waiting on this connection, try again later')
+
+        earlier_keys = [f'{prefix}:waiting:{index}' for index in range(max(1, turn - size - 1), turn)]
+        delay = 0.01
+        while True:
+            if not any(cache.get_many(earlier_keys).values()):
+                key = _acquire_slot(prefix, limit, token)
+                if key is not None:
+                    if cache.get(round_key, 0) < turn:
+                        cache.set(round_key, turn, None)
+                    return key
+            if time.monotonic() >= deadline:
+                raise AdmissionRejectedError('Timed out waiting for a free slot on this connection, try again later')
+            yield delay
+            delay = _next_delay(delay)
+    finally:
+        _decr(waiting_key)
+
+
+def _slot_steps(connection, user, token):
+    """Step generators for each slot an execution needs.
+
+    Each generator does its cache work between yields, yields the delay
+    before its next attempt and returns the leased slot key, so ``admit``
+    can drive them with ``time.sleep`` and ``aadmit`` with
+    ``asyncio.sleep``.
+    """
+    user_limit = settings.ADMISSION_USER_CONCURRENCY if user is not None else 0
+    connection_limit = get_connection_limit(connection)
+    deadline = time.monotonic() + settings.ADMISSION_WAIT_TIMEOUT
+    if user_limit:
+        yield _user_slot_steps(user, token, deadline)
+    if connection_limit:
+        yield _connection_slot_steps(connection, user, connection_limit, token, deadline)
+
+
+def _advance(steps):
+    """Run ``steps`` to its next yield: ``(False, delay)``, or ``(True, key)`` once it returns"""
+    try:
+        return False, next(steps)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+def _release_slots(keys, token):
+    for key in keys:
+        _release_slot(key, token)
+
+
+@contextmanager
+def admit(connection, user=None):
+    """Hold a user slot and a connection slot for the duration of the block.
+
+    ``user`` is None for executions not made on a user's behalf (scheduled
+    refreshes, for example), which only count against the connection.
+    Waits up to ``ADMISSION_WAIT_TIMEOUT`` seconds for both, then raises
+    ``AdmissionRejectedError``. The same happens at once when the
+    connection's queue already holds ``ADMISSION_QUEUE_SIZE`` requests.
+    A limit of 0 disables that check.
+    """
+    token = uuid.uuid4().hex
+    held = []
+    try:
+        for steps in _slot_steps(connection, user, token):
+            with closing(steps):
+                done, value = _advance(steps)
+                while not done:
+                    time.sleep(value)
+                    done, value = _advance(steps)
+            held.append(value)
+        yield
+    finally:
+        _release_slots(held, token)
+
+
+@asynccontextmanager
+async def aadmit(connection, user=None):
+    """``admit`` for coroutines: cache calls run in worker threads and waits don't block the event loop"""
+    token = uuid.uuid4().hex
+    held = []
+    advance = sync_to_async(_advance, thread_sensitive=False)
+    try:
+        for steps in _slot_steps(connection, user, token):
+            with closing(steps):
+                done, value = await advance(steps)
+                while not done:
+                    await asyncio.sleep(value)
+                    done, value = await advance(steps)
+            held.append(value)
+        yield
+    finally:
+        if held:
+            await sync_to_async(_release_slots, thread_sensitive=False)(held, token)
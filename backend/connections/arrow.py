@@ -0,0 +1,82 @@
+"""Apache Arrow IPC encoding for query results"""
+import json
+import uuid
+from decimal import Decimal
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+
+def arrow_available():
+    return pa is not None
+
+
+def _arrow_type(column_type):
+    return {
+        'boolean': pa.bool_(),
+        'integer': pa.int64(),
+        'float': pa.float64(),
+        'decimal': pa.float64(),
+        'date': pa.date32(),
+        'datetime': pa.timestamp('us'),
+        'time': pa.time64('us'),
+        'interval': pa.duration('us'),
+        'binary': pa.binary(),
+    }.get(column_type, pa.string())
+
+
+def _to_arrow_value(value):
+    """Coerce driver values Arrow has no native mapping for"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    return value
+
+
+def _to_arrow_string(value):
+    value = _to_arrow_value(value)
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def encode_arrow_stream(columns, batches):
+    """Encode row batches as an Arrow IPC stream.
+
+    ``columns`` is the metadata from ``describe_columns`` and fixes the
+    schema up front; each batch of row tuples from the cursor is transposed
+    into one record batch, so only a single batch is held as Python objects
+    at a time. Returns ``(payload, row_count)``.
+    """
+    if pa is None:
+        raise RuntimeError('Arrow output requires the pyarrow package')
+
+    schema = pa.schema([(column['name'], _arrow_type(column['type'])) for column in columns])
+    # Columns typed as strings (including 'unknown') take any value as text
+    converters = [
+        _to_arrow_string if field.type == pa.string() else _to_arrow_value
+        for field in schema
+    ]
+    sink = pa.BufferOutputStream()
+    row_count = 0
+
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            if not batch:
+                continue
+            arrays = [
+                pa.array(
+                    [convert(value) for value in values],
+                    type=field.type
+                )
+                for values, field, convert in zip(zip(*batch), schema, converters)
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            row_count += len(batch)
+
+    return sink.getvalue().to_pybytes(), row_count
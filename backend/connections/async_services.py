@@ -0,0 +1,156 @@
+"""Async execution path for the ASGI views.
+
+Executions run on SQLAlchemy async engines (asyncpg, aiomysql,
+aiosqlite), so a worker's event loop keeps serving other requests while a
+statement waits on the database. The statement itself runs through
+``AsyncConnection.run_sync``, sharing ``run_statement`` (timeouts,
+preflight, fetching, result formats) with the sync path.
+
+Async engines hold connections bound to the event loop that opened them,
+so the registry keeps one set of engines per loop. Executions run the
+sync path in a worker thread instead when the connection type's async
+driver is not installed, or outside the ASGI server, where every request
+gets a new loop that would strand pooled connections.
+"""
+import asyncio
+import functools
+import importlib.util
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .admission import AdmissionRejectedError, aadmit
+from .preflight import QueryRejectedError
+from .services import (
+    PhaseTimer, QueryExecutionError, build_result, configure_engine, execute_query, execution_error,
+    get_connection_url, get_engine_options, get_statement_timeout, prepare_statement, run_statement,
+    test_database_connection
+)
+from vizly.async_views import serving_asgi
+from vizly.metrics import EXECUTIONS_IN_FLIGHT, POOL_CHECKOUT_WAIT
+
+# SQLAlchemy dialect+driver and the module it needs, for each connection type
+ASYNC_DRIVERS = {'postgres': 'postgresql+asyncpg', 'mysql': 'mysql+aiomysql', 'sqlite': 'sqlite+aiosqlite'}
+ASYNC_DRIVER_MODULES = {'postgres': 'asyncpg', 'mysql': 'aiomysql', 'sqlite': 'aiosqlite'}
+
+# {event loop: {connection_id: (updated_at, engine)}}
+_engines = weakref.WeakKeyDictionary()
+
+
+@functools.lru_cache(maxsize=None)
+def async_driver_available(connection_type):
+    module = ASYNC_DRIVER_MODULES.get(connection_type)
+    return module is not None and importlib.util.find_spec(module) is not None
+
+
+def use_async_engine(connection):
+    return serving_asgi.get() and async_driver_available(connection.type)
+
+
+def create_async_connection_engine(connection):
+    """Create a SQLAlchemy async engine from connection"""
+    options = get_engine_options(connection)
+    if 'pool_size' in options:
+        # aiosqlite defaults to NullPool for database files; pool them like the sync engines do
+        options['poolclass'] = AsyncAdaptedQueuePool
+    engine = create_async_engine(get_connection_url(connection, ASYNC_DRIVERS), **options)
+    configure_engine(engine.sync_engine, connection)
+    return engine
+
+
+async def aget_connection_engine(connection):
+    """Return this event loop's async engine for a connection, building it on first use.
+
+    Keyed by the connection id and its ``updated_at``, like
+    ``get_connection_engine``.
+    """
+    engines = _engines.setdefault(asyncio.get_running_loop(), {})
+    key = str(connection.id)
+    entry = engines.get(key)
+    if entry and entry[0] == connection.updated_at:
+        return entry[1]
+
+    if 'password' in connection.get_deferred_fields():
+        # Connections from the metadata cache come without their password
+        await sync_to_async(connection.refresh_from_db)(fields=['password'])
+        entry = engines.get(key)
+        if entry and entry[0] == connection.updated_at:
+            return entry[1]
+
+    engine = create_async_connection_engine(connection)
+    engines[key] = (connection.updated_at, engine)
+    if entry:
+        await entry[1].dispose()
+    return engine
+
+
+def dispose_async_connection_engines(connection_id):
+    """Drop a connection's async engines from every loop, disposing them on their own loops"""
+    for loop, engines in list(_engines.items()):
+        entry = engines.pop(str(connection_id), None)
+        if entry and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(entry[1].dispose(), loop)
+
+
+@asynccontextmanager
+async def acheckout(connection, engine):
+    """``checkout`` for async engines"""
+    started = time.monotonic()
+    async with engine.connect() as conn:
+        POOL_CHECKOUT_WAIT.labels(connection.type).observe(time.monotonic() - started)
+        with EXECUTIONS_IN_FLIGHT.labels(connection.type).track_inprogress():
+            yield conn
+
+
+async def atest_database_connection(connection):
+    """Test if database connection works"""
+    if not use_async_engine(connection):
+        return await sync_to_async(test_database_connection, thread_sensitive=False)(connection)
+
+    try:
+        engine = await aget_connection_engine(connection)
+        async with engine.connect() as conn:
+            await conn.execute(text('SELECT 1'))
+        return {'success': True, 'message': f'{connection.type.title()} connection successful'}
+    except Exception as e:
+        raise Exception(f'Connection failed: {str(e)}')
+
+
+async def aexecute_query(connection, sql, params=None, page_size=None, cursor=None, order_by=None,
+                         result_format='rows', timeout=None, user=None, timings=None):
+    """``execute_query`` for async views.
+
+    Takes the same arguments, except for the monitor used by background
+    jobs, and returns the same result. Admission waits on the event loop
+    (see ``aadmit``).
+    """
+    if not use_async_engine(connection):
+        return await sync_to_async(execute_query, thread_sensitive=False)(
+            connection, sql, params=params, page_size=page_size, cursor=cursor, order_by=order_by,
+            result_format=result_format, timeout=timeout, user=user, timings=timings
+        )
+
+    statement, page_size, state = prepare_statement(sql, page_size, cursor, order_by, result_format)
+    timeout = get_statement_timeout(connection, timeout)
+    timer = PhaseTimer(timings)
+
+    try:
+        engine = await aget_connection_engine(connection)
+        async with aadmit(connection, user), acheckout(connection, engine) as conn:
+            timer.lap('connect')
+            data, fetched = await conn.run_sync(
+                run_statement, connection, sql, statement, params, page_size, result_format, None, timeout, timer
+            )
+    except (AdmissionRejectedError, QueryExecutionError, QueryRejectedError):
+        raise
+    except Exception as e:
+        raise execution_error(e, timeout=timeout)
+
+    if fetched is None:
+        return data
+    return build_result(fetched, result_format, page_size, state, order_by, timer)
@@ -0,0 +1,32 @@
+"""Async version of the connection test endpoint, served when ASYNC_QUERY_VIEWS is set"""
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .async_services import atest_database_connection
+from .models import Connection
+from vizly.async_views import AsyncAPIView
+
+
+class ConnectionTestView(AsyncAPIView):
+    """Test a database connection on the event loop"""
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request, pk=None):
+        try:
+            connection = await Connection.objects.aget(pk=pk, user=request.user)
+            result = await atest_database_connection(connection)
+            return Response({
+                'status': 'success',
+                'data': result
+            })
+        except Connection.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Connection not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
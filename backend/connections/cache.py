@@ -0,0 +1,176 @@
+"""Shared result cache in front of execute_query"""
+import asyncio
+import hashlib
+import json
+import pickle
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .async_services import aexecute_query
+from .services import execute_query, is_select_statement
+from vizly.metrics import CACHE_LOOKUPS
+
+# Quoted literals and identifiers are kept verbatim when normalizing SQL
+QUOTED_SQL = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`)")
+
+# execute_query's output option defaults, left out of keys so omitting an option and passing its default match
+DEFAULT_OPTIONS = {'result_format': 'rows', 'page_size': None, 'cursor': None, 'order_by': None}
+
+
+def normalize_sql(sql):
+    """Collapse insignificant whitespace so formatting changes share a cache entry"""
+    parts = QUOTED_SQL.split(sql.strip().rstrip(';').strip())
+    return ''.join(
+        part if index % 2 else re.sub(r'\s+', ' ', part)
+        for index, part in enumerate(parts)
+    )
+
+
+def statement_fingerprint(sql):
+    """Cache identity of SQL text or a prebuilt SQLAlchemy statement"""
+    if isinstance(sql, str):
+        return normalize_sql(sql)
+    # Generated values such as LIMITs are bound parameters, so they're part of the identity
+    compiled = sql.compile()
+    return [str(compiled), compiled.params]
+
+
+def result_cache_key(connection, sql, params=None, **options):
+    """Cache key for a result: connection (and its version), SQL, parameters and output options"""
+    options = {
+        name: value for name, value in options.items()
+        if name not in DEFAULT_OPTIONS or value != DEFAULT_OPTIONS[name]
+    }
+    fingerprint = json.dumps(
+        [str(connection.id), connection.updated_at, statement_fingerprint(sql), params or {}, options],
+        sort_keys=True, cls=DjangoJSONEncoder
+    )
+    return 'query-result:' + hashlib.sha256(fingerprint.encode()).hexdigest()
+
+
+def cached_execute_query(connection, sql, ttl=None, refresh=False, timeout=None, user=None, timings=None,
+                         **options):
+    """Execute a query through the shared result cache.
+
+    Results are stored in the ``query_results`` cache for ``ttl`` seconds
+    (``QUERY_CACHE_TTL`` when None, no caching when 0). Concurrent misses
+    for the same key are coalesced: one caller takes a lock and runs the
+    query while the others poll for its result, falling back to running it
+    themselves if the lock holder gives up or ``QUERY_CACHE_WAIT_TIMEOUT``
+    passes. ``refresh`` skips the lookup of an existing entry and
+    overwrites it, unless a concurrent run finishes first.
+
+    The returned result carries ``cache: {'hit', 'age'}``, plus a
+    ``fingerprint`` identifying the cache entry when it came from or went
+    into the cache (see ``vizly.conditional``). ``timeout``,
+    ``user`` and ``timings`` are passed to ``execute_query`` but are not
+    part of the cache key; cache hits skip admission control entirely and
+    leave ``timings`` empty.
+    """
+    ttl = settings.QUERY_CACHE_TTL if ttl is None else ttl
+    if not ttl or not is_select_statement(sql):
+        result = execute_query(connection, sql, timeout=timeout, user=user, timings=timings, **options)
+        return {**result, 'cache': {'hit': False, 'age': 0}}
+
+    cache = caches['query_results']
+    key = result_cache_key(connection, sql, **options)
+    lock_key = key + ':lock'
+    deadline = time.monotonic() + settings.QUERY_CACHE_WAIT_TIMEOUT
+    delay = 0.05
+    fresh_after = time.time() if refresh else 0
+
+    while True:
+        entry = _load_entry(cache.get(key))
+        if entry and entry['cached_at'] >= fresh_after:
+            CACHE_LOOKUPS.labels('query_results', 'hit').inc()
+            return {**entry['result'], 'cache': _cache_info(key, entry['cached_at'], hit=True)}
+
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, settings.QUERY_CACHE_LOCK_TIMEOUT) or time.monotonic() >= deadline:
+            break
+
+        # Another worker is running this query; wait for its result
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+    CACHE_LOOKUPS.labels('query_results', 'miss').inc()
+    try:
+        result = execute_query(connection, sql, timeout=timeout, user=user, timings=timings, **options)
+        cached_at = time.time()
+        payload = _encode_entry(result, cached_at)
+        if payload is not None:
+            cache.set(key, payload, ttl)
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+    if payload is None:
+        return {**result, 'cache': {'hit': False, 'age': 0}}
+    return {**result, 'cache': _cache_info(key, cached_at, hit=False)}
+
+
+async def acached_execute_query(connection, sql, ttl=None, refresh=False, timeout=None, user=None, timings=None,
+                                **options):
+    """``cached_execute_query`` for async views, running queries with ``aexecute_query``"""
+    ttl = settings.QUERY_CACHE_TTL if ttl is None else ttl
+    if not ttl or not is_select_statement(sql):
+        result = await aexecute_query(connection, sql, timeout=timeout, user=user, timings=timings, **options)
+        return {**result, 'cache': {'hit': False, 'age': 0}}
+
+    cache = caches['query_results']
+    key = result_cache_key(connection, sql, **options)
+    lock_key = key + ':lock'
+    deadline = time.monotonic() + settings.QUERY_CACHE_WAIT_TIMEOUT
+    delay = 0.05
+    fresh_after = time.time() if refresh else 0
+
+    while True:
+        entry = _load_entry(await cache.aget(key))
+        if entry and entry['cached_at'] >= fresh_after:
+            CACHE_LOOKUPS.labels('query_results', 'hit').inc()
+            return {**entry['result'], 'cache': _cache_info(key, entry['cached_at'], hit=True)}
+
+        token = uuid.uuid4().hex
+        if await cache.aadd(lock_key, token, settings.QUERY_CACHE_LOCK_TIMEOUT) or time.monotonic() >= deadline:
+            break
+
+        # Another worker is running this query; wait for its result
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+    CACHE_LOOKUPS.labels('query_results', 'miss').inc()
+    try:
+        result = await aexecute_query(connection, sql, timeout=timeout, user=user, timings=timings, **options)
+        cached_at = time.time()
+        payload = _encode_entry(result, cached_at)
+        if payload is not None:
+            await cache.aset(key, payload, ttl)
+    finally:
+        if await cache.aget(lock_key) == token:
+            await cache.adelete(lock_key)
+
+    if payload is None:
+        return {**result, 'cache': {'hit': False, 'age': 0}}
+    return {**result, 'cache': _cache_info(key, cached_at, hit=False)}
+
+
+def _encode_entry(result, cached_at):
+    """Pickle a cache entry, or return None when it's over QUERY_CACHE_MAX_ENTRY_BYTES"""
+    # Pickle up front so oversized results can be skipped without a second pass
+    payload = pickle.dumps({'result': result, 'cached_at': cached_at}, pickle.HIGHEST_PROTOCOL)
+    return payload if len(payload) <= settings.QUERY_CACHE_MAX_ENTRY_BYTES else None
+
+
+def _cache_info(key, cached_at, hit):
+    # An entry is identified by its key and when it was stored; refreshes store a new one
+    fingerprint = hashlib.sha256(f'{key}:{cached_at!r}'.encode()).hexdigest()
+    return {'hit': hit, 'age': int(time.time() - cached_at), 'fingerprint': fingerprint}
+
+
+def _load_entry(payload):
+    return pickle.loads(payload) if payload is not None else None
@@ -0,0 +1,15 @@
+"""System checks for connection execution settings"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when caches, locks and admission limits are only shared by the workers of one host"""
+    if settings.REDIS_URL:
+        return []
+    return [Warning(
+        'REDIS_URL is not set, so the result cache, its locks and admission limits are kept in files on each host.',
+        hint='Set REDIS_URL to a Redis server shared by every host running Vizly.',
+        id='connections.W001',
+    )]
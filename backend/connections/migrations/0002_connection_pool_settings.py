@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connections', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connection',
+            name='max_overflow',
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.AddField(
+            model_name='connection',
+            name='pool_pre_ping',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='connection',
+            name='pool_recycle',
+            field=models.PositiveIntegerField(default=1800),
+        ),
+        migrations.AddField(
+            model_name='connection',
+            name='pool_size',
+            field=models.PositiveIntegerField(default=5),
+        ),
+    ]
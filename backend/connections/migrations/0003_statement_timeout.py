@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connections', '0002_connection_pool_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connection',
+            name='statement_timeout',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connections', '0003_statement_timeout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connection',
+            name='preflight_max_cost',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='connection',
+            name='preflight_max_rows',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='connection',
+            name='preflight_mode',
+            field=models.CharField(choices=[('off', 'Off'), ('warn', 'Warn'), ('limit', 'Limit rows'), ('reject', 'Reject')], default='off', max_length=10),
+        ),
+    ]
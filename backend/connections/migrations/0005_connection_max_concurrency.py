@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connections', '0004_connection_preflight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connection',
+            name='max_concurrency',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connections', '0005_connection_max_concurrency'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='connection',
+            index=models.Index(fields=['user', '-created_at'], name='connections_user_id_32545b_idx'),
+        ),
+    ]
@@ -10,6 +10,12 @@ class Connection(models.Model):
         ('mysql', 'MySQL'),
         ('sqlite', 'SQLite'),
     ]
+    PREFLIGHT_CHOICES = [
+        ('off', 'Off'),
+        ('warn', 'Warn'),
+        ('limit', 'Limit rows'),
+        ('reject', 'Reject'),
+    ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
@@ -20,6 +26,17 @@ class Connection(models.Model):
     username = models.CharField(max_length=255, null=True, blank=True)
     password = models.CharField(max_length=255, null=True, blank=True)  # TODO: Encrypt
     ssl = models.BooleanField(default=False)
+    pool_size = models.PositiveIntegerField(default=5)
+    max_overflow = models.PositiveIntegerField(default=10)
+    pool_recycle = models.PositiveIntegerField(default=1800)  # Seconds
+    pool_pre_ping = models.BooleanField(default=True)
+    # Seconds; null uses QUERY_STATEMENT_TIMEOUT, 0 disables
+    statement_timeout = models.PositiveIntegerField(null=True, blank=True)
+    preflight_mode = models.CharField(max_length=10, choices=PREFLIGHT_CHOICES, default='off')
+    preflight_max_rows = models.PositiveBigIntegerField(null=True, blank=True)  # Planner row estimate
+    preflight_max_cost = models.FloatField(null=True, blank=True)  # Planner cost, in the database's own units
+    # Null uses ADMISSION_CONNECTION_CONCURRENCY, 0 disables
+    max_concurrency = models.PositiveIntegerField(null=True, blank=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='connections')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -27,6 +44,7 @@ class Connection(models.Model):
     class Meta:
         db_table = 'connections'
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['user', '-created_at'])]  # List pages
 
     def __str__(self):
         return f"{self.name} ({self.type})"
@@ -0,0 +1,125 @@
+"""EXPLAIN-based cost preflight.
+
+Before a statement runs, the database's own planner estimate is checked
+against the connection's thresholds. Depending on the connection's
+``preflight_mode`` an expensive statement is let through with a warning,
+capped to ``preflight_max_rows`` rows, or refused.
+"""
+import json
+import re
+
+from sqlalchemy import literal_column, select
+from sqlalchemy.sql.elements import TextClause
+
+
+class QueryRejectedError(ValueError):
+    """Raised when preflight refuses a statement as too expensive"""
+
+
+def _explain(conn, prefix, statement, params):
+    """Run EXPLAIN over a compiled statement, with its bind values"""
+    compiled = statement.compile(dialect=conn.dialect)
+    values = compiled.construct_params(params or {})
+    if compiled.positional:
+        values = tuple(values[name] for name in compiled.positiontup)
+    return conn.exec_driver_sql(f'{prefix} {compiled.string}', values).fetchall()
+
+
+def _walk(node):
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def _estimate_postgresql(conn, statement, params):
+    plan = _explain(conn, 'EXPLAIN (FORMAT JSON)', statement, params)[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    top = plan[0]['Plan']
+    return {'rows': top.get('Plan Rows'), 'cost': top.get('Total Cost')}
+
+
+def _estimate_mysql(conn, statement, params):
+    plan = json.loads(_explain(conn, 'EXPLAIN FORMAT=JSON', statement, params)[0][0])
+    query_block = plan.get('query_block', {})
+    cost = query_block.get('cost_info', {}).get('query_cost')
+    rows = [
+        int(node['rows_produced_per_join']) for node in _walk(query_block)
+        if 'rows_produced_per_join' in node
+    ]
+    return {'rows': max(rows) if rows else None, 'cost': float(cost) if cost is not None else None}
+
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+
+def _estimate_sqlite(conn, statement, params):
+    # EXPLAIN QUERY PLAN has no estimates; a full scan is sized by the table's
+    # largest rowid, which SQLite finds without reading the table
+    rows = None
+    for *_, detail in _explain(conn, 'EXPLAIN QUERY PLAN', statement, params):
+        match = SQLITE_SCAN.match(detail)
+        if not match:
+            continue
+        try:
+            size = conn.exec_driver_sql(f'SELECT MAX(rowid) FROM "{match.group(1)}"').scalar()
+        except Exception:
+            continue
+        rows = max(rows or 0, size or 0)
+    return {'rows': rows, 'cost': None}
+
+
+ESTIMATORS = {
+    'postgresql': _estimate_postgresql,
+    'mysql': _estimate_mysql,
+    'sqlite': _estimate_sqlite,
+}
+
+
+def limit_statement(statement, max_rows):
+    """Cap a text or SELECT statement to ``max_rows`` rows"""
+    if isinstance(statement, TextClause):
+        statement = statement.columns()
+    return select(literal_column('*')).select_from(statement.subquery('vizly_preflight')).limit(max_rows)
+
+
+def run_preflight(conn, connection, statement, params=None):
+    """Check a statement's planner estimate against the connection's thresholds.
+
+    Returns ``(statement, report)``: the statement to run (capped in
+    ``limit`` mode) and None, or a report of the estimate and the action
+    taken when a threshold is exceeded. Raises ``QueryRejectedError`` in
+    ``reject`` mode. Statements whose EXPLAIN fails are let through.
+    """
+    mode = connection.preflight_mode
+    estimator = ESTIMATORS.get(conn.dialect.name)
+    if mode == 'off' or estimator is None:
+        return statement, None
+
+    try:
+        with conn.begin_nested() if conn.in_transaction() else conn.begin():
+            estimate = estimator(conn, statement, params)
+    except Exception:
+        return statement, None
+
+    exceeded = []
+    if connection.preflight_max_rows is not None and (estimate['rows'] or 0) > connection.preflight_max_rows:
+        exceeded.append(f"about {int(estimate['rows']):,} rows (limit {connection.preflight_max_rows:,})")
+    if connection.preflight_max_cost is not None and (estimate['cost'] or 0) > connection.preflight_max_cost:
+        exceeded.append(f"cost {estimate['cost']:,.0f} (limit {connection.preflight_max_cost:,.0f})")
+    if not exceeded:
+        return statement, None
+
+    message = 'Query is estimated at ' + ' and '.join(exceeded)
+    if mode == 'reject':
+        raise QueryRejectedError(f'{message}; refine it before running')
+
+    report = {**estimate, 'action': 'warn', 'message': message}
+    if mode == 'limit' and connection.preflight_max_rows is not None:
+        report.update(action='limit', message=f'{message}; results capped at {connection.preflight_max_rows:,} rows')
+        statement = limit_statement(statement, connection.preflight_max_rows)
+    return statement, report
@@ -0,0 +1,226 @@
+"""Cached schema introspection and catalog search"""
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from sqlalchemy import inspect, text
+from sqlalchemy.engine.reflection import ObjectKind
+
+from .services import get_connection_engine
+from vizly.metrics import CACHE_LOOKUPS
+
+SYSTEM_SCHEMAS = {'information_schema', 'pg_catalog', 'pg_toast'}
+
+# Planner statistics used for row-count estimates, per dialect
+ROW_ESTIMATE_SQL = {
+    'postgresql': """
+        SELECT n.nspname, c.relname, c.reltuples::bigint
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p', 'm')
+    """,
+    'mysql': """
+        SELECT NULL, table_name, table_rows
+        FROM information_schema.tables
+        WHERE table_schema = DATABASE()
+    """,
+    # Only present once ANALYZE has run; the first number of each stat is the row count
+    'sqlite': 'SELECT NULL, tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl',
+}
+
+
+def _schema_names(inspector, dialect_name):
+    # MySQL schemas are whole databases and SQLite has one, so only Postgres lists them all
+    if dialect_name != 'postgresql':
+        return [None]
+    return [
+        name for name in inspector.get_schema_names()
+        if name not in SYSTEM_SCHEMAS and not name.startswith(('pg_temp', 'pg_toast_temp'))
+    ]
+
+
+def _row_estimates(conn, dialect_name):
+    sql = ROW_ESTIMATE_SQL.get(dialect_name)
+    if sql is None:
+        return {}
+    try:
+        rows = conn.execute(text(sql)).fetchall()
+    except Exception:
+        # Statistics are best-effort (missing sqlite_stat1, restricted catalogs)
+        return {}
+    return {(schema, table): int(count) for schema, table, count in rows if count is not None and count >= 0}
+
+
+def _type_name(column_type):
+    try:
+        return str(column_type)
+    except Exception:
+        return type(column_type).__name__
+
+
+def introspect_schema(connection):
+    """Read tables, views, columns and row-count estimates from the source database"""
+    engine = get_connection_engine(connection)
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        dialect_name = engine.dialect.name
+        default_schema = inspector.default_schema_name
+        estimates = _row_estimates(conn, dialect_name)
+
+        tables = []
+        for schema in _schema_names(inspector, dialect_name):
+            views = set(inspector.get_view_names(schema=schema))
+            columns = inspector.get_multi_columns(schema=schema, kind=ObjectKind.TABLE | ObjectKind.VIEW)
+            for (_, name), table_columns in sorted(columns.items()):
+                tables.append({
+                    'schema': schema or default_schema,
+                    'name': name,
+                    'type': 'view' if name in views else 'table',
+                    'rowEstimate': estimates.get((schema, name)),
+                    'columns': [
+                        {'name': column['name'], 'type': _type_name(column['type']), 'nullable': column['nullable']}
+                        for column in table_columns
+                    ],
+                })
+    return tables
+
+
+def _snapshot_key(connection):
+    return f'connection-schema:{connection.id}'
+
+
+def _store_snapshot(connection):
+    snapshot = {
+        'version': str(connection.updated_at),
+        'introspectedAt': time.time(),
+        'tables': introspect_schema(connection),
+    }
+    cache.set(_snapshot_key(connection), snapshot, settings.SCHEMA_CACHE_TTL)
+    return snapshot
+
+
+def _refresh_in_background(connection):
+    lock_key = _snapshot_key(connection) + ':lock'
+    if not cache.add(lock_key, True, settings.SCHEMA_REFRESH_LOCK_TIMEOUT):
+        return
+
+    def refresh():
+        try:
+            _store_snapshot(connection)
+        except Exception:
+            pass  # Keep serving the previous snapshot; the next request retries
+        finally:
+            cache.delete(lock_key)
+
+    threading.Thread(target=refresh, name='schema-refresh', daemon=True).start()
+
+
+def get_schema_snapshot(connection, refresh=False):
+    """Return the cached schema snapshot for a connection.
+
+    A missing snapshot (or one taken before the connection was edited) is
+    introspected on the spot. One older than ``SCHEMA_REFRESH_AFTER``
+    seconds is returned as is while a background thread replaces it.
+    """
+    snapshot = None if refresh else cache.get(_snapshot_key(connection))
+    if snapshot is None or snapshot['version'] != str(connection.updated_at):
+        CACHE_LOOKUPS.labels('schema', 'miss').inc()
+        return _store_snapshot(connection)
+    CACHE_LOOKUPS.labels('schema', 'hit').inc()
+    if time.time() - snapshot['introspectedAt'] > settings.SCHEMA_REFRESH_AFTER:
+        _refresh_in_background(connection)
+    return snapshot
+
+
+def _trigrams(value):
+    return {value[index:index + 3] for index in range(len(value) - 2)}
+
+
+class SchemaIndex:
+    """In-memory prefix and trigram index over table and column names"""
+
+    def __init__(self, tables):
+        self.entries = []
+        self.names = []
+        self.gram_counts = []
+        self.postings = defaultdict(list)
+        for table in tables:
+            self._add(table['name'], {
+                'kind': 'table', 'schema': table['schema'], 'table': table['name'],
+                'tableType': table['type'], 'rowEstimate': table['rowEstimate'],
+            })
+            for column in table['columns']:
+                self._add(column['name'], {
+                    'kind': 'column', 'schema': table['schema'], 'table': table['name'],
+                    'column': column['name'], 'type': column['type'],
+                })
+        self.prefixes = sorted((name, index) for index, name in enumerate(self.names))
+        self.prefix_keys = [name for name, _ in self.prefixes]
+        # Arrays so trigram matches are counted in one vectorized pass
+        self.gram_counts = np.asarray(self.gram_counts)
+        self.postings = {gram: np.asarray(indexes) for gram, indexes in self.postings.items()}
+
+    def _add(self, name, entry):
+        index = len(self.entries)
+        name = name.lower()
+        grams = _trigrams(name)
+        self.entries.append(entry)
+        self.names.append(name)
+        self.gram_counts.append(len(grams))
+        for gram in grams:
+            self.postings[gram].append(index)
+
+    def search(self, term, limit=50):
+        """Entries matching ``term``: exact names, then prefixes, then by trigram similarity"""
+        term = term.strip().lower()
+        if not term:
+            return []
+
+        scores = {}
+        position = bisect_left(self.prefix_keys, term)
+        while position < len(self.prefixes) and self.prefix_keys[position].startswith(term):
+            name, index = self.prefixes[position]
+            scores[index] = 3.0 if name == term else 2.0
+            position += 1
+
+        grams = [self.postings[gram] for gram in _trigrams(term) if gram in self.postings]
+        # Prefix matches always outrank trigram ones, so skip those once there are enough
+        if grams and len(scores) < limit:
+            shared = np.bincount(np.concatenate(grams), minlength=len(self.entries))
+            similarity = shared / (len(_trigrams(term)) + self.gram_counts - shared)
+            candidates = np.flatnonzero(similarity >= settings.SCHEMA_SEARCH_MIN_SIMILARITY)
+            # Only the best ``limit`` trigram matches can make the cut
+            if len(candidates) > limit + len(scores):
+                best = np.argpartition(-similarity[candidates], limit + len(scores))[:limit + len(scores)]
+                candidates = candidates[best]
+            for index in candidates.tolist():
+                scores.setdefault(index, float(similarity[index]))
+
+        ranked = sorted(scores, key=lambda index: (-scores[index], len(self.names[index]), self.names[index]))
+        return [{**self.entries[index], 'score': round(scores[index], 3)} for index in ranked[:limit]]
+
+
+# Per-process indexes, most recently used last: {connection_id: (introspectedAt, SchemaIndex)}
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_schema_index(connection, snapshot):
+    """Return this process's index for a snapshot, building it on first use"""
+    key = str(connection.id)
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        if entry and entry[0] == snapshot['introspectedAt']:
+            _indexes.move_to_end(key)
+            return entry[1]
+
+    index = SchemaIndex(snapshot['tables'])
+    with _indexes_lock:
+        _indexes[key] = (snapshot['introspectedAt'], index)
+        _indexes.move_to_end(key)
+        while len(_indexes) > settings.SCHEMA_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
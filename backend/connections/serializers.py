@@ -1,14 +1,25 @@
 from rest_framework import serializers
 from .models import Connection
+from vizly.fieldsets import SparseFieldsMixin
 
 
-class ConnectionSerializer(serializers.ModelSerializer):
+class ConnectionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Connection
-        fields = ['id', 'name', 'type', 'host', 'port', 'database', 'username', 'password', 'ssl', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'type', 'host', 'port', 'database', 'username', 'password', 'ssl',
+                  'pool_size', 'max_overflow', 'pool_recycle', 'pool_pre_ping', 'statement_timeout',
+                  'preflight_mode', 'preflight_max_rows', 'preflight_max_cost', 'max_concurrency',
+                  'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
         extra_kwargs = {'password': {'write_only': True}}
 
+    def validate(self, data):
+        mode = data.get('preflight_mode', self.instance.preflight_mode if self.instance else 'off')
+        max_rows = data.get('preflight_max_rows', self.instance.preflight_max_rows if self.instance else None)
+        if mode == 'limit' and max_rows is None:
+            raise serializers.ValidationError({'preflight_max_rows': 'Required when preflight_mode is limit'})
+        return data
+
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
@@ -1,11 +1,109 @@
 """Database connection services"""
-from sqlalchemy import create_engine, text
+import functools
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, time as time_of_day, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.utils.encoders import JSONEncoder
+from sqlalchemy import column, create_engine, event, literal, literal_column, select, text
+from sqlalchemy.sql.elements import BindParameter
+from sqlalchemy.sql.visitors import replacement_traverse
+from sqlalchemy.util import await_only
+
+from .admission import AdmissionRejectedError, admit
+from .arrow import encode_arrow_stream
+from .preflight import QueryRejectedError, run_preflight
+from vizly.metrics import EXECUTIONS_IN_FLIGHT, POOL_CHECKOUT_WAIT, observe_pool
+
+
+# Driver type codes (cursor.description[i][1]) mapped to the column types
+# reported to clients
+CURSOR_TYPE_MAPS = {
+    # psycopg2 reports pg_type OIDs
+    'postgresql': {
+        16: 'boolean',
+        20: 'integer', 21: 'integer', 23: 'integer', 26: 'integer',
+        700: 'float', 701: 'float',
+        1700: 'decimal',
+        18: 'string', 19: 'string', 25: 'string', 1042: 'string', 1043: 'string',
+        1082: 'date',
+        1083: 'time', 1266: 'time',
+        1114: 'datetime', 1184: 'datetime',
+        1186: 'interval',
+        17: 'binary',
+        114: 'json', 3802: 'json',
+        2950: 'uuid',
+    },
+    # mysqlclient reports MySQLdb.constants.FIELD_TYPE codes
+    'mysql': {
+        0: 'decimal', 246: 'decimal',
+        1: 'integer', 2: 'integer', 3: 'integer', 8: 'integer', 9: 'integer', 13: 'integer',
+        4: 'float', 5: 'float',
+        7: 'datetime', 12: 'datetime',
+        10: 'date',
+        11: 'time',
+        16: 'binary',
+        245: 'json',
+        15: 'string', 247: 'string', 248: 'string', 249: 'string', 250: 'string',
+        251: 'string', 252: 'string', 253: 'string', 254: 'string',
+    },
+}
+
+# Fallback for drivers without type codes; order matters (bool is an int,
+# datetime is a date)
+PYTHON_TYPES = [
+    (bool, 'boolean'),
+    (int, 'integer'),
+    (float, 'float'),
+    (Decimal, 'decimal'),
+    (datetime, 'datetime'),
+    (date, 'date'),
+    (time_of_day, 'time'),
+    (timedelta, 'interval'),
+    ((bytes, bytearray, memoryview), 'binary'),
+    (str, 'string'),
+    (uuid.UUID, 'uuid'),
+    ((dict, list), 'json'),
+]
+
+
+# SQLite declared column types mapped to the column types reported to
+# clients, first match wins (after SQLite's own affinity rules, which look
+# for these substrings)
+SQLITE_DECLARED_TYPES = [
+    ('BOOL', 'boolean'),
+    ('INT', 'integer'),
+    ('CHAR', 'string'), ('CLOB', 'string'), ('TEXT', 'string'),
+    ('BLOB', 'binary'),
+    ('REAL', 'float'), ('FLOA', 'float'), ('DOUB', 'float'),
+    ('DATETIME', 'datetime'), ('TIMESTAMP', 'datetime'),
+    ('DATE', 'date'),
+    ('TIME', 'time'),
+    ('DEC', 'decimal'), ('NUMERIC', 'decimal'),
+    ('JSON', 'json'),
+    ('UUID', 'uuid'),
+]
+
+
+# Process-wide engine registry: {connection_id: (updated_at, engine)}
+_engines = {}
+_engines_lock = threading.Lock()
 
 
 def test_database_connection(connection):
     """Test if database connection works"""
     try:
-        engine = create_connection_engine(connection)
+        engine = get_connection_engine(connection)
         with engine.connect() as conn:
             conn.execute(text('SELECT 1'))
         return {'success': True, 'message': f'{connection.type.title()} connection successful'}
@@ -13,43 +111,684 @@ def test_database_connection(connection):
         raise Exception(f'Connection failed: {str(e)}')
 
 
+# SQLAlchemy dialect+driver for each connection type
+DRIVERS = {'postgres': 'postgresql', 'mysql': 'mysql+mysqldb', 'sqlite': 'sqlite'}
+DEFAULT_PORTS = {'postgres': 5432, 'mysql': 3306}
+
+
+def get_connection_url(connection, drivers=DRIVERS):
+    """SQLAlchemy URL for a connection, using the driver ``drivers`` maps its type to"""
+    if connection.type not in drivers:
+        raise ValueError(f"Unsupported database type: {connection.type}")
+    if connection.type == 'sqlite':
+        return f"{drivers['sqlite']}:///{connection.database}"
+    return (
+        f"{drivers[connection.type]}://{connection.username}:{connection.password}"
+        f"@{connection.host}:{connection.port or DEFAULT_PORTS[connection.type]}/{connection.database}"
+    )
+
+
+def get_engine_options(connection):
+    """Pool and compiled cache options for a connection's engine"""
+    options = {
+        'pool_pre_ping': connection.pool_pre_ping,
+        'query_cache_size': settings.QUERY_COMPILED_CACHE_SIZE,
+    }
+    # In-memory SQLite uses a single-connection pool, which takes no sizing options
+    if connection.type != 'sqlite' or connection.database not in ('', ':memory:'):
+        options.update(
+            pool_size=connection.pool_size,
+            max_overflow=connection.max_overflow,
+            pool_recycle=connection.pool_recycle,
+        )
+    return options
+
+
+def configure_engine(engine, connection):
+    """Attach pool metrics and connect-time setup to a new (sync) engine"""
+    observe_pool(engine, connection.type)
+    if connection.type == 'sqlite' and settings.SQLITE_MMAP_SIZE:
+        # Read SQLite files (including query extracts) through memory-mapped I/O
+        event.listen(engine, 'connect', lambda dbapi_connection, record: dbapi_connection.execute(
+            f'PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}'
+        ))
+
+
 def create_connection_engine(connection):
     """Create SQLAlchemy engine from connection"""
-    if connection.type == 'postgres':
-        url = f"postgresql://{connection.username}:{connection.password}@{connection.host}:{connection.port or 5432}/{connection.database}"
-    elif connection.type == 'mysql':
-        url = f"mysql+mysqldb://{connection.username}:{connection.password}@{connection.host}:{connection.port or 3306}/{connection.database}"
-    elif connection.type == 'sqlite':
-        url = f"sqlite:///{connection.database}"
+    engine = create_engine(get_connection_url(connection), **get_engine_options(connection))
+    configure_engine(engine, connection)
+    return engine
+
+
+def load_password(connection):
+    """Load a connection's password if it was deferred, as the metadata cache leaves it out.
+
+    Call it before handing the connection to a worker thread, so building
+    its engine there doesn't query the internal database.
+    """
+    if 'password' in connection.get_deferred_fields():
+        connection.refresh_from_db(fields=['password'])
+    return connection
+
+
+def get_connection_engine(connection):
+    """Return the pooled engine for a connection, building it on first use.
+
+    Engines are cached per process and keyed by the connection id and its
+    ``updated_at``, so an edited connection gets a fresh engine even in
+    workers that never saw the save signal.
+    """
+    key = str(connection.id)
+    with _engines_lock:
+        entry = _engines.get(key)
+        if entry and entry[0] == connection.updated_at:
+            return entry[1]
+
+        engine = create_connection_engine(connection)
+        _engines[key] = (connection.updated_at, engine)
+
+    if entry:
+        entry[1].dispose()
+    return engine
+
+
+@contextmanager
+def checkout(connection, engine, **execution_options):
+    """Check a connection out of the engine's pool for one execution.
+
+    The wait for the pool and the time the connection is held are reported
+    to the pool and in-flight metrics.
+    """
+    started = time.monotonic()
+    with engine.connect() as conn:
+        POOL_CHECKOUT_WAIT.labels(connection.type).observe(time.monotonic() - started)
+        with EXECUTIONS_IN_FLIGHT.labels(connection.type).track_inprogress():
+            yield conn.execution_options(**execution_options) if execution_options else conn
+
+
+def dispose_connection_engine(connection_id):
+    """Drop and dispose the cached engine for a connection, if any"""
+    with _engines_lock:
+        entry = _engines.pop(str(connection_id), None)
+    if entry:
+        entry[1].dispose()
+
+
+def _reset_engines_after_fork():
+    """Forget engines inherited from the parent process.
+
+    Pooled DBAPI connections must not be shared across processes, so the
+    child drops its references without closing the parent's sockets.
+    """
+    global _engines_lock
+    _engines_lock = threading.Lock()
+    for _, engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_engines_after_fork)
+
+
+def describe_columns(dialect_name, description, rows, declared_types=None):
+    """Build column metadata from a DBAPI cursor description.
+
+    Types come from the driver's type codes where the dialect reports them
+    (Postgres OIDs, MySQL field types). SQLite reports none, so those columns
+    fall back to the first non-NULL value found in ``rows``, then to
+    ``declared_types()`` (see ``declared_column_types``), called at most
+    once, for columns that are empty or all NULL.
+    """
+    type_map = CURSOR_TYPE_MAPS.get(dialect_name, {})
+    declared = None
+    columns = []
+    for index, entry in enumerate(description or []):
+        name, type_code = entry[0], entry[1]
+        column_type = type_map.get(type_code) if type_code is not None else None
+        if column_type is None:
+            column_type = next(
+                (_python_type_name(row[index]) for row in rows if row[index] is not None),
+                None
+            )
+        if column_type is None and declared_types is not None:
+            if declared is None:
+                declared = declared_types()
+            column_type = declared.get(name)
+        columns.append({'name': name, 'type': column_type or 'unknown'})
+    return columns
+
+
+def declared_column_types(conn, statement, params=None):
+    """``{column name: type}`` from the declared types of a SQLite statement's result columns.
+
+    SQLite only reports declared types through the columns of a view, so
+    the statement is compiled with its parameters inlined into a temporary
+    view, which is dropped again. Expressions have no declared type.
+    Returns {} for other dialects or when the statement can't be a view.
+    """
+    if conn.dialect.name != 'sqlite':
+        return {}
+    params = params or {}
+
+    def inline(element):
+        # Typed literals, since text() parameters have no type to render their values with
+        if isinstance(element, BindParameter):
+            return literal(params[element.key] if element.key in params else element.effective_value)
+
+    name = f'vizly_describe_{uuid.uuid4().hex}'
+    try:
+        statement = replacement_traverse(as_statement(statement), {}, inline)
+        sql = statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+        conn.exec_driver_sql(f'CREATE TEMP VIEW {name} AS {sql}')
+        try:
+            info = conn.exec_driver_sql(f'PRAGMA temp.table_info({name})').fetchall()
+        finally:
+            conn.exec_driver_sql(f'DROP VIEW temp.{name}')
+    except Exception:
+        return {}
+    return {row[1]: _declared_type_name(row[2]) for row in info}
+
+
+def _declared_type_name(declared):
+    declared = (declared or '').upper()
+    return next((name for pattern, name in SQLITE_DECLARED_TYPES if pattern in declared), None)
+
+
+def _python_type_name(value):
+    for python_type, name in PYTHON_TYPES:
+        if isinstance(value, python_type):
+            return name
+    return 'unknown'
+
+
+class PageCursorSerializer:
+    """JSON serializer for page cursors that tolerates dates and decimals"""
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), cls=DjangoJSONEncoder).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+def encode_page_cursor(state):
+    return signing.dumps(state, salt='vizly.query.page', serializer=PageCursorSerializer)
+
+
+def decode_page_cursor(token):
+    try:
+        return signing.loads(token, salt='vizly.query.page', serializer=PageCursorSerializer)
+    except signing.BadSignature:
+        raise ValueError('Invalid page cursor')
+
+
+SELECT_STATEMENT = re.compile(r'^\s*(?:(?:--[^\n]*\n|/\*.*?\*/)\s*)*[(\s]*(select|with|values)\b', re.I | re.S)
+
+
+def is_select_statement(sql):
+    """Whether SQL is a row-returning statement that can be wrapped in a subquery"""
+    if not isinstance(sql, str):
+        return sql.is_select
+    return bool(SELECT_STATEMENT.match(sql))
+
+
+@functools.lru_cache(maxsize=512)
+def build_statement(sql):
+    """Return the ``text()`` construct for SQL, shared across executions.
+
+    Parameters stay as ``:name`` bind parameters, so the statement text is
+    the same whatever values are passed. Reusing one construct skips
+    re-parsing the SQL, and its stable cache key lets every engine serve
+    the compiled form from its compiled cache.
+    """
+    return text(sql.strip().rstrip(';'))
+
+
+def as_statement(sql):
+    """Return the executable for SQL text, or a prebuilt SQLAlchemy statement as is"""
+    return build_statement(sql) if isinstance(sql, str) else sql
+
+
+def paginate_statement(statement, page_size, state=None, order_by=None):
+    """Wrap a text statement in a subquery that returns one page plus a lookahead row.
+
+    With ``order_by`` (a column name, ``-`` prefixed for descending) pages
+    are keyset-based: each page filters on the last key seen instead of
+    skipping rows, so deep pages cost the same as the first. The column
+    should be unique and non-NULL. Without it, pages fall back to
+    LIMIT/OFFSET, rendered by SQLAlchemy for the connection's dialect.
+    """
+    state = state or {}
+
+    if not order_by:
+        page = statement.columns().subquery('vizly_page')
+        return (
+            select(literal_column('*')).select_from(page)
+            .limit(page_size + 1)
+            .offset(state.get('offset', 0))
+        )
+
+    descending = order_by.startswith('-')
+    key_name = order_by.lstrip('-')
+    page = statement.columns(column(key_name)).subquery('vizly_page')
+    key = page.c[key_name]
+    page_statement = (
+        select(literal_column('*')).select_from(page)
+        .order_by(key.desc() if descending else key.asc())
+        .limit(page_size + 1)
+    )
+    if 'key' in state:
+        page_statement = page_statement.where(key < state['key'] if descending else key > state['key'])
+    return page_statement
+
+
+RESULT_FORMATS = ('rows', 'columnar', 'arrow')
+
+
+class QueryExecutionError(Exception):
+    """Raised when the source database fails to run a statement"""
+
+
+class QueryCancelledError(QueryExecutionError):
+    """Raised when a monitored execution is cancelled"""
+
+
+class QueryTimeoutError(QueryExecutionError):
+    """Raised when a statement exceeds its timeout"""
+
+
+class ExecutionMonitor:
+    """Observe and interrupt an ``execute_query`` run.
+
+    ``on_start`` receives the database backend id (Postgres backend pid,
+    MySQL connection id, None for SQLite) once the connection is checked
+    out, ``on_progress`` the running row count after each fetched batch.
+    ``is_cancelled`` is polled between batches and, on SQLite, from the
+    VM progress handler while the statement itself runs.
+    """
+
+    def on_start(self, backend_id):
+        pass
+
+    def on_progress(self, rows_fetched):
+        pass
+
+    def is_cancelled(self):
+        return False
+
+
+def get_backend_id(conn):
+    """Server-side id of a checked-out connection, used to cancel its statement"""
+    dialect_name = conn.dialect.name
+    if dialect_name == 'postgresql':
+        return conn.exec_driver_sql('SELECT pg_backend_pid()').scalar()
+    if dialect_name == 'mysql':
+        return conn.exec_driver_sql('SELECT CONNECTION_ID()').scalar()
+    return None
+
+
+def cancel_backend(connection, backend_id):
+    """Abort the statement running on another session of the source database"""
+    engine = get_connection_engine(connection)
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            conn.exec_driver_sql(f'SELECT pg_cancel_backend({int(backend_id)})')
+        elif engine.dialect.name == 'mysql':
+            conn.exec_driver_sql(f'KILL QUERY {int(backend_id)}')
+
+
+def get_statement_timeout(connection, timeout=None):
+    """Resolve the timeout in seconds: explicit, then the connection's, then QUERY_STATEMENT_TIMEOUT"""
+    for value in (timeout, connection.statement_timeout, settings.QUERY_STATEMENT_TIMEOUT):
+        if value is not None:
+            return value or None
+    return None
+
+
+def set_progress_handler(conn, handler, steps):
+    """Install a SQLite VM progress handler on a checked-out connection.
+
+    aiosqlite runs statements on its own thread, so its handler is set
+    through that thread and is called from it. Returns the driver connection.
+    """
+    driver_connection = conn.connection.driver_connection
+    if conn.dialect.is_async:
+        await_only(driver_connection.set_progress_handler(handler, steps))
     else:
-        raise ValueError(f"Unsupported database type: {connection.type}")
+        driver_connection.set_progress_handler(handler, steps)
+    return driver_connection
+
+
+@contextmanager
+def guarded_connection(conn, monitor=None, timeout=None):
+    """Apply the statement timeout and cancellation hooks to a checked-out connection.
 
-    return create_engine(url)
+    Timeouts are enforced by the database itself: ``SET LOCAL
+    statement_timeout`` on Postgres (scoped to the current transaction),
+    ``max_execution_time`` on MySQL (reset before the connection returns to
+    the pool) and a VM progress handler on SQLite, which also checks the
+    monitor for cancellation. Yields the monotonic deadline, or None.
+    """
+    dialect_name = conn.dialect.name
+    deadline = time.monotonic() + timeout if timeout else None
 
+    if monitor is not None:
+        monitor.on_start(get_backend_id(conn))
+
+    if dialect_name == 'postgresql' and timeout:
+        conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout * 1000)}')
+    elif dialect_name == 'mysql' and timeout:
+        conn.exec_driver_sql(f'SET SESSION max_execution_time = {int(timeout * 1000)}')
+
+    driver_connection = None
+    if dialect_name == 'sqlite' and (timeout or monitor is not None):
+        def should_interrupt():
+            if deadline is not None and time.monotonic() >= deadline:
+                return 1
+            return int(monitor is not None and monitor.is_cancelled())
+
+        # A non-zero return aborts the running statement with "interrupted"
+        driver_connection = set_progress_handler(conn, should_interrupt, 10000)
 
-def execute_query(connection, sql):
-    """Execute SQL query on external database"""
     try:
-        engine = create_connection_engine(connection)
-        with engine.connect() as conn:
-            result = conn.execute(text(sql))
+        yield deadline
+    finally:
+        if driver_connection is not None:
+            set_progress_handler(conn, None, 0)
+        if dialect_name == 'mysql' and timeout and not conn.closed:
+            conn.exec_driver_sql('SET SESSION max_execution_time = 0')
 
-            if result.returns_rows:
-                columns = [{'name': col, 'type': str(type(val))} for col, val in zip(result.keys(), next(result, []))]
-                conn.execute(text(sql))  # Re-execute to get all rows
-                result = conn.execute(text(sql))
-                rows = [dict(row._mapping) for row in result]
 
-                return {
-                    'columns': columns,
-                    'rows': rows,
-                    'rowCount': len(rows)
-                }
-            else:
+def execution_error(error, deadline=None, timeout=None, monitor=None):
+    """Translate a driver error into the exception reported to callers"""
+    if monitor is not None and monitor.is_cancelled():
+        return QueryCancelledError('Query was cancelled')
+    if deadline is not None and time.monotonic() >= deadline:
+        return QueryTimeoutError(f'Query timed out after {timeout} seconds')
+    return QueryExecutionError(f'Query execution failed: {str(error)}')
+
+
+def fetch_batches(result, monitor=None, batch_size=None):
+    """Yield row batches from a result, reporting progress to the monitor"""
+    batch_size = batch_size or settings.QUERY_STREAM_BATCH_SIZE
+    rows_fetched = 0
+    while True:
+        if monitor is not None and monitor.is_cancelled():
+            raise QueryCancelledError('Query was cancelled')
+        batch = result.fetchmany(batch_size)
+        if not batch:
+            return
+        rows_fetched += len(batch)
+        if monitor is not None:
+            monitor.on_progress(rows_fetched)
+        yield batch
+
+
+class PhaseTimer:
+    """Accumulates milliseconds per execution phase into a ``timings`` dict"""
+
+    def __init__(self, timings=None):
+        self.timings = {} if timings is None else timings
+        self.mark = time.monotonic()
+
+    def lap(self, phase):
+        """Charge the time since the previous lap to ``phase``"""
+        now = time.monotonic()
+        self.timings[phase] = self.timings.get(phase, 0) + (now - self.mark) * 1000
+        self.mark = now
+
+    def timed(self, phase, iterable):
+        """Yield from ``iterable``, charging only the time spent producing items to ``phase``"""
+        iterator = iter(iterable)
+        while True:
+            started = time.monotonic()
+            item = next(iterator, None)
+            self.timings[phase] = self.timings.get(phase, 0) + (time.monotonic() - started) * 1000
+            if item is None:
+                return
+            yield item
+
+
+def format_result_rows(result_format, keys, columns, rows):
+    """Lay out fetched rows for the requested result format.
+
+    ``rows`` gives one dict per row, ``columnar`` one array per column (in
+    ``columns`` order) so names are not repeated per row, and ``arrow`` an
+    Arrow IPC stream payload.
+    """
+    if result_format == 'arrow':
+        payload, _ = encode_arrow_stream(columns, [rows])
+        return {'arrow': payload}
+    if result_format == 'columnar':
+        values = [list(values) for values in zip(*rows)] if rows else [[] for _ in keys]
+        return {'values': values}
+    return {'rows': [dict(zip(keys, row)) for row in rows]}
+
+
+def execute_query(connection, sql, params=None, page_size=None, cursor=None, order_by=None,
+                  result_format='rows', monitor=None, timeout=None, user=None, timings=None):
+    """Execute SQL query on external database.
+
+    ``sql`` is SQL text or a prebuilt SQLAlchemy statement (see
+    ``as_statement``). ``params`` supplies values for ``:name`` bind
+    parameters. Passing ``page_size`` with SQL text returns a single page
+    and a ``nextCursor`` token to fetch the one after it (see
+    ``paginate_statement``). ``result_format`` is one of ``RESULT_FORMATS``
+    (see ``format_result_rows``). An optional ``ExecutionMonitor`` tracks
+    progress and can cancel the run. ``timeout`` overrides the connection's
+    statement timeout (see ``get_statement_timeout``); exceeding it raises
+    ``QueryTimeoutError``. SELECTs go through the connection's cost
+    preflight first (see ``run_preflight``), which may add a ``preflight``
+    report to the result or raise ``QueryRejectedError``. The run counts
+    against ``user``'s and the connection's concurrency limits (see
+    ``admit``) and raises ``AdmissionRejectedError`` when it can't get in.
+    A ``timings`` dict, if given, receives milliseconds spent per phase:
+    ``connect`` (admission and checkout), ``execute``, ``fetch`` and
+    ``serialize``.
+    """
+    statement, page_size, state = prepare_statement(sql, page_size, cursor, order_by, result_format)
+    timeout = get_statement_timeout(connection, timeout)
+    timer = PhaseTimer(timings)
+
+    try:
+        engine = get_connection_engine(connection)
+        with admit(connection, user), checkout(connection, engine) as conn:
+            timer.lap('connect')
+            data, fetched = run_statement(
+                conn, connection, sql, statement, params, page_size, result_format, monitor, timeout, timer
+            )
+    except (AdmissionRejectedError, QueryExecutionError, QueryRejectedError):
+        raise
+    except Exception as e:
+        raise execution_error(e, timeout=timeout, monitor=monitor)
+
+    if fetched is None:
+        return data
+    return build_result(fetched, result_format, page_size, state, order_by, timer)
+
+
+def prepare_statement(sql, page_size=None, cursor=None, order_by=None, result_format='rows'):
+    """Validate execution options and build the statement to run.
+
+    Returns ``(statement, page_size, state)``: ``page_size`` is dropped for
+    statements that can't be paged, and ``state`` is the decoded ``cursor``.
+    """
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(f'Unsupported result format: {result_format}')
+
+    state = None
+    if cursor:
+        state = decode_page_cursor(cursor)
+        if state.get('order_by') != order_by:
+            raise ValueError('Page cursor does not match order_by')
+
+    if not isinstance(sql, str) or not is_select_statement(sql):
+        page_size = None
+    statement = as_statement(sql)
+    if page_size is not None:
+        statement = paginate_statement(statement, page_size, state, order_by)
+    return statement, page_size, state
+
+
+def run_statement(conn, connection, sql, statement, params, page_size, result_format, monitor, timeout, timer):
+    """Run a prepared statement on a checked-out connection.
+
+    Takes a sync ``Connection``; the async path passes this function to
+    ``AsyncConnection.run_sync``. Returns ``(data, None)`` when the result
+    is complete (writes and unpaged Arrow results), otherwise ``(None,
+    fetched)`` for ``build_result`` to lay out once the connection is back
+    in its pool.
+    """
+    deadline = None
+    try:
+        with guarded_connection(conn, monitor, timeout) as deadline:
+            preflight = None
+            if is_select_statement(sql):
+                statement, preflight = run_preflight(conn, connection, statement, params)
+            result = conn.execute(statement, params or {})
+            timer.lap('execute')
+
+            if not result.returns_rows:
                 return {
                     'columns': [],
-                    'rows': [],
+                    **format_result_rows(result_format, [], [], []),
                     'rowCount': result.rowcount
-                }
+                }, None
+
+            description = result.cursor.description
+            keys = list(result.keys())
+            batches = timer.timed('fetch', fetch_batches(result, monitor))
+
+            if result_format == 'arrow' and page_size is None:
+                # Encode straight from cursor batches instead of buffering all rows
+                first_batch = next(batches, [])
+                columns = describe_columns(
+                    conn.dialect.name, description, first_batch,
+                    functools.partial(declared_column_types, conn, statement, params)
+                )
+                payload, row_count = encode_arrow_stream(columns, itertools.chain([first_batch], batches))
+                timer.lap('serialize')
+                # Fetching was interleaved with encoding and is already charged to fetch
+                timer.timings['serialize'] -= timer.timings['fetch']
+                data = {'columns': columns, 'arrow': payload, 'rowCount': row_count}
+                if preflight:
+                    data['preflight'] = preflight
+                return data, None
+
+            rows = list(itertools.chain.from_iterable(batches))
+            columns = describe_columns(
+                conn.dialect.name, description, rows,
+                functools.partial(declared_column_types, conn, statement, params)
+            )
+            timer.mark = time.monotonic()
+            return None, (columns, keys, rows, preflight)
+    except (QueryCancelledError, QueryRejectedError):
+        raise
     except Exception as e:
-        raise Exception(f'Query execution failed: {str(e)}')
+        raise execution_error(e, deadline, timeout, monitor)
+
+
+def build_result(fetched, result_format, page_size, state, order_by, timer):
+    """Lay out rows from ``run_statement``: the next page cursor and the result format"""
+    columns, keys, rows, preflight = fetched
+    data = {'columns': columns}
+
+    if page_size is not None:
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = None
+        if has_more:
+            next_state = {'order_by': order_by}
+            if order_by:
+                next_state['key'] = rows[-1]._mapping[order_by.lstrip('-')]
+            else:
+                next_state['offset'] = (state or {}).get('offset', 0) + page_size
+            next_cursor = encode_page_cursor(next_state)
+        data['nextCursor'] = next_cursor
+
+    data.update(format_result_rows(result_format, keys, columns, rows))
+    data['rowCount'] = len(rows)
+    if preflight:
+        data['preflight'] = preflight
+    timer.lap('serialize')
+    return data
+
+
+def stream_query(connection, sql, params=None, batch_size=None, timeout=None, user=None, timings=None):
+    """Execute SQL and yield the result as NDJSON frames.
+
+    The first frame carries the column schema (and any preflight report),
+    each following frame a batch of row arrays, and the last one the total
+    row count. Rows are pulled through a server-side cursor where the driver
+    supports one, so memory stays bounded by ``batch_size`` rather than the
+    result size.
+
+    The statement runs when the first frame is requested, so callers can
+    ``next()`` the generator to surface execution errors before streaming.
+    Admission slots (see ``admit``) are held until the stream is exhausted
+    or closed. ``timings`` works as for ``execute_query``; time spent
+    waiting for the consumer is left out.
+    """
+    batch_size = batch_size or settings.QUERY_STREAM_BATCH_SIZE
+    timeout = get_statement_timeout(connection, timeout)
+    encoder = JSONEncoder()
+    timer = PhaseTimer(timings)
+
+    with admit(connection, user):
+        try:
+            engine = get_connection_engine(connection)
+        except Exception as e:
+            raise QueryExecutionError(f'Query execution failed: {str(e)}')
+
+        with checkout(connection, engine, stream_results=True, yield_per=batch_size) as conn, \
+                guarded_connection(conn, timeout=timeout) as deadline:
+            timer.lap('connect')
+            try:
+                statement, preflight = as_statement(sql), None
+                if is_select_statement(sql):
+                    statement, preflight = run_preflight(conn, connection, statement, params)
+                result = conn.execute(statement, params or {})
+                timer.lap('execute')
+                if not result.returns_rows:
+                    yield encoder.encode({'columns': []}) + '\n'
+                    yield encoder.encode({'rowCount': result.rowcount}) + '\n'
+                    return
+
+                description = result.cursor.description
+                batch = result.fetchmany(batch_size)
+                timer.lap('fetch')
+            except QueryRejectedError:
+                raise
+            except Exception as e:
+                raise execution_error(e, deadline, timeout)
+
+            columns = describe_columns(
+                engine.dialect.name, description, batch,
+                functools.partial(declared_column_types, conn, statement, params)
+            )
+            header = {'columns': columns}
+            if preflight:
+                header['preflight'] = preflight
+            frame = encoder.encode(header) + '\n'
+            timer.lap('serialize')
+            yield frame
+            timer.mark = time.monotonic()
+
+            row_count = 0
+            try:
+                while batch:
+                    row_count += len(batch)
+                    frame = encoder.encode({'rows': [list(row) for row in batch]}) + '\n'
+                    timer.lap('serialize')
+                    yield frame
+                    timer.mark = time.monotonic()
+                    batch = result.fetchmany(batch_size)
+                    timer.lap('fetch')
+            except Exception as e:
+                # Headers are already sent; report the failure in-band
+                yield json.dumps({'error': str(execution_error(e, deadline, timeout))}) + '\n'
+                return
+
+            yield encoder.encode({'rowCount': row_count}) + '\n'
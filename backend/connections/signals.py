@@ -0,0 +1,22 @@
+"""Connection model signal handlers"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Connection
+from .async_services import dispose_async_connection_engines
+from .services import dispose_connection_engine
+from vizly.metadata import invalidate_metadata
+
+
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Connection)
+def dispose_engine_on_change(sender, instance, **kwargs):
+    """Dispose the pooled engines when a connection is edited or deleted"""
+    dispose_connection_engine(instance.pk)
+    dispose_async_connection_engines(instance.pk)
+
+
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Connection)
+def invalidate_metadata_on_change(sender, instance, **kwargs):
+    invalidate_metadata(instance.user_id)
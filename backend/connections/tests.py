@@ -0,0 +1,361 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from connections import admission, schema
+from connections.async_views import ConnectionTestView
+from connections.admission import AdmissionRejectedError, admit
+from connections.cache import cached_execute_query
+from connections.models import Connection
+from connections.preflight import QueryRejectedError
+from connections.services import (
+    QueryTimeoutError, dispose_connection_engine, execute_query, get_connection_engine, get_statement_timeout,
+    stream_query
+)
+from vizly.testing import VizlyTestCase
+
+
+class EngineRegistryTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source(pool_size=2, max_overflow=1)
+
+    def test_engine_is_reused_with_its_pool_options(self):
+        engine = get_connection_engine(self.connection)
+        self.assertIs(get_connection_engine(self.connection), engine)
+        self.assertEqual(engine.pool.size(), 2)
+
+        # Connections checked in stay open for the next execution
+        execute_query(self.connection, 'SELECT 1')
+        execute_query(self.connection, 'SELECT 1')
+        self.assertEqual(engine.pool.checkedin(), 1)
+
+    def test_edited_connection_gets_a_new_engine(self):
+        engine = get_connection_engine(self.connection)
+        self.connection.pool_size = 3
+        self.connection.save()
+
+        replacement = get_connection_engine(self.connection)
+        self.assertIsNot(replacement, engine)
+        self.assertEqual(replacement.pool.size(), 3)
+
+    def test_dispose_drops_the_engine(self):
+        engine = get_connection_engine(self.connection)
+        dispose_connection_engine(self.connection.id)
+        self.assertIsNot(get_connection_engine(self.connection), engine)
+
+
+@override_settings(ADMISSION_USER_CONCURRENCY=1, ADMISSION_WAIT_TIMEOUT=0, ADMISSION_QUEUE_SIZE=1)
+class AdmissionTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source(max_concurrency=1)
+
+    def test_user_limit(self):
+        other = self.create_user('other@example.com')
+        with admit(self.connection, self.user):
+            with self.assertRaisesMessage(AdmissionRejectedError, 'for this user'):
+                with admit(self.create_source(name='second'), self.user):
+                    pass
+            # Another user only waits on the connection, and times out there
+            with self.assertRaisesMessage(AdmissionRejectedError, 'waiting for a free slot'):
+                with admit(self.connection, other):
+                    pass
+
+        with admit(self.connection, self.user):
+            pass
+
+    @override_settings(ADMISSION_WAIT_TIMEOUT=10)
+    def test_full_queue_rejects_at_once(self):
+        entered = threading.Event()
+
+        def wait_for_slot():
+            with admit(self.connection):
+                entered.set()
+
+        with admit(self.connection):
+            waiter = threading.Thread(target=wait_for_slot)
+            waiter.start()
+            self.addCleanup(waiter.join)
+            # The waiter holds the queue's only place once it has counted itself in
+            waiting_keys = [f'admission:connection:{self.connection.id}:waiting:{turn}' for turn in range(1, 4)]
+            while not any(admission.cache.get_many(waiting_keys).values()):
+                self.assertTrue(waiter.is_alive())
+                time.sleep(0.01)
+
+            with self.assertRaisesMessage(AdmissionRejectedError, 'waiting on this connection'):
+                with admit(self.connection):
+                    pass
+            self.assertFalse(entered.is_set())
+
+        waiter.join(5)
+        self.assertTrue(entered.is_set())
+
+    def test_incr_recovers_from_a_vanished_key(self):
+        # The counter is gone by the time add() finds it taken, as an evicted or expired key would be
+        with mock.patch.object(admission.cache, 'add', return_value=False):
+            admission._incr('counter', 30)
+        self.assertEqual(admission.cache.get('counter'), 1)
+
+    def test_rejected_execute_is_retryable(self):
+        query = self.create_query(self.connection)
+        with admit(self.connection, self.user):
+            response = self.client.post(f'/api/queries/{query.id}/execute/', {}, format='json')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(response.data['status'], 'error')
+
+
+class DescribeColumnsTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+
+    def column_types(self, columns):
+        return {column['name']: column['type'] for column in columns}
+
+    def test_empty_sqlite_result_uses_declared_types(self):
+        result = execute_query(self.connection, 'SELECT id, name, value FROM items WHERE id < 0')
+        self.assertEqual(self.column_types(result['columns']), {'id': 'integer', 'name': 'string', 'value': 'float'})
+
+    def test_declared_types_with_parameters_and_paging(self):
+        result = execute_query(
+            self.connection, 'SELECT id, name FROM items WHERE id = :id', params={'id': -1}, page_size=5
+        )
+        self.assertEqual(self.column_types(result['columns']), {'id': 'integer', 'name': 'string'})
+
+    def test_expressions_without_values_stay_unknown(self):
+        result = execute_query(self.connection, "SELECT name || '!' AS label, NULL AS missing FROM items")
+        self.assertEqual(self.column_types(result['columns']), {'label': 'string', 'missing': 'unknown'})
+
+    def test_empty_stream_uses_declared_types(self):
+        header = json.loads(next(stream_query(self.connection, 'SELECT id, value FROM items WHERE 0')))
+        self.assertEqual(self.column_types(header['columns']), {'id': 'integer', 'value': 'float'})
+
+
+class SchemaSearchTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+
+    def search(self, **params):
+        return self.client.get(f'/api/connections/{self.connection.id}/schema/', {'q': 'item', **params})
+
+    def test_snapshot_is_cached_until_the_connection_changes(self):
+        with mock.patch.object(schema, 'introspect_schema', wraps=schema.introspect_schema) as introspect:
+            response = self.client.get(f'/api/connections/{self.connection.id}/schema/')
+            self.client.get(f'/api/connections/{self.connection.id}/schema/')
+            self.assertEqual(introspect.call_count, 1)
+
+            self.connection.save()
+            self.client.get(f'/api/connections/{self.connection.id}/schema/')
+            self.assertEqual(introspect.call_count, 2)
+
+        [table] = response.data['data']['schema']['tables']
+        self.assertEqual((table['name'], table['type']), ('items', 'table'))
+        self.assertEqual([column['name'] for column in table['columns']], ['id', 'name', 'value'])
+
+    def test_ranking(self):
+        matches = self.search(q='name').data['data']['matches']
+        self.assertEqual(matches[0], {
+            'kind': 'column', 'schema': 'main', 'table': 'items', 'column': 'name', 'type': 'TEXT', 'score': 3.0
+        })
+        self.assertEqual(self.search(q='ite').data['data']['matches'][0]['table'], 'items')
+
+    def test_limit(self):
+        response = self.search(limit=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']['matches']), 1)
+
+    def test_limit_must_be_a_positive_integer(self):
+        for limit in ('0', '-1', 'ten'):
+            with self.subTest(limit=limit):
+                response = self.search(limit=limit)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['message'], 'limit must be a positive integer')
+
+
+class ResultPagingTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+
+    def pages(self, sql, **options):
+        ids, cursor = [], None
+        while True:
+            result = execute_query(self.connection, sql, page_size=4, cursor=cursor, **options)
+            ids.append([row['id'] for row in result['rows']])
+            cursor = result['nextCursor']
+            if cursor is None:
+                return ids
+
+    def test_offset_pages(self):
+        self.assertEqual(self.pages('SELECT id FROM items ORDER BY id'), [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]])
+
+    def test_keyset_pages(self):
+        self.assertEqual(self.pages('SELECT id FROM items', order_by='-id'), [[10, 9, 8, 7], [6, 5, 4, 3], [2, 1]])
+
+    def test_cursor_must_match(self):
+        cursor = execute_query(self.connection, 'SELECT id FROM items', page_size=4, order_by='id')['nextCursor']
+        with self.assertRaisesMessage(ValueError, 'does not match order_by'):
+            execute_query(self.connection, 'SELECT id FROM items', page_size=4, cursor=cursor)
+        with self.assertRaisesMessage(ValueError, 'Invalid page cursor'):
+            execute_query(self.connection, 'SELECT id FROM items', page_size=4, cursor=cursor[:-1])
+
+    def test_execute_pages(self):
+        query = self.create_query(self.connection)
+        response = self.client.post(f'/api/queries/{query.id}/execute/', {'page_size': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['rowCount'], 4)
+
+        cursor = response.data['data']['nextCursor']
+        response = self.client.post(
+            f'/api/queries/{query.id}/execute/', {'page_size': 4, 'cursor': cursor}, format='json'
+        )
+        self.assertEqual([row['id'] for row in response.data['data']['rows']], [5, 6, 7, 8])
+
+        response = self.client.post(f'/api/queries/{query.id}/execute/', {'page_size': 0}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ResultCacheTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+        self.sql = 'SELECT id FROM items ORDER BY id'
+
+    def test_hit_and_refresh(self):
+        self.assertFalse(cached_execute_query(self.connection, self.sql)['cache']['hit'])
+        # Reformatting the SQL doesn't change the entry
+        hit = cached_execute_query(self.connection, 'SELECT id\n  FROM items ORDER BY id;')
+        self.assertTrue(hit['cache']['hit'])
+        self.assertEqual(hit['rowCount'], 10)
+
+        refreshed = cached_execute_query(self.connection, self.sql, refresh=True)
+        self.assertFalse(refreshed['cache']['hit'])
+        self.assertNotEqual(refreshed['cache']['fingerprint'], hit['cache']['fingerprint'])
+
+    def test_ttl_zero_skips_the_cache(self):
+        cached_execute_query(self.connection, self.sql, ttl=0)
+        self.assertFalse(cached_execute_query(self.connection, self.sql, ttl=0)['cache']['hit'])
+        self.assertFalse(cached_execute_query(self.connection, self.sql)['cache']['hit'])
+
+    def test_concurrent_misses_run_once(self):
+        runs = []
+
+        def slow_execute(*args, **kwargs):
+            runs.append(args)
+            time.sleep(0.2)
+            return {'columns': [], 'rows': [], 'rowCount': 0}
+
+        with mock.patch('connections.cache.execute_query', side_effect=slow_execute):
+            with ThreadPoolExecutor(4) as executor:
+                results = list(executor.map(lambda _: cached_execute_query(self.connection, self.sql), range(4)))
+
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(sorted(result['cache']['hit'] for result in results), [False, True, True, True])
+
+
+# Counts to a hundred million, which takes SQLite several seconds
+SLOW_SQL = (
+    'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) '
+    'SELECT count(*) AS total FROM c'
+)
+
+
+class StatementTimeoutTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+
+    @override_settings(QUERY_STATEMENT_TIMEOUT=30)
+    def test_timeout_resolution(self):
+        self.assertEqual(get_statement_timeout(self.connection), 30)
+        self.connection.statement_timeout = 10
+        self.assertEqual(get_statement_timeout(self.connection), 10)
+        self.assertEqual(get_statement_timeout(self.connection, 5), 5)
+        self.assertIsNone(get_statement_timeout(self.connection, 0))
+
+    def test_slow_statement_is_interrupted(self):
+        started = time.monotonic()
+        with self.assertRaises(QueryTimeoutError):
+            execute_query(self.connection, SLOW_SQL, timeout=0.2)
+        self.assertLess(time.monotonic() - started, 2)
+
+        # The pooled connection is left without the timeout's progress handler
+        result = execute_query(self.connection, 'SELECT count(*) AS total FROM items')
+        self.assertEqual(result['rows'], [{'total': 10}])
+
+    def test_query_timeout_on_execute(self):
+        query = self.create_query(self.connection, sql=SLOW_SQL, statement_timeout=1)
+        response = self.client.post(f'/api/queries/{query.id}/execute/', {}, format='json')
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(response.data['message'], 'Query timed out after 1 seconds')
+
+
+class PreflightTests(VizlyTestCase):
+    sql = 'SELECT id FROM items'
+
+    def source(self, mode):
+        return self.create_source(preflight_mode=mode, preflight_max_rows=5)
+
+    def test_warn(self):
+        result = execute_query(self.source('warn'), self.sql)
+        self.assertEqual(result['rowCount'], 10)
+        self.assertEqual(result['preflight']['action'], 'warn')
+        self.assertEqual(result['preflight']['message'], 'Query is estimated at about 10 rows (limit 5)')
+
+    def test_limit(self):
+        result = execute_query(self.source('limit'), self.sql)
+        self.assertEqual(result['rowCount'], 5)
+        self.assertEqual(result['preflight']['action'], 'limit')
+
+    def test_reject(self):
+        connection = self.source('reject')
+        with self.assertRaisesMessage(QueryRejectedError, 'refine it before running'):
+            execute_query(connection, self.sql)
+
+        response = self.client.post(f'/api/queries/{self.create_query(connection).id}/execute/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cheap_statements_pass(self):
+        # A primary key lookup is a SEARCH, not a full scan
+        result = execute_query(self.source('reject'), 'SELECT id FROM items WHERE id = 1')
+        self.assertEqual(result['rowCount'], 1)
+        self.assertNotIn('preflight', result)
+
+
+class ConnectionTestViewTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+        self.broken = self.create_source(name='broken')
+        Connection.objects.filter(pk=self.broken.pk).update(database=str(self.source_dir / 'missing' / 'db.sqlite3'))
+
+    async def check(self, factory, connection=None, user=None):
+        pk = str((connection or self.connection).pk)
+        return await self.call_view(ConnectionTestView, factory, f'/api/connections/{pk}/test/', user=user, pk=pk)
+
+    async def test_both_servers(self):
+        other = await sync_to_async(self.create_user)('other@example.com')
+        for factory in (AsyncRequestFactory(), RequestFactory()):
+            with self.subTest(factory=type(factory).__name__):
+                try:
+                    response = await self.check(factory)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.data['data']['message'], 'Sqlite connection successful')
+
+                    response = await self.check(factory, self.broken)
+                    self.assertEqual(response.status_code, 500)
+                    self.assertTrue(response.data['message'].startswith('Connection failed: '))
+
+                    self.assertEqual((await self.check(factory, user=other)).status_code, 404)
+                    self.assertEqual((await self.check(factory, user=False)).status_code, 401)
+                finally:
+                    await self.dispose_async_engines()
@@ -1,10 +1,16 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register('', views.ConnectionViewSet, basename='connection')
 
-urlpatterns = [
+urlpatterns = []
+if settings.ASYNC_QUERY_VIEWS:
+    # Matched before the viewset's sync action
+    urlpatterns.append(path('<str:pk>/test/', async_views.ConnectionTestView.as_view(), name='connection-test-async'))
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
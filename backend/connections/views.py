@@ -3,11 +3,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Connection
+from .schema import get_schema_index, get_schema_snapshot
 from .serializers import ConnectionSerializer
 from .services import test_database_connection
+from vizly.fieldsets import SparseFieldsViewSetMixin
 
 
-class ConnectionViewSet(viewsets.ModelViewSet):
+class ConnectionViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for database connections"""
     serializer_class = ConnectionSerializer
     permission_classes = [IsAuthenticated]
@@ -16,12 +18,9 @@ class ConnectionViewSet(viewsets.ModelViewSet):
         return Connection.objects.filter(user=self.request.user)
 
     def list(self, request):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'status': 'success',
-            'data': {'connections': serializer.data}
-        })
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response({'connections': serializer.data})
 
     def retrieve(self, request, pk=None):
         try:
@@ -104,3 +103,45 @@ class ConnectionViewSet(viewsets.ModelViewSet):
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=True, methods=['get'])
+    def schema(self, request, pk=None):
+        """Get the connection's tables and columns, or search them with ?q="""
+        try:
+            connection = self.get_queryset().get(pk=pk)
+            refresh = str(request.query_params.get('refresh')).lower() in ('1', 'true')
+            snapshot = get_schema_snapshot(connection, refresh=refresh)
+
+            term = request.query_params.get('q')
+            if term is None:
+                return Response({
+                    'status': 'success',
+                    'data': {'schema': snapshot}
+                })
+
+            try:
+                limit = int(request.query_params.get('limit', 50))
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                return Response({
+                    'status': 'error',
+                    'message': 'limit must be a positive integer'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'status': 'success',
+                'data': {
+                    'matches': get_schema_index(connection, snapshot).search(term, min(limit, 500)),
+                    'introspectedAt': snapshot['introspectedAt']
+                }
+            })
+        except Connection.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Connection not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboards', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dashboard',
+            index=models.Index(fields=['user', '-updated_at'], name='dashboards_user_id_1c265a_idx'),
+        ),
+    ]
@@ -18,6 +18,7 @@ class Dashboard(models.Model):
     class Meta:
         db_table = 'dashboards'
         ordering = ['-updated_at']
+        indexes = [models.Index(fields=['user', '-updated_at'])]  # List pages
 
     def __str__(self):
         return self.name
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from .models import Dashboard, DashboardItem
 from visualizations.serializers import VisualizationSerializer
+from vizly.fieldsets import SparseFieldsMixin
 
 
-class DashboardItemSerializer(serializers.ModelSerializer):
+class DashboardItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     visualization_details = VisualizationSerializer(source='visualization', read_only=True)
 
     class Meta:
@@ -12,7 +13,7 @@ class DashboardItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class DashboardSerializer(serializers.ModelSerializer):
+class DashboardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = DashboardItemSerializer(many=True, read_only=True)
 
     class Meta:
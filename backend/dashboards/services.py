@@ -0,0 +1,139 @@
+"""Batch execution of dashboard tiles"""
+import os
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from connections.cache import cached_execute_query, result_cache_key
+from connections.services import load_password
+from queries.extracts import get_query_source
+from queries.parameters import coerce_parameters
+from queries.runs import RunTracker
+from visualizations.services import build_visualization_statement, shape_visualization_data
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return this process's executor, recreating it after a fork"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.DASHBOARD_WORKERS,
+                thread_name_prefix='dashboard'
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def plan_dashboard_runs(dashboard, values=None):
+    """Group the dashboard's tiles by the statement they need.
+
+    ``values`` are dashboard-wide parameter values; each query receives the
+    ones it declares. Tiles whose statement, connection and bind values
+    match share one run. Returns ``(runs, errors)``: runs keyed by result
+    cache key, each with the tiles it feeds as ``(item, aggregated)``, and
+    ``(item, message)`` pairs for tiles that can't run.
+    """
+    values = values or {}
+    if not isinstance(values, dict):
+        raise ValueError('params must be an object')
+
+    runs, errors = {}, []
+    for item in dashboard.items.all():
+        query = item.visualization.query
+        try:
+            connection, sql = get_query_source(query)
+            statement, aggregated = build_visualization_statement(item.visualization, sql)
+            declared = {definition['name'] for definition in query.parameters}
+            params = coerce_parameters(
+                query.parameters, {name: value for name, value in values.items() if name in declared}
+            )
+        except Exception as e:
+            errors.append((item, str(e)))
+            continue
+
+        key = result_cache_key(connection, statement, params=params)
+        if key not in runs:
+            load_password(connection)
+        run = runs.setdefault(key, {
+            'query': query, 'connection': connection, 'statement': statement, 'params': params, 'tiles': []
+        })
+        run['tiles'].append((item, aggregated))
+    return runs, errors
+
+
+def get_dashboard_data(dashboard, values=None, refresh=False, user=None):
+    """Run a dashboard's tiles; returns an iterator of ``(item, data, error)`` in finishing order.
+
+    Distinct statements run concurrently on a per-process pool of
+    ``DASHBOARD_WORKERS`` threads, with at most
+    ``DASHBOARD_CONNECTION_CONCURRENCY`` of them in flight per connection.
+    Results go through the shared result cache, so tiles also reuse runs
+    from other requests. ``dashboard`` must have its items' visualizations,
+    queries and connections loaded, since worker threads don't query the
+    database. Invalid ``values`` raise ValueError before anything runs.
+    Runs count against ``user``'s concurrency limit (see ``admit``).
+    """
+    runs, errors = plan_dashboard_runs(dashboard, values)
+    return _run_tiles(runs, errors, refresh, user)
+
+
+def _execute_run(run, refresh, user):
+    query = run['query']
+    with RunTracker('dashboard', query_id=query.id, connection=query.connection, user=user) as tracker:
+        tracker.result = cached_execute_query(
+            run['connection'], run['statement'],
+            ttl=query.cache_ttl,
+            refresh=refresh,
+            timeout=query.statement_timeout,
+            params=run['params'],
+            user=user,
+            timings=tracker.timings
+        )
+        return tracker.result
+
+
+def _run_tiles(runs, errors, refresh, user=None):
+    for item, message in errors:
+        yield item, None, message
+
+    queues = defaultdict(deque)
+    for key, run in runs.items():
+        queues[run['connection'].id].append(key)
+    running = defaultdict(int)
+    futures = {}
+    executor = _get_executor()
+
+    def submit_ready():
+        for connection_id, queue in queues.items():
+            while queue and running[connection_id] < settings.DASHBOARD_CONNECTION_CONCURRENCY:
+                key = queue.popleft()
+                future = executor.submit(_execute_run, runs[key], refresh, user)
+                futures[future] = key
+                running[connection_id] += 1
+
+    submit_ready()
+    while futures:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            run = runs[futures.pop(future)]
+            running[run['connection'].id] -= 1
+            try:
+                result = future.result()
+            except Exception as e:
+                for item, _ in run['tiles']:
+                    yield item, None, str(e)
+                continue
+
+            for item, aggregated in run['tiles']:
+                try:
+                    yield item, shape_visualization_data(item.visualization, result, aggregated), None
+                except ValueError as e:
+                    yield item, None, str(e)
+        submit_ready()
@@ -0,0 +1,18 @@
+"""Dashboard model signal handlers"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Dashboard, DashboardItem
+from vizly.metadata import invalidate_metadata
+
+
+@receiver(post_save, sender=Dashboard)
+@receiver(post_delete, sender=Dashboard)
+def invalidate_metadata_on_dashboard_change(sender, instance, **kwargs):
+    invalidate_metadata(instance.user_id)
+
+
+@receiver(post_save, sender=DashboardItem)
+@receiver(post_delete, sender=DashboardItem)
+def invalidate_metadata_on_item_change(sender, instance, **kwargs):
+    invalidate_metadata(Dashboard.objects.filter(pk=instance.dashboard_id).values_list('user_id', flat=True).first())
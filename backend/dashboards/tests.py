@@ -0,0 +1,149 @@
+import json
+from unittest import mock
+
+from dashboards import services
+from dashboards.models import Dashboard, DashboardItem
+from visualizations.models import Visualization
+from vizly.testing import VizlyTestCase
+
+
+class DashboardRevalidationTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        query = self.create_query(self.create_source())
+        self.visualization = Visualization.objects.create(
+            name='Values', type='line', config={'xAxis': 'id', 'yAxis': 'value'}, query=query
+        )
+        self.dashboard = Dashboard.objects.create(name='Overview', user=self.user)
+        DashboardItem.objects.create(dashboard=self.dashboard, visualization=self.visualization)
+
+    def retrieve(self, **headers):
+        return self.client.get(f'/api/dashboards/{self.dashboard.id}/', **headers)
+
+    def test_unchanged_dashboard_is_not_modified(self):
+        etag = self.retrieve()['ETag']
+        response = self.retrieve(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+
+    def test_changes_to_the_dashboard_or_its_tiles_are_sent(self):
+        etag = self.retrieve()['ETag']
+        self.visualization.name = 'Renamed'
+        self.visualization.save()
+        response = self.retrieve(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['dashboard']['items'][0]['visualization_details']['name'], 'Renamed')
+
+        etag = response['ETag']
+        self.dashboard.name = 'Renamed'
+        self.dashboard.save()
+        self.assertEqual(self.retrieve(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class DashboardDataTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        query = self.create_query(self.create_source())
+        self.dashboard = Dashboard.objects.create(name='Overview', user=self.user)
+        self.line, self.area, self.bar, self.broken = [
+            self.add_tile(query, chart_type, **config) for chart_type, config in (
+                ('line', {'xAxis': 'id', 'yAxis': 'value'}),
+                ('area', {'xAxis': 'id', 'yAxis': 'value'}),
+                ('bar', {'xAxis': 'name', 'yAxis': 'value', 'aggregation': 'sum'}),
+                ('bar', {'xAxis': 'name', 'yAxis': 'value', 'aggregation': 'median'}),
+            )
+        ]
+
+    def add_tile(self, query, chart_type, **config):
+        visualization = Visualization.objects.create(name=chart_type, type=chart_type, config=config, query=query)
+        DashboardItem.objects.create(dashboard=self.dashboard, visualization=visualization)
+        return visualization
+
+    def test_tiles_sharing_a_statement_run_it_once(self):
+        with mock.patch.object(services, 'cached_execute_query', wraps=services.cached_execute_query) as execute:
+            response = self.client.get(f'/api/dashboards/{self.dashboard.id}/data/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(execute.call_count, 2)
+
+        tiles = {tile['visualization']: tile for tile in response.data['data']['items']}
+        self.assertEqual(tiles[self.line.id]['data']['rows'], tiles[self.area.id]['data']['rows'])
+        self.assertEqual(tiles[self.bar.id]['data']['rowCount'], 10)
+        self.assertEqual(tiles[self.broken.id]['error'], 'Unsupported aggregation: median')
+
+    def test_worker_threads_do_not_query_the_database(self):
+        with self.assertNoWorkerQueries():
+            response = self.client.get(f'/api/dashboards/{self.dashboard.id}/data/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_stream(self):
+        response = self.client.get(f'/api/dashboards/{self.dashboard.id}/data/?stream=true')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        frames = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(frames), 4)
+        # Tiles that can't run are reported first
+        self.assertEqual(frames[0]['error'], 'Unsupported aggregation: median')
+
+
+class DashboardFieldsetTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        query = self.create_query(self.create_source())
+        visualization = Visualization.objects.create(name='Values', type='bar', config={}, query=query)
+        for name in ('First', 'Second'):
+            dashboard = Dashboard.objects.create(name=name, user=self.user)
+            DashboardItem.objects.create(dashboard=dashboard, visualization=visualization)
+        self.dashboard = dashboard
+
+    def list(self, **params):
+        response = self.client.get('/api/dashboards/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']['dashboards']
+
+    def test_lists_leave_nested_serializers_out(self):
+        with self.assertNumQueries(1):
+            dashboards = self.list()
+        self.assertNotIn('items', dashboards[0])
+
+        with self.assertNumQueries(2):
+            dashboards = self.list(expand='items')
+        self.assertEqual(len(dashboards[0]['items']), 1)
+        self.assertNotIn('visualization_details', dashboards[0]['items'][0])
+
+    def test_expanded_relations_are_joined_into_one_query(self):
+        with self.assertNumQueries(2):
+            dashboards = self.list(expand='items.visualization_details.query_details')
+        details = dashboards[0]['items'][0]['visualization_details']
+        self.assertEqual(details['name'], 'Values')
+        self.assertEqual(details['query_details']['name'], 'Items')
+        self.assertNotIn('connection_details', details['query_details'])
+
+    def test_fields(self):
+        self.assertEqual(self.list(fields='id,name'), [
+            {'id': str(dashboard.id), 'name': dashboard.name}
+            for dashboard in Dashboard.objects.order_by('-updated_at', '-id')
+        ])
+        response = self.client.get(f'/api/dashboards/{self.dashboard.id}/', {'fields': 'name,items.position'})
+        self.assertEqual(response.data['data']['dashboard'], {'name': 'Second', 'items': [{'position': {}}]})
+
+    def test_writes_ignore_fields(self):
+        # Updates are partial (the viewsets take PUT)
+        response = self.client.put(
+            f'/api/dashboards/{self.dashboard.id}/?fields=id', {'description': 'Updated'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.dashboard.refresh_from_db()
+        self.assertEqual(self.dashboard.description, 'Updated')
+
+        response = self.client.post('/api/dashboards/?fields=id', {'description': 'No name'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('name', response.data['message'])
+
+        response = self.client.post('/api/dashboards/?fields=id', {'name': 'Third', 'is_public': True}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(response.data['data']['dashboard']), ['id'])
+        self.assertTrue(Dashboard.objects.get(name='Third').is_public)
+
+    def test_retrieve_includes_everything(self):
+        response = self.client.get(f'/api/dashboards/{self.dashboard.id}/')
+        item = response.data['data']['dashboard']['items'][0]
+        self.assertEqual(item['visualization_details']['query_details']['connection_details']['type'], 'sqlite')
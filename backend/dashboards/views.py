@@ -1,34 +1,96 @@
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Dashboard
+from rest_framework.utils.encoders import JSONEncoder
+from .models import Dashboard, DashboardItem
 from .serializers import DashboardSerializer
+from .services import get_dashboard_data
+from queries.views import get_flag
+from vizly.conditional import make_etag, not_modified, with_etag
+from vizly.fieldsets import SparseFieldsViewSetMixin
+from vizly.metadata import get_cached_metadata
 
 
-class DashboardViewSet(viewsets.ModelViewSet):
+def tile_frame(item, data, error):
+    frame = {'item': item.id, 'visualization': item.visualization_id}
+    if error is None:
+        frame['data'] = data
+    else:
+        frame['error'] = error
+    return frame
+
+
+# Relations joined into the items query for each expanded field
+ITEM_RELATIONS = {
+    'items.visualization_details': 'visualization',
+    'items.visualization_details.query_details': 'visualization__query',
+    'items.visualization_details.query_details.connection_details': 'visualization__query__connection',
+    'items.visualization_details.query_details.extract': 'visualization__query__extract',
+}
+
+
+def get_user_dashboard(user, pk):
+    """A user's dashboard with every item's visualization, query and connection, through the metadata cache"""
+    items = DashboardItem.objects.select_related(*ITEM_RELATIONS.values()).defer(
+        'visualization__query__connection__password'
+    )
+    return get_cached_metadata(
+        user.id, 'dashboard', pk,
+        lambda: Dashboard.objects.prefetch_related(Prefetch('items', queryset=items)).get(pk=pk, user=user)
+    )
+
+
+def dashboard_etag(dashboard, *fieldsets):
+    """ETag covering everything the dashboard serializer includes, from a dashboard with its items loaded.
+
+    ``fieldsets`` are the request's ``fields`` and ``expand``, which change
+    the representation.
+    """
+    items = []
+    for item in dashboard.items.all():
+        query = item.visualization.query
+        extract = getattr(query, 'extract', None)
+        items.append([
+            str(item.id), item.position, item.visualization.updated_at, query.updated_at, query.last_refreshed_at,
+            query.connection.updated_at, extract and extract.refreshed_at
+        ])
+    return make_etag(str(dashboard.id), dashboard.updated_at, items, *fieldsets)
+
+
+class DashboardViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for dashboards"""
     serializer_class = DashboardSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Dashboard.objects.filter(user=self.request.user).prefetch_related('items__visualization__query')
+        queryset = Dashboard.objects.filter(user=self.request.user)
+        if not self.is_expanded('items'):
+            return queryset
+        # Expanded relations are joined into the one query that fetches the items
+        items = DashboardItem.objects.select_related(*self.expanded_lookups(ITEM_RELATIONS))
+        return queryset.prefetch_related(Prefetch('items', queryset=items))
 
     def list(self, request):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'status': 'success',
-            'data': {'dashboards': serializer.data}
-        })
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response({'dashboards': serializer.data})
 
     def retrieve(self, request, pk=None):
         try:
-            dashboard = self.get_queryset().get(pk=pk)
+            dashboard = get_user_dashboard(request.user, pk)
+            etag = dashboard_etag(dashboard, *self.get_fieldsets())
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+
             serializer = self.get_serializer(dashboard)
-            return Response({
+            return with_etag(request, Response({
                 'status': 'success',
                 'data': {'dashboard': serializer.data}
-            })
+            }), etag)
         except Dashboard.DoesNotExist:
             return Response({
                 'status': 'error',
@@ -81,3 +143,45 @@ class DashboardViewSet(viewsets.ModelViewSet):
                 'status': 'error',
                 'message': 'Dashboard not found'
             }, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=True, methods=['get', 'post'])
+    def data(self, request, pk=None):
+        """Get the data for every tile, running shared queries once"""
+        try:
+            dashboard = get_user_dashboard(request.user, pk)
+            tiles = get_dashboard_data(
+                dashboard,
+                values=request.data.get('params'),
+                refresh=get_flag(request, 'refresh'),
+                user=request.user
+            )
+
+            if get_flag(request, 'stream'):
+                encoder = JSONEncoder()
+                response = StreamingHttpResponse(
+                    (encoder.encode(tile_frame(*tile)) + '\n' for tile in tiles),
+                    content_type='application/x-ndjson'
+                )
+                response['Cache-Control'] = 'no-cache'
+                response['X-Accel-Buffering'] = 'no'
+                return response
+
+            return Response({
+                'status': 'success',
+                'data': {'items': [tile_frame(*tile) for tile in tiles]}
+            })
+        except Dashboard.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Dashboard not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,22 @@
+"""Gunicorn hooks, loaded automatically when Gunicorn starts from this directory.
+
+Workers share Prometheus metrics through files in PROMETHEUS_MULTIPROC_DIR,
+which is wiped when the server starts and pruned of each worker's live
+gauges when the worker exits.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'vizly-metrics'))
+
+
+def on_starting(server):
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Query
+from .models import Query, QueryRun
 
 
 @admin.register(Query)
@@ -8,3 +8,11 @@ class QueryAdmin(admin.ModelAdmin):
     list_filter = ['connection__type', 'created_at']
     search_fields = ['name', 'description', 'sql']
     readonly_fields = ['id', 'created_at', 'updated_at']
+
+
+@admin.register(QueryRun)
+class QueryRunAdmin(admin.ModelAdmin):
+    list_display = ['query', 'source', 'duration_ms', 'row_count', 'payload_bytes', 'cache_hit', 'error_class',
+                    'created_at']
+    list_filter = ['source', 'cache_hit', 'created_at']
+    readonly_fields = ['id', 'created_at']
@@ -0,0 +1,144 @@
+"""Async versions of the query execute endpoints, served when ASYNC_QUERY_VIEWS is set"""
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .extracts import get_query_source
+from .jobs import JobQueueFullError, submit_query_job
+from .models import Query
+from .parameters import coerce_parameters
+from .runs import RunTracker
+from .views import (
+    RESULT_RENDERER_CLASSES, conditional_result_response, get_flag, get_paging_options, get_raw_params,
+    get_result_format, get_user_query, job_response, result_response
+)
+from connections.admission import AdmissionRejectedError
+from connections.async_services import aexecute_query
+from connections.cache import acached_execute_query
+from connections.models import Connection
+from connections.services import QueryTimeoutError
+from vizly.async_views import AsyncAPIView
+
+
+class QueryExecuteView(AsyncAPIView):
+    """Execute a saved query on the event loop"""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = RESULT_RENDERER_CLASSES
+
+    async def post(self, request, pk=None):
+        try:
+            query = await sync_to_async(get_user_query)(request.user, pk)
+            options = {
+                'params': coerce_parameters(query.parameters, request.data.get('params')),
+                'result_format': get_result_format(request),
+                'timeout': query.statement_timeout,
+                **get_paging_options(request)
+            }
+            # Extract queries may rebuild their extract first
+            connection, sql = await sync_to_async(get_query_source)(query)
+            if get_flag(request, 'async'):
+                job = await sync_to_async(submit_query_job)(request.user, connection, sql, query_id=query.id, **options)
+                return job_response(job, status.HTTP_202_ACCEPTED)
+
+            with RunTracker('execute', query_id=query.id, connection=query.connection, user=request.user) as run:
+                run.result = await acached_execute_query(
+                    connection, sql,
+                    ttl=query.cache_ttl,
+                    refresh=get_flag(request, 'refresh'),
+                    user=request.user,
+                    timings=run.timings,
+                    **options
+                )
+                return run.attach(conditional_result_response(request, run.result))
+        except Query.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Query not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except JobQueueFullError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except QueryTimeoutError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except AdmissionRejectedError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RawQueryExecuteView(AsyncAPIView):
+    """Execute raw SQL on the event loop"""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = RESULT_RENDERER_CLASSES
+
+    async def post(self, request):
+        try:
+            connection_id = request.data.get('connection_id')
+            sql = request.data.get('sql')
+
+            if not connection_id or not sql:
+                return Response({
+                    'status': 'error',
+                    'message': 'connection_id and sql are required'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            connection = await Connection.objects.aget(pk=connection_id, user=request.user)
+            options = {
+                'params': get_raw_params(request),
+                'result_format': get_result_format(request),
+                **get_paging_options(request)
+            }
+            if get_flag(request, 'async'):
+                job = await sync_to_async(submit_query_job)(request.user, connection, sql, **options)
+                return job_response(job, status.HTTP_202_ACCEPTED)
+
+            with RunTracker('execute', connection=connection, user=request.user) as run:
+                run.result = await aexecute_query(connection, sql, user=request.user, timings=run.timings, **options)
+                return run.attach(result_response(run.result))
+        except Connection.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Connection not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except JobQueueFullError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except QueryTimeoutError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except AdmissionRejectedError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,183 @@
+"""Materialized query extracts.
+
+A query in ``extract`` mode is run once against its source database and the
+result written to a local SQLite file under ``EXTRACT_ROOT``. Executions,
+streams and visualization aggregations then run against that file through a
+transient SQLite ``Connection``, so they get the same pooling, caching and
+pushdown as any other connection without touching the source.
+"""
+import functools
+import json
+import os
+import sqlite3
+import time
+import uuid
+from datetime import date, datetime, time as time_of_day, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Extract
+from .parameters import coerce_parameters
+from connections.admission import admit
+from connections.models import Connection
+from connections.services import (
+    build_statement, checkout, declared_column_types, describe_columns, execution_error, get_connection_engine,
+    get_statement_timeout, guarded_connection
+)
+
+EXTRACT_TABLE = 'extract_data'
+EXTRACT_SQL = f'SELECT * FROM {EXTRACT_TABLE}'
+
+# Column types from describe_columns mapped to SQLite column affinities
+SQLITE_AFFINITIES = {
+    'integer': 'INTEGER',
+    'boolean': 'INTEGER',
+    'float': 'REAL',
+    'decimal': 'REAL',
+    'interval': 'REAL',
+    'binary': 'BLOB',
+}
+
+
+def extract_path(query_id):
+    return os.path.join(settings.EXTRACT_ROOT, f'{query_id}.sqlite3')
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _to_sqlite_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time_of_day)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _write_extract(path, columns, batches):
+    """Write rows into a fresh SQLite file and return the row count"""
+    names = [column['name'] for column in columns]
+    if len(set(names)) != len(names):
+        raise ValueError('Extract columns must have unique names')
+
+    db = sqlite3.connect(path)
+    try:
+        # The file is swapped in only once complete, so skip the journal
+        db.execute('PRAGMA journal_mode = OFF')
+        db.execute('PRAGMA synchronous = OFF')
+        db.execute('CREATE TABLE {} ({})'.format(EXTRACT_TABLE, ', '.join(
+            f"{_quote(column['name'])} {SQLITE_AFFINITIES.get(column['type'], 'TEXT')}" for column in columns
+        )))
+        insert = 'INSERT INTO {} VALUES ({})'.format(EXTRACT_TABLE, ', '.join('?' * len(columns)))
+        row_count = 0
+        for batch in batches:
+            db.executemany(insert, [tuple(_to_sqlite_value(value) for value in row) for row in batch])
+            row_count += len(batch)
+        db.commit()
+        return row_count
+    finally:
+        db.close()
+
+
+def refresh_extract(query, user=None):
+    """Snapshot the query's result from its source database into its extract.
+
+    Rows are streamed from the source in ``QUERY_STREAM_BATCH_SIZE`` batches
+    and the new file replaces the old one atomically, so readers never see a
+    partial extract. The source run counts against the connection's (and
+    ``user``'s) concurrency limits. Returns the updated ``Extract``.
+    """
+    started = time.monotonic()
+    os.makedirs(settings.EXTRACT_ROOT, exist_ok=True)
+    path = extract_path(query.id)
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    batch_size = settings.QUERY_STREAM_BATCH_SIZE
+    timeout = get_statement_timeout(query.connection, query.statement_timeout)
+    params = coerce_parameters(query.parameters, None)
+
+    try:
+        engine = get_connection_engine(query.connection)
+        with admit(query.connection, user), \
+                checkout(query.connection, engine, stream_results=True, yield_per=batch_size) as conn, \
+                guarded_connection(conn, timeout=timeout) as deadline:
+            try:
+                statement = build_statement(query.sql)
+                result = conn.execute(statement, params)
+                if not result.returns_rows:
+                    raise ValueError('Only queries that return rows can be extracted')
+                first_batch = result.fetchmany(batch_size)
+                columns = describe_columns(
+                    engine.dialect.name, result.cursor.description, first_batch,
+                    functools.partial(declared_column_types, conn, statement, params)
+                )
+
+                def batches():
+                    yield first_batch
+                    while batch := result.fetchmany(batch_size):
+                        yield batch
+
+                row_count = _write_extract(temp_path, columns, batches())
+            except ValueError:
+                raise
+            except Exception as e:
+                raise execution_error(e, deadline, timeout)
+
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    extract, _ = Extract.objects.update_or_create(query=query, defaults={
+        'sql': query.sql,
+        'columns': columns,
+        'row_count': row_count,
+        'size_bytes': os.path.getsize(path),
+        'refresh_duration': time.monotonic() - started,
+        'refreshed_at': timezone.now(),
+    })
+    query.extract = extract
+    return extract
+
+
+def get_extract_connection(extract):
+    """Transient SQLite connection for reading an extract.
+
+    Keyed by the extract's id and refresh time, so every refresh gets a new
+    engine and new result cache keys. Reads are local, so the file has no
+    connection concurrency limit.
+    """
+    return Connection(
+        id=extract.id,
+        name=f'Extract {extract.id}',
+        type='sqlite',
+        database=extract_path(extract.query_id),
+        max_concurrency=0,
+        updated_at=extract.refreshed_at
+    )
+
+
+def get_query_source(query):
+    """Return the ``(connection, sql)`` that executions of a query run against.
+
+    Live queries run on their own connection. Extract queries read their
+    extract, which is built on first use and rebuilt once the SQL changes.
+    """
+    if query.mode != 'extract':
+        return query.connection, query.sql
+
+    try:
+        extract = query.extract
+    except Extract.DoesNotExist:
+        extract = None
+    if extract is None or extract.sql != query.sql or not os.path.exists(extract_path(query.id)):
+        extract = refresh_extract(query)
+    return get_extract_connection(extract), EXTRACT_SQL
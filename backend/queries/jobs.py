@@ -0,0 +1,172 @@
+"""Background query jobs.
+
+Jobs run on a bounded per-process thread pool. Their state lives in the
+shared cache so any worker can report status, return the result or request
+cancellation, whichever process is actually running the statement.
+"""
+import os
+import pickle
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .runs import RunTracker
+from connections.services import (
+    ExecutionMonitor, QueryCancelledError, QueryTimeoutError, cancel_backend, execute_query, load_password
+)
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'timeout', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'timeout', 'cancelled')
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job executor has no free queue slots"""
+
+
+_executor = None
+_executor_pid = None
+_executor_slots = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return this process's executor, recreating it after a fork"""
+    global _executor, _executor_pid, _executor_slots
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.QUERY_JOB_WORKERS,
+                thread_name_prefix='query-job'
+            )
+            _executor_slots = threading.BoundedSemaphore(
+                settings.QUERY_JOB_WORKERS + settings.QUERY_JOB_QUEUE_SIZE
+            )
+            _executor_pid = os.getpid()
+        return _executor, _executor_slots
+
+
+def _job_key(job_id, suffix=''):
+    return f'query-job:{job_id}{suffix}'
+
+
+def get_job(job_id, user):
+    """Return the job record if it exists and belongs to ``user``"""
+    job = cache.get(_job_key(job_id))
+    if job is None or job['userId'] != str(user.pk):
+        return None
+    return job
+
+
+def get_job_result(job_id):
+    payload = cache.get(_job_key(job_id, ':result'))
+    return pickle.loads(payload) if payload is not None else None
+
+
+def _save_job(job):
+    cache.set(_job_key(job['id']), job, settings.QUERY_JOB_RETENTION)
+
+
+def _update_job(job, **changes):
+    job.update(changes)
+    _save_job(job)
+
+
+class JobMonitor(ExecutionMonitor):
+    """Publishes progress to the job record and watches for cancellation"""
+
+    def __init__(self, job):
+        self.job = job
+        self.cancelled = threading.Event()
+        self.last_checked = 0
+
+    def on_start(self, backend_id):
+        _update_job(self.job, backendId=backend_id)
+        # Catch a cancel that arrived before the backend id was published
+        self.last_checked = 0
+
+    def on_progress(self, rows_fetched):
+        _update_job(self.job, rowsFetched=rows_fetched)
+
+    def is_cancelled(self):
+        # Also called from SQLite's progress handler, so poll the cache sparingly
+        now = time.monotonic()
+        if not self.cancelled.is_set() and now - self.last_checked >= 1:
+            self.last_checked = now
+            if cache.get(_job_key(self.job['id'], ':cancel')):
+                self.cancelled.set()
+        return self.cancelled.is_set()
+
+
+def submit_query_job(user, connection, sql, query_id=None, **options):
+    """Queue SQL for background execution and return the job record.
+
+    ``options`` are passed through to ``execute_query``. Raises
+    ``JobQueueFullError`` when this worker's executor is saturated.
+    """
+    # The job's thread doesn't query the internal database
+    load_password(connection)
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        raise JobQueueFullError('Too many queued query jobs, try again later')
+
+    job = {
+        'id': uuid.uuid4().hex,
+        'status': 'queued',
+        'queryId': str(query_id) if query_id else None,
+        'connectionId': str(connection.id),
+        'userId': str(user.pk),
+        'backendId': None,
+        'rowsFetched': 0,
+        'rowCount': None,
+        'error': None,
+        'submittedAt': time.time(),
+        'startedAt': None,
+        'finishedAt': None,
+    }
+    _save_job(job)
+
+    def run():
+        try:
+            _run_job(job, connection, sql, {**options, 'user': user})
+        finally:
+            slots.release()
+
+    executor.submit(run)
+    return job
+
+
+def _run_job(job, connection, sql, options):
+    monitor = JobMonitor(job)
+    if monitor.is_cancelled():
+        _update_job(job, status='cancelled', finishedAt=time.time())
+        return
+
+    _update_job(job, status='running', startedAt=time.time())
+    try:
+        with RunTracker('job', query_id=job['queryId'], connection=connection, user=options.get('user')) as run:
+            result = run.result = execute_query(connection, sql, monitor=monitor, timings=run.timings, **options)
+            payload = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+            run.finish(payload_bytes=len(payload))
+    except QueryCancelledError:
+        _update_job(job, status='cancelled', finishedAt=time.time())
+        return
+    except QueryTimeoutError as e:
+        _update_job(job, status='timeout', error=str(e), finishedAt=time.time())
+        return
+    except Exception as e:
+        _update_job(job, status='failed', error=str(e), finishedAt=time.time())
+        return
+
+    cache.set(_job_key(job['id'], ':result'), payload, settings.QUERY_JOB_RETENTION)
+    _update_job(job, status='succeeded', rowCount=result['rowCount'], finishedAt=time.time())
+
+
+def cancel_job(job, connection):
+    """Flag a job as cancelled and abort its statement on ``connection``, if given"""
+    cache.set(_job_key(job['id'], ':cancel'), True, settings.QUERY_JOB_RETENTION)
+    if connection is not None and job['status'] == 'running' and job['backendId'] is not None:
+        cancel_backend(connection, job['backendId'])
@@ -0,0 +1,33 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from queries.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = 'Refresh scheduled queries and warm the result cache ahead of demand'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run one pass over due queries and exit')
+        parser.add_argument('--workers', type=int, help='Concurrent refreshes (default SCHEDULER_WORKERS)')
+        parser.add_argument(
+            '--jitter', type=int, help='Max random delay per refresh in seconds (default SCHEDULER_JITTER)'
+        )
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler(workers=options['workers'], jitter=options['jitter'])
+
+        if options['once']:
+            started = scheduler.tick()
+            scheduler.shutdown()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {started} queries'))
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+        self.stdout.write(f'Scheduler polling every {scheduler.poll_interval}s')
+        scheduler.run_forever(stop)
+        scheduler.shutdown()
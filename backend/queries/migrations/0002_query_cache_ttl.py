@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queries', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='query',
+            name='cache_ttl',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
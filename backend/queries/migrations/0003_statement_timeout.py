@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queries', '0002_query_cache_ttl'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='query',
+            name='statement_timeout',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
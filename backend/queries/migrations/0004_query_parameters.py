@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queries', '0003_statement_timeout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='query',
+            name='parameters',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
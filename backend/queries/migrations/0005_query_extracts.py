@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:26
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queries', '0004_query_parameters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='query',
+            name='mode',
+            field=models.CharField(choices=[('live', 'Live'), ('extract', 'Extract')], default='live', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='Extract',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sql', models.TextField()),
+                ('columns', models.JSONField(default=list)),
+                ('row_count', models.PositiveBigIntegerField(default=0)),
+                ('size_bytes', models.PositiveBigIntegerField(default=0)),
+                ('refresh_duration', models.FloatField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('query', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='extract', to='queries.query')),
+            ],
+            options={
+                'db_table': 'query_extracts',
+            },
+        ),
+    ]
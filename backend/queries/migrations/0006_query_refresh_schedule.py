@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queries', '0005_query_extracts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='query',
+            name='last_refreshed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='query',
+            name='refresh_cron',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='query',
+            name='refresh_interval',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
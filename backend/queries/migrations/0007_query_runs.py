@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-17 02:38
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connections', '0005_connection_max_concurrency'),
+        ('queries', '0006_query_refresh_schedule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('source', models.CharField(choices=[('execute', 'Execute'), ('stream', 'Stream'), ('job', 'Background job'), ('visualization', 'Visualization'), ('dashboard', 'Dashboard'), ('scheduled', 'Scheduled refresh')], max_length=20)),
+                ('duration_ms', models.FloatField()),
+                ('connect_ms', models.FloatField(blank=True, null=True)),
+                ('execute_ms', models.FloatField(blank=True, null=True)),
+                ('fetch_ms', models.FloatField(blank=True, null=True)),
+                ('serialize_ms', models.FloatField(blank=True, null=True)),
+                ('row_count', models.BigIntegerField(blank=True, null=True)),
+                ('payload_bytes', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('cache_hit', models.BooleanField(default=False)),
+                ('error_class', models.CharField(blank=True, default='', max_length=100)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('connection', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='runs', to='connections.connection')),
+                ('query', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='queries.query')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='query_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'query_runs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['query', 'created_at'], name='query_runs_query_i_e1e5bb_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connections', '0006_list_index'),
+        ('queries', '0007_query_runs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='query',
+            index=models.Index(fields=['user', '-updated_at'], name='queries_user_id_01022e_idx'),
+        ),
+    ]
@@ -6,10 +6,22 @@ import uuid
 
 class Query(models.Model):
     """Saved SQL query"""
+    MODE_CHOICES = [
+        ('live', 'Live'),
+        ('extract', 'Extract'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
     sql = models.TextField()
+    parameters = models.JSONField(default=list, blank=True)  # [{name, type, default, required}]
+    cache_ttl = models.PositiveIntegerField(null=True, blank=True)  # Seconds; null uses QUERY_CACHE_TTL, 0 disables
+    statement_timeout = models.PositiveIntegerField(null=True, blank=True)  # Seconds; null uses the connection's
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='live')
+    refresh_interval = models.PositiveIntegerField(null=True, blank=True)  # Seconds between scheduled refreshes
+    refresh_cron = models.CharField(max_length=100, blank=True, default='')  # Cron schedule, used without an interval
+    last_refreshed_at = models.DateTimeField(null=True, blank=True)
     connection = models.ForeignKey(Connection, on_delete=models.CASCADE, related_name='queries')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='queries')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -18,7 +30,64 @@ class Query(models.Model):
     class Meta:
         db_table = 'queries'
         ordering = ['-updated_at']
+        indexes = [models.Index(fields=['user', '-updated_at'])]  # List pages
         verbose_name_plural = 'Queries'
 
     def __str__(self):
         return self.name
+
+
+class Extract(models.Model):
+    """Local snapshot of a query's result, served in place of the source database"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    query = models.OneToOneField(Query, on_delete=models.CASCADE, related_name='extract')
+    sql = models.TextField()  # SQL the snapshot was taken with
+    columns = models.JSONField(default=list)
+    row_count = models.PositiveBigIntegerField(default=0)
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    refresh_duration = models.FloatField(default=0)  # Seconds
+    refreshed_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'query_extracts'
+
+    def __str__(self):
+        return f"Extract of {self.query.name}"
+
+
+class QueryRun(models.Model):
+    """One execution against a source database or extract, with its timings and size"""
+    SOURCE_CHOICES = [
+        ('execute', 'Execute'),
+        ('stream', 'Stream'),
+        ('job', 'Background job'),
+        ('visualization', 'Visualization'),
+        ('dashboard', 'Dashboard'),
+        ('scheduled', 'Scheduled refresh'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    query = models.ForeignKey(Query, on_delete=models.CASCADE, null=True, blank=True, related_name='runs')
+    connection = models.ForeignKey(Connection, on_delete=models.SET_NULL, null=True, blank=True, related_name='runs')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='query_runs')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    duration_ms = models.FloatField()  # Total, request to rendered response where there is one
+    connect_ms = models.FloatField(null=True, blank=True)  # Admission and connection checkout
+    execute_ms = models.FloatField(null=True, blank=True)
+    fetch_ms = models.FloatField(null=True, blank=True)
+    serialize_ms = models.FloatField(null=True, blank=True)
+    row_count = models.BigIntegerField(null=True, blank=True)
+    payload_bytes = models.PositiveBigIntegerField(null=True, blank=True)
+    cache_hit = models.BooleanField(default=False)
+    error_class = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'query_runs'
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['query', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.source} run at {self.created_at}"
@@ -0,0 +1,91 @@
+"""Typed parameters for saved queries.
+
+A query declares its parameters as a list of
+``{"name", "type", "default", "required"}`` objects and references them in
+its SQL as ``:name`` bind parameters. Values supplied at execution time are
+coerced to the declared type before being bound.
+"""
+import re
+from datetime import date, datetime
+
+from django.utils.dateparse import parse_date, parse_datetime
+
+PARAMETER_TYPES = ('string', 'integer', 'float', 'boolean', 'date', 'datetime')
+PARAMETER_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def validate_parameter_definitions(definitions, sql):
+    """Check parameter declarations against the SQL; raises ValueError"""
+    if not isinstance(definitions, list):
+        raise ValueError('parameters must be a list')
+
+    names = set()
+    for definition in definitions:
+        if not isinstance(definition, dict):
+            raise ValueError('Each parameter must be an object')
+        name = definition.get('name')
+        if not isinstance(name, str) or not PARAMETER_NAME.match(name):
+            raise ValueError(f'Invalid parameter name: {name!r}')
+        if name in names:
+            raise ValueError(f'Duplicate parameter: {name}')
+        if definition.get('type', 'string') not in PARAMETER_TYPES:
+            raise ValueError(f"Parameter {name} must have a type in: {', '.join(PARAMETER_TYPES)}")
+        if not re.search(rf'(?<![:\w]):{name}\b', sql):
+            raise ValueError(f'Parameter {name} is not used in the SQL as :{name}')
+        if definition.get('default') is not None:
+            coerce_value(definition, definition['default'])
+        names.add(name)
+
+
+def coerce_value(definition, value):
+    """Convert a supplied value to the parameter's declared type"""
+    if value is None:
+        return None
+
+    name = definition['name']
+    parameter_type = definition.get('type', 'string')
+    try:
+        if parameter_type == 'integer':
+            if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+                raise ValueError
+            return int(value)
+        if parameter_type == 'float':
+            if isinstance(value, bool):
+                raise ValueError
+            return float(value)
+        if parameter_type == 'boolean':
+            if isinstance(value, bool):
+                return value
+            return {'true': True, '1': True, 'false': False, '0': False}[str(value).lower()]
+        if parameter_type == 'date':
+            parsed = value if isinstance(value, date) else parse_date(str(value))
+        elif parameter_type == 'datetime':
+            parsed = value if isinstance(value, datetime) else parse_datetime(str(value))
+        else:
+            return str(value)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f'Parameter {name} must be a valid {parameter_type}')
+
+    if parsed is None:
+        raise ValueError(f'Parameter {name} must be a valid {parameter_type}')
+    return parsed
+
+
+def coerce_parameters(definitions, values):
+    """Build bind values from supplied values and declared defaults; raises ValueError"""
+    values = values or {}
+    if not isinstance(values, dict):
+        raise ValueError('params must be an object')
+
+    declared = {definition['name']: definition for definition in definitions or []}
+    unknown = set(values) - set(declared)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+
+    params = {}
+    for name, definition in declared.items():
+        value = values.get(name, definition.get('default'))
+        if value is None and definition.get('required'):
+            raise ValueError(f'Parameter {name} is required')
+        params[name] = coerce_value(definition, value)
+    return params
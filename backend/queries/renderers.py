@@ -0,0 +1,29 @@
+"""Result renderers for query execution endpoints"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """Column-oriented JSON, selected with ``?format=columnar``"""
+    media_type = 'application/vnd.vizly.columnar+json'
+    format = 'columnar'
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    """Apache Arrow IPC stream, selected with ``?format=arrow``.
+
+    Successful results are already encoded by the service layer; anything
+    else (error envelopes) is rendered as plain JSON.
+    """
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, bytearray)):
+            return data
+
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return JSONRenderer().render(data, renderer_context=renderer_context)
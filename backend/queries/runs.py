@@ -0,0 +1,262 @@
+"""Query run history.
+
+Every execution is recorded as a ``QueryRun``. Records are queued in memory
+and written in batches by a background thread in each process, so request
+threads never wait on the internal database. When the queue is full, new
+records are dropped rather than blocking.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import QueryRun
+from vizly.metrics import BYTES_SERIALIZED, QUERY_DURATION, QUERY_ERRORS, QUERY_PHASE_DURATION, ROWS_FETCHED
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+PHASES = ('connect', 'execute', 'fetch', 'serialize')
+
+# How often each process deletes runs older than QUERY_RUN_RETENTION_DAYS
+PRUNE_INTERVAL = 3600
+
+
+class RunWriter:
+    """Writes queued runs in batches of up to ``QUERY_RUN_BATCH_SIZE``.
+
+    A batch is written once it is full or ``QUERY_RUN_FLUSH_INTERVAL``
+    seconds after its first run was queued, whichever comes first.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=settings.QUERY_RUN_QUEUE_SIZE)
+        self.last_pruned = 0
+        self.thread = threading.Thread(target=self._run, name='query-run-writer', daemon=True)
+        self.thread.start()
+
+    def put(self, run):
+        try:
+            self.queue.put_nowait(run)
+        except queue.Full:
+            pass  # History is best effort; never hold up an execution for it
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + settings.QUERY_RUN_FLUSH_INTERVAL
+            while len(batch) < settings.QUERY_RUN_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def flush(self):
+        """Write everything still queued, on the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            QueryRun.objects.bulk_create(batch, batch_size=settings.QUERY_RUN_BATCH_SIZE)
+            if time.monotonic() - self.last_pruned >= PRUNE_INTERVAL:
+                self.last_pruned = time.monotonic()
+                cutoff = timezone.now() - timedelta(days=settings.QUERY_RUN_RETENTION_DAYS)
+                QueryRun.objects.filter(created_at__lt=cutoff).delete()
+        except Exception:
+            logger.exception('Failed to write %d query runs', len(batch))
+        finally:
+            close_old_connections()
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    """Return this process's writer, recreating it after a fork"""
+    global _writer, _writer_pid
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = RunWriter()
+            _writer_pid = os.getpid()
+            atexit.register(_writer.flush)
+        return _writer
+
+
+def record_run(run):
+    """Queue an unsaved ``QueryRun`` for writing"""
+    if settings.QUERY_RUN_HISTORY:
+        _get_writer().put(run)
+
+
+class RunTracker:
+    """Times one execution and records it as a ``QueryRun`` when it finishes.
+
+    Use it as a context manager around the execution. Pass ``timings`` to
+    ``execute_query`` and set ``result`` once there is one. An exception
+    leaving the block is recorded by its class name. After ``attach`` or
+    ``stream``, the run is recorded only once the response has been
+    rendered or the stream has been consumed, so that time and the payload
+    size are included.
+    """
+
+    def __init__(self, source, query_id=None, connection=None, user=None):
+        self.source = source
+        self.query_id = query_id
+        # Extract connections are transient, with no row to point at
+        self.connection_id = connection.pk if connection is not None and not connection._state.adding else None
+        self.connection_type = connection.type if connection is not None else 'unknown'
+        self.user_id = getattr(user, 'pk', None)
+        self.created_at = timezone.now()
+        self.started = time.monotonic()
+        self.timings = {}
+        self.result = None
+        self.deferred = False
+        self.finished = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.finish(error_class=exc_type.__name__)
+        elif not self.deferred:
+            self.finish()
+
+    def attach(self, response):
+        """Record the run once ``response`` is rendered, counting rendering as serialization"""
+        self.deferred = True
+        rendering_from = time.monotonic()
+
+        def on_rendered(rendered):
+            self.timings['serialize'] = (
+                self.timings.get('serialize', 0) + (time.monotonic() - rendering_from) * 1000
+            )
+            self.finish(payload_bytes=len(rendered.content))
+
+        response.add_post_render_callback(on_rendered)
+        return response
+
+    def stream(self, frames):
+        """Pass NDJSON ``frames`` through, recording the run once they run out"""
+        self.deferred = True
+        payload_bytes = 0
+        last_frame = None
+        error_class = ''
+        try:
+            for frame in frames:
+                payload_bytes += len(frame)  # Frames are ASCII-only JSON
+                last_frame = frame
+                yield frame
+        except Exception as e:
+            error_class = type(e).__name__
+            raise
+        finally:
+            summary = json.loads(last_frame) if last_frame else {}
+            if 'error' in summary:
+                # Errors after the header frame are reported in-band
+                error_class = error_class or 'Exception'
+            self.finish(payload_bytes=payload_bytes, row_count=summary.get('rowCount'), error_class=error_class)
+
+    def finish(self, **fields):
+        if self.finished:
+            return
+        self.finished = True
+        result = self.result or {}
+        fields.setdefault('row_count', result.get('rowCount'))
+        self._observe(result, **fields)
+        record_run(QueryRun(
+            query_id=self.query_id,
+            connection_id=self.connection_id,
+            user_id=self.user_id,
+            source=self.source,
+            duration_ms=(time.monotonic() - self.started) * 1000,
+            connect_ms=self.timings.get('connect'),
+            execute_ms=self.timings.get('execute'),
+            fetch_ms=self.timings.get('fetch'),
+            serialize_ms=self.timings.get('serialize'),
+            cache_hit=result.get('cache', {}).get('hit', False),
+            created_at=self.created_at,
+            **fields
+        ))
+
+    def _observe(self, result, row_count=None, payload_bytes=None, error_class=''):
+        """Report the run to the Prometheus metrics"""
+        if payload_bytes:
+            BYTES_SERIALIZED.labels(self.source).inc(payload_bytes)
+        if error_class:
+            QUERY_ERRORS.labels(self.connection_type, error_class).inc()
+        # Cache hits and runs that failed before reaching the database have no phases
+        if 'connect' not in self.timings or result.get('cache', {}).get('hit'):
+            return
+        QUERY_DURATION.labels(self.connection_type, self.source).observe(time.monotonic() - self.started)
+        for phase in PHASES:
+            if phase in self.timings:
+                QUERY_PHASE_DURATION.labels(self.connection_type, phase).observe(self.timings[phase] / 1000)
+        if row_count and row_count > 0:  # Drivers report -1 for statements without a row count
+            ROWS_FETCHED.labels(self.connection_type).inc(row_count)
+
+
+def _distribution(values, counts=False):
+    """Percentiles and max of the non-null ``values``; ``counts`` are whole numbers with a total"""
+    values = np.asarray([value for value in values if value is not None], dtype=float)
+    if not len(values):
+        return None
+    summary = dict(zip([f'p{percentile}' for percentile in PERCENTILES], np.percentile(values, PERCENTILES)))
+    summary['max'] = values.max()
+    if counts:
+        summary['total'] = values.sum()
+        return {key: int(round(value)) for key, value in summary.items()}
+    return {key: round(float(value), 1) for key, value in summary.items()}
+
+
+def summarize_runs(runs):
+    """Per-query latency and data volume percentiles for a ``QueryRun`` queryset.
+
+    Returns one summary per query, slowest (by p95 latency) first.
+    """
+    grouped = defaultdict(list)
+    fields = ['duration_ms', 'row_count', 'payload_bytes', 'cache_hit', 'error_class'] + [
+        f'{phase}_ms' for phase in PHASES
+    ]
+    for query_id, name, *values in runs.values_list('query_id', 'query__name', *fields).iterator():
+        grouped[query_id, name].append(values)
+
+    summaries = []
+    for (query_id, name), rows in grouped.items():
+        columns = dict(zip(fields, zip(*rows)))
+        summaries.append({
+            'queryId': str(query_id) if query_id else None,
+            'queryName': name,
+            'runs': len(rows),
+            'errors': sum(1 for error_class in columns['error_class'] if error_class),
+            'cacheHitRate': round(sum(columns['cache_hit']) / len(rows), 3),
+            'latencyMs': _distribution(columns['duration_ms']),
+            'phaseMedianMs': {
+                phase: (_distribution(columns[f'{phase}_ms']) or {}).get('p50') for phase in PHASES
+            },
+            'rowCount': _distribution(columns['row_count'], counts=True),
+            'payloadBytes': _distribution(columns['payload_bytes'], counts=True),
+        })
+    summaries.sort(key=lambda summary: -summary['latencyMs']['p95'])
+    return summaries
@@ -0,0 +1,240 @@
+"""Scheduled query refreshes.
+
+Queries with a ``refresh_interval`` (seconds) or ``refresh_cron`` (five-field
+cron expression, server time zone) are re-run ahead of demand: live queries
+and their visualizations overwrite their result cache entries, extract queries
+rebuild their extract. The scheduler runs from ``manage.py run_scheduler`` or
+as a daemon thread in each web worker (``SCHEDULER_IN_PROCESS``); a lock in
+the shared cache keeps several schedulers from refreshing the same query at
+once.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .extracts import refresh_extract
+from .models import Query
+from .parameters import coerce_parameters
+from .runs import RunTracker
+from .signals import invalidate_query_metadata
+from connections.cache import cached_execute_query
+from visualizations.services import get_visualization_data
+
+logger = logging.getLogger(__name__)
+
+# (minimum, maximum) for minute, hour, day of month, month, day of week
+CRON_FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+# Cron runs missed while the scheduler was down are caught up at most this far back
+CRON_CATCH_UP = timedelta(days=1)
+
+
+def parse_cron(expression):
+    """Parse a five-field cron expression into one set of allowed values per field.
+
+    Fields accept ``*``, numbers, ranges (``1-5``), steps (``*/15``, ``0-30/10``)
+    and comma-separated lists of those. Day of week runs 0-6 from Sunday (7 is
+    also Sunday). Raises ValueError for anything else.
+    """
+    fields = str(expression).split()
+    if len(fields) != 5:
+        raise ValueError('Cron expressions need 5 fields: minute hour day month weekday')
+
+    allowed = []
+    for field, (minimum, maximum) in zip(fields, CRON_FIELD_RANGES):
+        values = set()
+        for part in field.split(','):
+            span, _, step = part.partition('/')
+            try:
+                step = int(step) if step else 1
+                if span == '*':
+                    start, end = minimum, maximum
+                elif '-' in span:
+                    start, end = (int(value) for value in span.split('-', 1))
+                else:
+                    start = end = int(span)
+            except ValueError:
+                raise ValueError(f'Invalid cron field: {field}')
+            # Allow 7 for Sunday in the day of week field
+            top = 7 if maximum == 6 else maximum
+            if step < 1 or start < minimum or end > top or start > end:
+                raise ValueError(f'Invalid cron field: {field}')
+            values.update(value % 7 if maximum == 6 else value for value in range(start, end + 1, step))
+        allowed.append(values)
+    return allowed
+
+
+def cron_matches(allowed, moment):
+    minutes, hours, days, months, weekdays = allowed
+    # Like cron, a restricted day of month and day of week match if either does
+    day_restricted = len(days) < 31
+    weekday_restricted = len(weekdays) < 7
+    weekday = (moment.weekday() + 1) % 7
+    if day_restricted and weekday_restricted:
+        day_matches = moment.day in days or weekday in weekdays
+    else:
+        day_matches = moment.day in days and weekday in weekdays
+    return moment.minute in minutes and moment.hour in hours and moment.month in months and day_matches
+
+
+def is_due(query, now):
+    """Whether a scheduled refresh of ``query`` is due at ``now``"""
+    last = query.last_refreshed_at
+    if query.refresh_interval:
+        return last is None or (now - last).total_seconds() >= query.refresh_interval
+
+    if not query.refresh_cron:
+        return False
+    allowed = parse_cron(query.refresh_cron)
+    # Due if any scheduled minute passed since the last refresh (or since creation)
+    moment = timezone.localtime(now).replace(second=0, microsecond=0)
+    since = max(last or query.created_at, now - CRON_CATCH_UP)
+    while moment > since:
+        if cron_matches(allowed, moment):
+            return True
+        moment -= timedelta(minutes=1)
+    return False
+
+
+def refresh_query(query):
+    """Re-run a query ahead of demand: rebuild its extract, or refresh its cached results.
+
+    For live queries, the query's own result and the data of every
+    visualization built on it are recomputed and stored in the result cache.
+    """
+    if query.mode == 'extract':
+        refresh_extract(query)
+    else:
+        with RunTracker('scheduled', query_id=query.id, connection=query.connection) as run:
+            run.result = cached_execute_query(
+                query.connection, query.sql,
+                ttl=query.cache_ttl,
+                refresh=True,
+                timeout=query.statement_timeout,
+                params=coerce_parameters(query.parameters, None),
+                timings=run.timings
+            )
+
+    for visualization in query.visualizations.all():
+        visualization.query = query
+        try:
+            with RunTracker('scheduled', query_id=query.id, connection=query.connection) as run:
+                run.result = get_visualization_data(
+                    visualization, refresh=query.mode != 'extract', timings=run.timings
+                )
+        except ValueError as e:
+            logger.warning('Skipped warming visualization %s: %s', visualization.id, e)
+
+    query.last_refreshed_at = timezone.now()
+    Query.objects.filter(pk=query.pk).update(last_refreshed_at=query.last_refreshed_at)
+    invalidate_query_metadata(query.pk, query.user_id)  # update() sends no post_save
+
+
+class Scheduler:
+    """Polls for due queries and refreshes them on a bounded thread pool.
+
+    At most ``workers`` refreshes run at once, and at most
+    ``connection_limit`` per source connection; due queries over either
+    limit wait for a later tick. Each run starts after a random delay of up
+    to ``jitter`` seconds so queries sharing a schedule don't all hit their
+    databases in the same instant.
+    """
+
+    def __init__(self, workers=None, connection_limit=None, jitter=None, poll_interval=None):
+        self.workers = workers or settings.SCHEDULER_WORKERS
+        self.connection_limit = connection_limit or settings.SCHEDULER_CONNECTION_CONCURRENCY
+        self.jitter = settings.SCHEDULER_JITTER if jitter is None else jitter
+        self.poll_interval = poll_interval or settings.SCHEDULER_POLL_INTERVAL
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='query-refresh')
+        self.running = defaultdict(int)
+        self.running_lock = threading.Lock()
+
+    def tick(self, now=None):
+        """Start refreshes for every due query that fits the limits; returns how many started"""
+        now = now or timezone.now()
+        scheduled = Query.objects.filter(
+            Q(refresh_interval__gt=0) | ~Q(refresh_cron='')
+        ).select_related('connection', 'extract')
+
+        started = 0
+        for query in scheduled:
+            try:
+                due = is_due(query, now)
+            except ValueError as e:
+                logger.warning('Invalid schedule on query %s: %s', query.id, e)
+                continue
+            if not due:
+                continue
+
+            with self.running_lock:
+                if sum(self.running.values()) >= self.workers:
+                    break
+                if self.running[query.connection_id] >= self.connection_limit:
+                    continue
+                # Skip queries whose previous refresh is still running, here or elsewhere
+                token = uuid.uuid4().hex
+                if not cache.add(self._lock_key(query), token, settings.SCHEDULER_LOCK_TIMEOUT):
+                    continue
+                self.running[query.connection_id] += 1
+
+            self.executor.submit(self._run, query, token)
+            started += 1
+        return started
+
+    def _lock_key(self, query):
+        return f'query-refresh:{query.id}'
+
+    def _run(self, query, token):
+        close_old_connections()
+        try:
+            time.sleep(random.uniform(0, self.jitter))
+            # Another scheduler may have refreshed it since this one checked
+            query.refresh_from_db(fields=['last_refreshed_at'])
+            if is_due(query, timezone.now()):
+                refresh_query(query)
+        except Exception:
+            logger.exception('Scheduled refresh of query %s failed', query.id)
+        finally:
+            if cache.get(self._lock_key(query)) == token:
+                cache.delete(self._lock_key(query))
+            with self.running_lock:
+                self.running[query.connection_id] -= 1
+            close_old_connections()
+
+    def run_forever(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            close_old_connections()
+            try:
+                self.tick()
+            except Exception:
+                logger.exception('Scheduler tick failed')
+            stop_event.wait(self.poll_interval)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+_scheduler_thread = None
+
+
+def start_scheduler_thread():
+    """Run a scheduler on a daemon thread in this process, once"""
+    global _scheduler_thread
+    if _scheduler_thread is None:
+        _scheduler_thread = threading.Thread(
+            target=Scheduler().run_forever, name='query-scheduler', daemon=True
+        )
+        _scheduler_thread.start()
+    return _scheduler_thread
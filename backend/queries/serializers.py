@@ -1,15 +1,47 @@
 from rest_framework import serializers
-from .models import Query
+from .models import Extract, Query
+from .parameters import validate_parameter_definitions
+from .scheduler import parse_cron
 from connections.serializers import ConnectionSerializer
+from vizly.fieldsets import SparseFieldsMixin
 
 
-class QuerySerializer(serializers.ModelSerializer):
+class ExtractSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Extract
+        fields = ['id', 'columns', 'row_count', 'size_bytes', 'refresh_duration', 'refreshed_at']
+        read_only_fields = fields
+
+
+class QuerySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     connection_details = ConnectionSerializer(source='connection', read_only=True)
+    extract = ExtractSerializer(read_only=True)
 
     class Meta:
         model = Query
-        fields = ['id', 'name', 'description', 'sql', 'connection', 'connection_details', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'description', 'sql', 'parameters', 'cache_ttl', 'statement_timeout', 'mode',
+                  'extract', 'refresh_interval', 'refresh_cron', 'last_refreshed_at',
+                  'connection', 'connection_details', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'last_refreshed_at', 'created_at', 'updated_at']
+
+    def validate(self, data):
+        sql = data.get('sql', self.instance.sql if self.instance else '')
+        parameters = data.get('parameters', self.instance.parameters if self.instance else [])
+        try:
+            validate_parameter_definitions(parameters, sql)
+        except ValueError as e:
+            raise serializers.ValidationError({'parameters': str(e)})
+
+        mode = data.get('mode', self.instance.mode if self.instance else 'live')
+        if mode == 'extract' and parameters:
+            raise serializers.ValidationError({'mode': 'Queries with parameters cannot be extracted'})
+
+        if data.get('refresh_cron'):
+            try:
+                parse_cron(data['refresh_cron'])
+            except ValueError as e:
+                raise serializers.ValidationError({'refresh_cron': str(e)})
+        return data
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -0,0 +1,49 @@
+"""Query model signal handlers"""
+import os
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .extracts import extract_path
+from .models import Extract, Query
+from connections.services import dispose_connection_engine
+from dashboards.models import DashboardItem
+from visualizations.models import Visualization
+from vizly.metadata import invalidate_metadata, invalidate_metadata_entries
+
+
+def invalidate_query_metadata(query_id, user_id):
+    """Drop the cached query and the visualizations and dashboards that embed it"""
+    visualization_ids = list(Visualization.objects.filter(query_id=query_id).values_list('id', flat=True))
+    dashboard_ids = DashboardItem.objects.filter(
+        visualization_id__in=visualization_ids
+    ).values_list('dashboard_id', flat=True).distinct()
+    invalidate_metadata_entries(user_id, [
+        ('query', query_id),
+        *(('visualization', pk) for pk in visualization_ids),
+        *(('dashboard', pk) for pk in dashboard_ids),
+    ])
+
+
+@receiver(post_delete, sender=Extract)
+def remove_extract_file(sender, instance, **kwargs):
+    """Close the extract's engine and delete its file"""
+    dispose_connection_engine(instance.pk)
+    path = extract_path(instance.query_id)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+@receiver(post_save, sender=Query)
+@receiver(post_delete, sender=Query)
+def invalidate_metadata_on_query_change(sender, instance, **kwargs):
+    invalidate_metadata(instance.user_id)
+
+
+@receiver(post_save, sender=Extract)
+@receiver(post_delete, sender=Extract)
+def invalidate_metadata_on_extract_change(sender, instance, **kwargs):
+    # Gone when the extract is deleted along with its query, which invalidates on its own
+    user_id = Query.objects.filter(pk=instance.query_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_query_metadata(instance.query_id, user_id)
@@ -0,0 +1,452 @@
+import asyncio
+import json
+import sqlite3
+import time
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.utils import timezone
+
+from connections import async_services
+from connections.arrow import arrow_available
+from connections.cache import result_cache_key
+from queries.jobs import FINISHED_STATUSES
+from queries import runs
+from queries.async_views import QueryExecuteView, RawQueryExecuteView
+from queries.models import Query, QueryRun
+from queries.scheduler import refresh_query
+from queries.views import get_user_query
+from vizly.testing import VizlyTestCase
+
+
+class ScheduledRefreshTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+        self.query = self.create_query(self.connection)
+
+    def execute(self, **data):
+        return self.client.post(f'/api/queries/{self.query.id}/execute/', data, format='json')
+
+    def test_default_options_share_a_cache_key(self):
+        self.assertEqual(
+            result_cache_key(self.connection, self.query.sql),
+            result_cache_key(
+                self.connection, self.query.sql,
+                params={}, result_format='rows', page_size=None, cursor=None, order_by=None
+            )
+        )
+
+    def test_execute_after_refresh_is_a_cache_hit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_query(self.query)
+
+        response = self.execute()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['data']['cache']['hit'])
+        self.assertEqual(response.data['data']['rowCount'], 10)
+
+    def test_refresh_leaves_other_formats_uncached(self):
+        refresh_query(self.query)
+
+        response = self.client.post(f'/api/queries/{self.query.id}/execute/?format=columnar', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['data']['cache']['hit'])
+
+
+@override_settings(METADATA_CACHE_TTL=60)
+class QueryMetadataCacheTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source(password='secret')
+        self.query = self.create_query(self.connection)
+        self.other = self.create_query(self.connection)
+
+    def test_cached_query_leaves_out_the_connection_password(self):
+        get_user_query(self.user, self.query.pk)
+        with self.assertNumQueries(0):
+            query = get_user_query(self.user, self.query.pk)
+        self.assertIn('password', query.connection.get_deferred_fields())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(query.connection.password, 'secret')
+
+    def test_refresh_only_drops_the_refreshed_query(self):
+        for query in (self.query, self.other):
+            get_user_query(self.user, query.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_query(self.query)
+
+        with self.assertNumQueries(0):
+            get_user_query(self.user, self.other.pk)
+        with self.assertNumQueries(1):
+            query = get_user_query(self.user, self.query.pk)
+        self.assertIsNotNone(query.last_refreshed_at)
+
+
+class QueryListPaginationTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+        self.queries = [self.create_query(self.connection) for _ in range(7)]
+        # Ties on the ordering field must not repeat or skip rows across pages
+        Query.objects.filter(pk__in=[query.pk for query in self.queries[2:5]]).update(updated_at=timezone.now())
+        other = self.create_user('other@example.com')
+        self.create_query(self.create_source(name='other', user=other))
+
+    def test_next_links_walk_every_query_once(self):
+        seen, pages = [], 0
+        url = '/api/queries/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [query['id'] for query in response.data['data']['queries']]
+            url = response.data['data']['next']
+            pages += 1
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen), {str(query.id) for query in self.queries})
+
+    def test_previous_link_returns_the_first_page(self):
+        first = self.client.get('/api/queries/?page_size=3').data['data']
+        second = self.client.get(first['next']).data['data']
+        back = self.client.get(second['previous']).data['data']
+        self.assertEqual(back['queries'], first['queries'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/queries/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+class ExecuteRevalidationTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.query = self.create_query(self.create_source())
+
+    def execute(self, path='', **headers):
+        return self.client.post(f'/api/queries/{self.query.id}/execute/{path}', {}, format='json', **headers)
+
+    def test_unchanged_result_is_not_modified(self):
+        etag = self.execute()['ETag']
+        response = self.execute(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+
+    def test_other_representations_are_sent(self):
+        etag = self.execute()['ETag']
+        response = self.execute('?format=columnar', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.execute(HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+
+
+@override_settings(QUERY_STREAM_BATCH_SIZE=4)
+class StreamTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+
+    def stream(self, query):
+        return self.client.post(f'/api/queries/{query.id}/stream/', {}, format='json')
+
+    def test_frames(self):
+        response = self.stream(self.create_query(self.connection))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        frames = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([column['name'] for column in frames[0]['columns']], ['id', 'name', 'value'])
+        self.assertEqual([len(frame['rows']) for frame in frames[1:-1]], [4, 4, 2])
+        self.assertEqual(frames[1]['rows'][0], [1, 'item 1', 1.5])
+        self.assertEqual(frames[-1], {'rowCount': 10})
+
+    def test_execution_errors_are_sent_before_streaming(self):
+        response = self.stream(self.create_query(self.connection, sql='SELECT missing FROM items'))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data['status'], 'error')
+
+
+class ResultFormatTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.query = self.create_query(self.create_source(rows=3))
+
+    def execute(self, result_format):
+        return self.client.post(f'/api/queries/{self.query.id}/execute/?format={result_format}', {}, format='json')
+
+    def test_columnar(self):
+        response = self.execute('columnar')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.vizly.columnar+json')
+        self.assertEqual(response.data['data']['values'], [[1, 2, 3], ['item 1', 'item 2', 'item 3'], [1.5, 3.0, 4.5]])
+        self.assertNotIn('rows', response.data['data'])
+
+    @skipUnless(arrow_available(), 'pyarrow is not installed')
+    def test_arrow(self):
+        import pyarrow as pa
+
+        response = self.execute('arrow')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+        self.assertEqual(response['X-Row-Count'], '3')
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.column_names, ['id', 'name', 'value'])
+        self.assertEqual(table.column('id').type, pa.int64())
+        self.assertEqual(table.column('name').to_pylist(), ['item 1', 'item 2', 'item 3'])
+
+
+class QueryJobTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+
+    def submit(self, query):
+        response = self.client.post(f'/api/queries/{query.id}/execute/?async=true', {}, format='json')
+        self.assertEqual(response.status_code, 202)
+        return response.data['data']['job']['id']
+
+    def wait_for(self, job_id, statuses):
+        deadline = time.monotonic() + 10
+        while True:
+            job = self.client.get(f'/api/queries/jobs/{job_id}/').data['data']['job']
+            if job['status'] in statuses or time.monotonic() > deadline:
+                return job
+            time.sleep(0.05)
+
+    def test_job_result(self):
+        job_id = self.submit(self.create_query(self.connection))
+        job = self.wait_for(job_id, FINISHED_STATUSES)
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['rowCount'], 10)
+
+        response = self.client.get(f'/api/queries/jobs/{job_id}/result/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['rows'][0], {'id': 1, 'name': 'item 1', 'value': 1.5})
+
+        other = self.client_for(self.create_user('other@example.com'))
+        self.assertEqual(other.get(f'/api/queries/jobs/{job_id}/').status_code, 404)
+
+    def test_job_threads_do_not_query_the_database(self):
+        with self.assertNoWorkerQueries():
+            job = self.wait_for(self.submit(self.create_query(self.connection)), FINISHED_STATUSES)
+        self.assertEqual(job['status'], 'succeeded')
+
+    def test_cancel(self):
+        query = self.create_query(self.connection, sql=(
+            'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) '
+            'SELECT count(*) FROM c'
+        ))
+        job_id = self.submit(query)
+        self.assertEqual(self.wait_for(job_id, ('running',) + FINISHED_STATUSES)['status'], 'running')
+
+        response = self.client.post(f'/api/queries/jobs/{job_id}/cancel/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.wait_for(job_id, FINISHED_STATUSES)['status'], 'cancelled')
+        self.assertEqual(self.client.get(f'/api/queries/jobs/{job_id}/result/').status_code, 409)
+
+
+class QueryParameterTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+        self.query = self.create_query(
+            self.connection,
+            sql='SELECT id FROM items WHERE value >= :min_value AND id <= :max_id ORDER BY id',
+            parameters=[
+                {'name': 'min_value', 'type': 'float', 'default': 3},
+                {'name': 'max_id', 'type': 'integer', 'required': True},
+            ]
+        )
+
+    def execute(self, params):
+        return self.client.post(f'/api/queries/{self.query.id}/execute/', {'params': params}, format='json')
+
+    def test_values_are_coerced_and_defaults_applied(self):
+        response = self.execute({'max_id': '4'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['data']['rows']], [2, 3, 4])
+
+        response = self.execute({'max_id': 4, 'min_value': 6})
+        self.assertEqual([row['id'] for row in response.data['data']['rows']], [4])
+
+    def test_invalid_values(self):
+        for params, message in (
+            ({}, 'Parameter max_id is required'),
+            ({'max_id': 'four'}, 'Parameter max_id must be a valid integer'),
+            ({'max_id': 4, 'other': 1}, 'Unknown parameters: other'),
+        ):
+            with self.subTest(params=params):
+                response = self.execute(params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['message'], message)
+
+    def test_declarations_must_match_the_sql(self):
+        response = self.client.post('/api/queries/', {
+            'name': 'Items', 'sql': 'SELECT id FROM items', 'connection': str(self.connection.id),
+            'parameters': [{'name': 'max_id', 'type': 'integer'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message']['parameters'], ['Parameter max_id is not used in the SQL as :max_id'])
+
+
+class ExtractTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        extract_settings = self.settings(EXTRACT_ROOT=str(self.source_dir / 'extracts'))
+        extract_settings.enable()
+        self.addCleanup(extract_settings.disable)
+        self.connection = self.create_source()
+        self.query = self.create_query(self.connection, mode='extract')
+
+    def execute(self):
+        response = self.client.post(f'/api/queries/{self.query.id}/execute/?refresh=true', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']['rowCount']
+
+    def test_executions_read_the_extract_until_it_is_refreshed(self):
+        self.assertEqual(self.execute(), 10)
+        with sqlite3.connect(self.connection.database) as db:
+            db.execute("INSERT INTO items VALUES (11, 'item 11', 16.5)")
+        db.close()
+        self.assertEqual(self.execute(), 10)
+
+        response = self.client.post(f'/api/queries/{self.query.id}/refresh_extract/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['extract']['row_count'], 11)
+        self.assertEqual(self.execute(), 11)
+
+    def test_extract_keeps_column_types(self):
+        self.execute()
+        self.query.refresh_from_db()
+        self.assertEqual(
+            {column['name']: column['type'] for column in self.query.extract.columns},
+            {'id': 'integer', 'name': 'string', 'value': 'float'}
+        )
+
+    def test_live_queries_have_no_extract(self):
+        live = self.create_query(self.connection)
+        response = self.client.post(f'/api/queries/{live.id}/refresh_extract/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Query is not in extract mode')
+
+
+class RunHistoryTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.query = self.create_query(self.create_source())
+        # Save runs on the test's thread instead of queueing them for the writer thread
+        patcher = mock.patch.object(runs, 'record_run', side_effect=lambda run: run.save())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def execute(self, sql=None):
+        if sql:
+            self.query.sql = sql
+            self.query.save()
+        return self.client.post(f'/api/queries/{self.query.id}/execute/', {}, format='json')
+
+    def test_execute_records_a_run(self):
+        response = self.execute()
+        run = QueryRun.objects.get()
+        self.assertEqual((run.source, run.query_id, run.user_id), ('execute', self.query.id, self.user.id))
+        self.assertEqual(run.row_count, 10)
+        self.assertEqual(run.payload_bytes, len(response.content))
+        self.assertFalse(run.cache_hit)
+        for phase in runs.PHASES:
+            self.assertIsNotNone(getattr(run, f'{phase}_ms'))
+
+    def test_stats(self):
+        self.execute()
+        self.execute()
+        self.execute('SELECT missing FROM items')
+
+        response = self.client.get(f'/api/queries/{self.query.id}/stats/')
+        self.assertEqual(response.status_code, 200)
+        stats = response.data['data']['stats']
+        self.assertEqual((stats['runs'], stats['errors']), (3, 1))
+        self.assertEqual(stats['cacheHitRate'], 0.333)
+        self.assertEqual(stats['rowCount']['total'], 20)
+
+        self.assertEqual(self.client.get('/api/queries/stats/', {'window': 0}).status_code, 400)
+
+
+class AsyncExecuteTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source()
+        self.query = self.create_query(self.connection)
+
+    async def execute(self, factory, pk=None, **data):
+        pk = pk or self.query.id
+        return await self.call_view(QueryExecuteView, factory, f'/api/queries/{pk}/execute/', data, pk=str(pk))
+
+    async def test_asgi_requests_run_on_the_async_engine(self):
+        try:
+            response = await self.execute(AsyncRequestFactory())
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['data']['rowCount'], 10)
+            self.assertIn(str(self.connection.id), async_services._engines[asyncio.get_running_loop()])
+
+            response = await self.execute(AsyncRequestFactory())
+            self.assertTrue(response.data['data']['cache']['hit'])
+        finally:
+            await self.dispose_async_engines()
+
+    async def test_wsgi_requests_run_the_sync_path(self):
+        response = await self.execute(RequestFactory(), page_size=4)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['data']['rows']], [1, 2, 3, 4])
+        self.assertNotIn(asyncio.get_running_loop(), async_services._engines)
+
+    async def test_missing_query(self):
+        response = await self.execute(AsyncRequestFactory(), pk=self.connection.id)
+        self.assertEqual(response.status_code, 404)
+
+
+SLOW_SQL = (
+    'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) '
+    'SELECT count(*) AS total FROM c'
+)
+
+
+class AsyncRawExecuteTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connection = self.create_source(statement_timeout=1)
+
+    async def execute(self, factory, user=None, **data):
+        data = {'connection_id': str(self.connection.id), **data}
+        return await self.call_view(RawQueryExecuteView, factory, '/api/queries/execute/', data, user=user)
+
+    async def test_both_servers(self):
+        other = await sync_to_async(self.create_user)('other@example.com')
+        for factory in (AsyncRequestFactory(), RequestFactory()):
+            with self.subTest(factory=type(factory).__name__):
+                try:
+                    response = await self.execute(factory, sql='SELECT id FROM items WHERE id <= 3')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.data['data']['rows'], [{'id': 1}, {'id': 2}, {'id': 3}])
+                    engines = async_services._engines.get(asyncio.get_running_loop(), {})
+                    self.assertEqual(str(self.connection.id) in engines, isinstance(factory, AsyncRequestFactory))
+
+                    response = await self.execute(factory)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.data['message'], 'connection_id and sql are required')
+
+                    response = await self.execute(factory, sql=SLOW_SQL)
+                    self.assertEqual(response.status_code, 504)
+                    self.assertEqual(response.data['message'], 'Query timed out after 1 seconds')
+
+                    response = await self.execute(factory, user=other, sql='SELECT 1')
+                    self.assertEqual(response.status_code, 404)
+                    response = await self.execute(factory, user=False, sql='SELECT 1')
+                    self.assertEqual(response.status_code, 401)
+                finally:
+                    await self.dispose_async_engines()
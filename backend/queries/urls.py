@@ -1,10 +1,19 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register('', views.QueryViewSet, basename='query')
 
-urlpatterns = [
+urlpatterns = []
+if settings.ASYNC_QUERY_VIEWS:
+    # Matched before the viewset's sync actions
+    urlpatterns += [
+        path('execute_raw/', async_views.RawQueryExecuteView.as_view(), name='query-execute-raw-async'),
+        path('<str:pk>/execute/', async_views.QueryExecuteView.as_view(), name='query-execute-async'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
@@ -1,28 +1,154 @@
+import itertools
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Query
-from .serializers import QuerySerializer
+from rest_framework.settings import api_settings
+from .extracts import get_query_source, refresh_extract
+from .jobs import FINISHED_STATUSES, JobQueueFullError, cancel_job, get_job, get_job_result, submit_query_job
+from .models import Query, QueryRun
+from .parameters import coerce_parameters
+from .renderers import ArrowStreamRenderer, ColumnarJSONRenderer
+from .runs import RunTracker, summarize_runs
+from .serializers import ExtractSerializer, QuerySerializer
+from connections.arrow import arrow_available
+from connections.admission import AdmissionRejectedError
+from connections.cache import cached_execute_query
 from connections.models import Connection
-from connections.services import execute_query
+from connections.services import QueryTimeoutError, execute_query, stream_query
+from vizly.conditional import make_etag, not_modified, with_etag
+from vizly.fieldsets import SparseFieldsViewSetMixin
+from vizly.metadata import get_cached_metadata
+
+# Renderers for execute endpoints; the accepted one picks the result format
+RESULT_RENDERER_CLASSES = api_settings.DEFAULT_RENDERER_CLASSES + [ColumnarJSONRenderer]
+if arrow_available():
+    RESULT_RENDERER_CLASSES.append(ArrowStreamRenderer)
+
+
+def get_param(request, name):
+    """Read a parameter from the request body, falling back to the query string"""
+    value = request.data.get(name)
+    return request.query_params.get(name) if value is None else value
+
+
+def get_flag(request, name):
+    return str(get_param(request, name)).lower() in ('1', 'true')
+
+
+def get_paging_options(request):
+    """Read ``page_size``, ``cursor`` and ``order_by`` from the body or query string"""
+    page_size = get_param(request, 'page_size')
+    if page_size is None:
+        return {}
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        raise ValueError('page_size must be an integer')
+    if not 1 <= page_size <= settings.QUERY_MAX_PAGE_SIZE:
+        raise ValueError(f'page_size must be between 1 and {settings.QUERY_MAX_PAGE_SIZE}')
+
+    return {
+        'page_size': page_size,
+        'cursor': get_param(request, 'cursor'),
+        'order_by': get_param(request, 'order_by')
+    }
+
+
+def get_raw_params(request):
+    """Bind values for ad-hoc SQL, passed through untyped"""
+    params = request.data.get('params') or {}
+    if not isinstance(params, dict):
+        raise ValueError('params must be an object')
+    return params
+
+
+def get_window_start(request):
+    """Start of the ``window`` (seconds, default a day) that run statistics cover"""
+    window = request.query_params.get('window', 24 * 3600)
+    try:
+        window = int(window)
+    except (TypeError, ValueError):
+        raise ValueError('window must be an integer')
+    if window < 1:
+        raise ValueError('window must be positive')
+    return timezone.now() - timedelta(seconds=window)
+
+
+def get_result_format(request):
+    """Map the negotiated renderer (``Accept`` or ``?format=``) to a result format"""
+    return {'columnar': 'columnar', 'arrow': 'arrow'}.get(request.accepted_renderer.format, 'rows')
+
+
+def result_response(result):
+    """Wrap an execution result in the API envelope, or send Arrow bytes as-is"""
+    if 'arrow' not in result:
+        return Response({
+            'status': 'success',
+            'data': result
+        })
+
+    headers = {'X-Row-Count': str(result['rowCount'])}
+    if 'cache' in result:
+        headers['X-Cache'] = 'HIT' if result['cache']['hit'] else 'MISS'
+        headers['Age'] = str(result['cache']['age'])
+    if result.get('nextCursor'):
+        headers['X-Next-Cursor'] = result['nextCursor']
+    if result.get('preflight'):
+        headers['X-Preflight'] = result['preflight']['message']
+    return Response(result['arrow'], headers=headers)
+
+
+def get_user_query(user, pk):
+    """A user's query with its connection (less its password) and extract, through the metadata cache"""
+    return get_cached_metadata(
+        user.id, 'query', pk,
+        lambda: Query.objects.select_related('connection', 'extract').defer('connection__password')
+        .get(pk=pk, user=user)
+    )
+
+
+def conditional_result_response(request, result, *etag_parts):
+    """``result_response`` with an ETag, or a 304 when the client already has the result.
 
+    Results from the cache are tagged by their entry's fingerprint and
+    ``etag_parts``; others by their rendered content.
+    """
+    fingerprint = result.get('cache', {}).get('fingerprint')
+    etag = make_etag(fingerprint, *etag_parts) if fingerprint else None
+    if etag:
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+    return with_etag(request, result_response(result), etag)
 
-class QueryViewSet(viewsets.ModelViewSet):
+
+def job_response(job, status_code=status.HTTP_200_OK):
+    return Response({
+        'status': 'success',
+        'data': {'job': {key: value for key, value in job.items() if key != 'userId'}}
+    }, status=status_code)
+
+
+class QueryViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for SQL queries"""
     serializer_class = QuerySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Query.objects.filter(user=self.request.user).select_related('connection')
+        queryset = Query.objects.filter(user=self.request.user)
+        related = self.expanded_lookups({'connection_details': 'connection', 'extract': 'extract'})
+        return queryset.select_related(*related) if related else queryset
 
     def list(self, request):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'status': 'success',
-            'data': {'queries': serializer.data}
-        })
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response({'queries': serializer.data})
 
     def retrieve(self, request, pk=None):
         try:
@@ -85,28 +211,142 @@ class QueryViewSet(viewsets.ModelViewSet):
                 'message': 'Query not found'
             }, status=status.HTTP_404_NOT_FOUND)
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], renderer_classes=RESULT_RENDERER_CLASSES)
     def execute(self, request, pk=None):
         """Execute the SQL query"""
+        try:
+            query = get_user_query(request.user, pk)
+            options = {
+                'params': coerce_parameters(query.parameters, request.data.get('params')),
+                'result_format': get_result_format(request),
+                'timeout': query.statement_timeout,
+                **get_paging_options(request)
+            }
+            connection, sql = get_query_source(query)
+            if get_flag(request, 'async'):
+                job = submit_query_job(request.user, connection, sql, query_id=query.id, **options)
+                return job_response(job, status.HTTP_202_ACCEPTED)
+
+            with RunTracker('execute', query_id=query.id, connection=query.connection, user=request.user) as run:
+                run.result = cached_execute_query(
+                    connection, sql,
+                    ttl=query.cache_ttl,
+                    refresh=get_flag(request, 'refresh'),
+                    user=request.user,
+                    timings=run.timings,
+                    **options
+                )
+                return run.attach(conditional_result_response(request, run.result))
+        except Query.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Query not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except JobQueueFullError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except QueryTimeoutError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except AdmissionRejectedError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=True, methods=['post'])
+    def refresh_extract(self, request, pk=None):
+        """Re-run an extract query against its source and replace its extract"""
         try:
             query = self.get_queryset().get(pk=pk)
-            result = execute_query(query.connection, query.sql)
+            if query.mode != 'extract':
+                return Response({
+                    'status': 'error',
+                    'message': 'Query is not in extract mode'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            extract = refresh_extract(query, user=request.user)
             return Response({
                 'status': 'success',
-                'data': result
+                'data': {'extract': ExtractSerializer(extract).data}
             })
         except Query.DoesNotExist:
             return Response({
                 'status': 'error',
                 'message': 'Query not found'
             }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except QueryTimeoutError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except AdmissionRejectedError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
         except Exception as e:
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['get'], url_path='stats')
+    def run_stats(self, request):
+        """Latency and data volume percentiles for each of the user's saved queries"""
+        try:
+            runs = QueryRun.objects.filter(query__user=request.user, created_at__gte=get_window_start(request))
+            return Response({
+                'status': 'success',
+                'data': {'queries': summarize_runs(runs)}
+            })
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """Latency and data volume percentiles for one saved query"""
+        try:
+            query = self.get_queryset().get(pk=pk)
+            summaries = summarize_runs(query.runs.filter(created_at__gte=get_window_start(request)))
+            return Response({
+                'status': 'success',
+                'data': {'stats': summaries[0] if summaries else None}
+            })
+        except Query.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Query not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'], renderer_classes=RESULT_RENDERER_CLASSES)
     def execute_raw(self, request):
         """Execute raw SQL query"""
         try:
@@ -120,18 +360,201 @@ class QueryViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
             connection = Connection.objects.get(pk=connection_id, user=request.user)
-            result = execute_query(connection, sql)
+            options = {
+                'params': get_raw_params(request),
+                'result_format': get_result_format(request),
+                **get_paging_options(request)
+            }
+            if get_flag(request, 'async'):
+                job = submit_query_job(request.user, connection, sql, **options)
+                return job_response(job, status.HTTP_202_ACCEPTED)
+
+            with RunTracker('execute', connection=connection, user=request.user) as run:
+                run.result = execute_query(connection, sql, user=request.user, timings=run.timings, **options)
+                return run.attach(result_response(run.result))
+        except Connection.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Connection not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except JobQueueFullError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except QueryTimeoutError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except AdmissionRejectedError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>[0-9a-f]+)')
+    def job(self, request, job_id=None):
+        """Get the status and progress of a background query job"""
+        job = get_job(job_id, request.user)
+        if job is None:
+            return Response({
+                'status': 'error',
+                'message': 'Job not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return job_response(job)
+
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>[0-9a-f]+)/result',
+            renderer_classes=RESULT_RENDERER_CLASSES)
+    def job_result(self, request, job_id=None):
+        """Get the result of a finished background query job"""
+        job = get_job(job_id, request.user)
+        if job is None:
+            return Response({
+                'status': 'error',
+                'message': 'Job not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if job['status'] != 'succeeded':
+            return Response({
+                'status': 'error',
+                'message': job['error'] or f"Job is {job['status']}"
+            }, status=status.HTTP_409_CONFLICT)
+
+        result = get_job_result(job_id)
+        if result is None:
+            return Response({
+                'status': 'error',
+                'message': 'Job result has expired'
+            }, status=status.HTTP_410_GONE)
+        return result_response(result)
+
+    @action(detail=False, methods=['post'], url_path=r'jobs/(?P<job_id>[0-9a-f]+)/cancel')
+    def cancel_job(self, request, job_id=None):
+        """Cancel a background query job"""
+        try:
+            job = get_job(job_id, request.user)
+            if job is None:
+                return Response({
+                    'status': 'error',
+                    'message': 'Job not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+            if job['status'] in FINISHED_STATUSES:
+                return Response({
+                    'status': 'error',
+                    'message': f"Job is already {job['status']}"
+                }, status=status.HTTP_409_CONFLICT)
+
+            # Extract jobs run on a transient connection, with no remote statement to abort
+            connection = Connection.objects.filter(pk=job['connectionId'], user=request.user).first()
+            cancel_job(job, connection)
             return Response({
                 'status': 'success',
-                'data': result
+                'message': 'Job cancellation requested'
             })
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=True, methods=['post'])
+    def stream(self, request, pk=None):
+        """Execute the SQL query and stream the result as NDJSON"""
+        try:
+            query = get_user_query(request.user, pk)
+            params = coerce_parameters(query.parameters, request.data.get('params'))
+            connection, sql = get_query_source(query)
+            with RunTracker('stream', query_id=query.id, connection=query.connection, user=request.user) as run:
+                return self._stream_response(run, connection, sql, params, query.statement_timeout)
+        except Query.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Query not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except QueryTimeoutError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except AdmissionRejectedError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['post'])
+    def stream_raw(self, request):
+        """Execute raw SQL query and stream the result as NDJSON"""
+        try:
+            connection_id = request.data.get('connection_id')
+            sql = request.data.get('sql')
+
+            if not connection_id or not sql:
+                return Response({
+                    'status': 'error',
+                    'message': 'connection_id and sql are required'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            connection = Connection.objects.get(pk=connection_id, user=request.user)
+            with RunTracker('stream', connection=connection, user=request.user) as run:
+                return self._stream_response(run, connection, sql, get_raw_params(request))
         except Connection.DoesNotExist:
             return Response({
                 'status': 'error',
                 'message': 'Connection not found'
             }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except QueryTimeoutError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except AdmissionRejectedError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
         except Exception as e:
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _stream_response(self, run, connection, sql, params, timeout=None):
+        frames = run.stream(stream_query(
+            connection, sql, params, timeout=timeout, user=self.request.user, timings=run.timings
+        ))
+        # Pull the schema frame now so execution errors still get a 500
+        header = next(frames)
+        response = StreamingHttpResponse(
+            itertools.chain([header], frames),
+            content_type='application/x-ndjson'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
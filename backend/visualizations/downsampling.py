@@ -0,0 +1,97 @@
+"""Point-budget downsampling for chart series"""
+import numpy as np
+
+
+def to_numeric(values):
+    """Convert x or y values to floats: numbers as is, dates as epoch milliseconds.
+
+    Returns None when the values are neither (e.g. category labels).
+    """
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        pass
+    try:
+        dates = np.asarray(values, dtype='datetime64[ms]')
+    except (TypeError, ValueError):
+        return None
+    numeric = dates.astype('int64').astype(float)
+    numeric[np.isnat(dates)] = np.nan
+    return numeric
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of ``threshold`` points that keep the series' shape.
+
+    ``x`` must be sorted. The first and last points are always kept; every
+    bucket in between contributes the point forming the largest triangle
+    with the previously selected point and the next bucket's average.
+    Thresholds below 3 keep the first point, then the last.
+    """
+    size = len(x)
+    if threshold >= size:
+        return np.arange(size)
+    if threshold < 3:
+        return np.array([0, size - 1], dtype=int)[:max(threshold, 0)]
+
+    # Missing values never win a bucket
+    valid = np.isfinite(x) & np.isfinite(y)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+
+    edges = np.linspace(1, size - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, size - 1
+
+    # Averages of each bucket, used as the third vertex by the bucket before it
+    counts = np.diff(edges)
+    sums_x = np.add.reduceat(x[:edges[-1]], edges[:-1])
+    sums_y = np.add.reduceat(y[:edges[-1]], edges[:-1])
+    next_x = np.append(sums_x / counts, x[-1])[1:]
+    next_y = np.append(sums_y / counts, y[-1])[1:]
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs(
+            (x[previous] - next_x[bucket]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y[bucket] - y[previous])
+        )
+        areas[~valid[start:end]] = -1
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def grid_thin(x, y, threshold):
+    """Indices of at most ``threshold`` scatter points, one per occupied grid cell.
+
+    The plot area is split into a roughly ``threshold``-cell grid and the
+    first point in each cell is kept, so sparse regions and outliers survive
+    while dense clusters are thinned. If more cells are occupied than the
+    budget allows, the kept points are sampled evenly.
+    """
+    size = len(x)
+    if threshold >= size or threshold < 1:
+        return np.arange(size)
+
+    valid = np.isfinite(x) & np.isfinite(y)
+    cells_per_axis = max(int(np.sqrt(threshold)), 1)
+
+    def cell(values):
+        low, high = np.nanmin(values[valid]), np.nanmax(values[valid])
+        span = (high - low) or 1.0
+        return np.clip(((values - low) / span * cells_per_axis).astype(int), 0, cells_per_axis - 1)
+
+    if not valid.any():
+        return np.linspace(0, size - 1, threshold).astype(int)
+
+    candidates = np.flatnonzero(valid)
+    cells = cell(x)[candidates] * cells_per_axis + cell(y)[candidates]
+    _, first = np.unique(cells, return_index=True)
+    kept = np.sort(candidates[first])
+
+    if len(kept) > threshold:
+        kept = kept[np.linspace(0, len(kept) - 1, threshold).astype(int)]
+    return kept
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visualization',
+            index=models.Index(fields=['-created_at'], name='visualizati_created_4904d4_idx'),
+        ),
+    ]
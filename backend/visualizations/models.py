@@ -41,6 +41,7 @@ class Visualization(models.Model):
     class Meta:
         db_table = 'visualizations'
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['-created_at'])]  # List pages, filtered through the query's user
 
     def __str__(self):
         return f"{self.name} ({self.type})"
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from .models import Visualization
 from queries.serializers import QuerySerializer
+from vizly.fieldsets import SparseFieldsMixin
 
 
-class VisualizationSerializer(serializers.ModelSerializer):
+class VisualizationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     query_details = QuerySerializer(source='query', read_only=True)
 
     class Meta:
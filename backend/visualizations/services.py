@@ -0,0 +1,203 @@
+"""Visualization data services"""
+import numpy as np
+from django.conf import settings
+from sqlalchemy import column, distinct, func, literal_column, select
+
+from .downsampling import grid_thin, lttb, to_numeric
+from connections.cache import cached_execute_query
+from connections.services import build_statement
+from queries.extracts import get_query_source
+from queries.parameters import coerce_parameters
+
+AGGREGATIONS = {
+    'sum': func.sum,
+    'avg': func.avg,
+    'min': func.min,
+    'max': func.max,
+    'count': func.count,
+    'count_distinct': lambda expression: func.count(distinct(expression)),
+}
+
+# Chart types that plot individual rows and are never grouped
+ROW_CHART_TYPES = ('table', 'scatter', 'bubble', 'candlestick', 'boxplot')
+
+# Chart types downsampled to a point budget, and how
+LINE_CHART_TYPES = ('line', 'area', 'stacked_area')
+SCATTER_CHART_TYPES = ('scatter', 'bubble')
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def get_chart_fields(visualization):
+    """Resolve the grouping and measure columns a chart needs from its config.
+
+    Returns ``(dimensions, measures)``. Sankey links group by their source
+    and target, gauges aggregate to a single value, and every other chart
+    groups by ``xAxis`` plus any ``groupBy`` columns (series for stacked
+    and grouped charts, inner rings for sunbursts).
+    """
+    config = visualization.config or {}
+    if visualization.type == 'sankey':
+        return [config.get('source', 'source'), config.get('target', 'target')], [config.get('value', 'value')]
+
+    measures = _as_list(config.get('yAxis'))
+    if visualization.type == 'gauge':
+        return [], measures
+    return _as_list(config.get('xAxis')) + _as_list(config.get('groupBy')), measures
+
+
+def build_visualization_statement(visualization, sql):
+    """Wrap the visualization's query ``sql`` in the SELECT that produces chart data.
+
+    With ``config.aggregation`` set (one of ``AGGREGATIONS``, or a
+    ``{measure: aggregation}`` map) the GROUP BY runs on the source
+    database, so only one row per group comes back. ``sortBy``/``sortOrder``
+    and ``limit`` are pushed down as well. Returns ``(statement, aggregated)``.
+    """
+    config = visualization.config or {}
+    dimensions, measures = get_chart_fields(visualization)
+    aggregation = config.get('aggregation')
+    aggregated = bool(aggregation) and visualization.type not in ROW_CHART_TYPES
+
+    if aggregated:
+        if not measures:
+            raise ValueError('Aggregated charts need at least one yAxis (or value) column')
+        if not dimensions and visualization.type != 'gauge':
+            raise ValueError('Aggregated charts need an xAxis column')
+
+        referenced = dimensions + [name for name in measures if name not in dimensions]
+        source = build_statement(sql).columns(
+            *[column(name) for name in referenced]
+        ).subquery('vizly_source')
+
+        outputs = {name: source.c[name] for name in dimensions}
+        for name in measures:
+            function_name = aggregation.get(name, 'sum') if isinstance(aggregation, dict) else aggregation
+            if function_name not in AGGREGATIONS:
+                raise ValueError(f"Unsupported aggregation: {function_name}")
+            outputs[name] = AGGREGATIONS[function_name](source.c[name]).label(name)
+
+        statement = select(*outputs.values()).group_by(*[source.c[name] for name in dimensions])
+        default_sort = dimensions[:1]
+    else:
+        sort_names = _as_list(config.get('sortBy'))
+        source = build_statement(sql).columns(
+            *[column(name) for name in sort_names]
+        ).subquery('vizly_source')
+        outputs = {name: source.c[name] for name in sort_names}
+        statement = select(literal_column('*')).select_from(source)
+        default_sort = []
+
+    sort_names = _as_list(config.get('sortBy')) or default_sort
+    descending = str(config.get('sortOrder', 'asc')).lower() == 'desc'
+    for name in sort_names:
+        if name not in outputs:
+            raise ValueError(f'Cannot sort by {name}: not a chart column')
+        statement = statement.order_by(outputs[name].desc() if descending else outputs[name].asc())
+
+    limit = config.get('limit')
+    if limit is not None:
+        try:
+            statement = statement.limit(int(limit))
+        except (TypeError, ValueError):
+            raise ValueError('limit must be an integer')
+
+    return statement, aggregated
+
+
+def get_point_budget(visualization, width=None):
+    """Points to send for a chart: ``config.maxPoints``, else the rendered width in pixels"""
+    budget = (visualization.config or {}).get('maxPoints') or width
+    if budget is None:
+        return settings.VISUALIZATION_MAX_POINTS
+    try:
+        budget = int(budget)
+    except (TypeError, ValueError):
+        raise ValueError('maxPoints and width must be integers')
+    if budget < 1:
+        raise ValueError('maxPoints and width must be positive')
+    return min(budget, settings.VISUALIZATION_MAX_POINTS)
+
+
+def downsample_rows(visualization, rows, budget):
+    """Reduce line/area series with LTTB and scatter points with grid thinning.
+
+    Line series are sorted by x and downsampled separately per ``groupBy``
+    series and ``yAxis`` column; a row is kept if any of them selects it,
+    and the rows kept never exceed ``budget``, even if that leaves some
+    series with only their endpoints or nothing. Rows come back in x
+    order. Charts whose x or y values aren't numbers or dates are returned
+    unchanged.
+    """
+    config = visualization.config or {}
+    x_names, y_names = _as_list(config.get('xAxis'))[:1], _as_list(config.get('yAxis'))
+    if len(rows) <= budget or not x_names or not y_names:
+        return rows
+
+    x = to_numeric([row.get(x_names[0]) for row in rows])
+    if x is None:
+        return rows
+
+    if visualization.type in SCATTER_CHART_TYPES:
+        y = to_numeric([row.get(y_names[0]) for row in rows])
+        return rows if y is None else [rows[index] for index in grid_thin(x, y, budget)]
+
+    order = np.argsort(x, kind='stable')
+    series = {}
+    for index in order:
+        key = tuple(rows[index].get(name) for name in _as_list(config.get('groupBy')))
+        series.setdefault(key, []).append(index)
+
+    # Split the budget so the union of all selections stays within it; the longest series get what's left over
+    groups = sorted(series.values(), key=len, reverse=True)
+    share, extra = divmod(budget, len(groups) * len(y_names))
+    kept = np.zeros(len(rows), dtype=bool)
+    selection = 0
+    for indices in groups:
+        indices = np.asarray(indices)
+        for name in y_names:
+            y = to_numeric([rows[index].get(name) for index in indices])
+            if y is None:
+                return rows
+            kept[indices[lttb(x[indices], y, share + (selection < extra))]] = True
+            selection += 1
+    return [rows[index] for index in order if kept[index]]
+
+
+def shape_visualization_data(visualization, result, aggregated, width=None):
+    """Turn the chart statement's result into the visualization's data.
+
+    Line, area and scatter charts are downsampled to the point budget (see
+    ``get_point_budget``); ``sourceRowCount`` reports the rows before that.
+    """
+    data = {**result, 'aggregated': aggregated, 'sourceRowCount': result['rowCount']}
+    if visualization.type in LINE_CHART_TYPES + SCATTER_CHART_TYPES:
+        data['rows'] = downsample_rows(visualization, result['rows'], get_point_budget(visualization, width))
+        data['rowCount'] = len(data['rows'])
+    return data
+
+
+def get_visualization_data(visualization, values=None, refresh=False, width=None, user=None, timings=None):
+    """Run the visualization's chart query through the result cache.
+
+    ``values`` are raw bind values for the query's declared parameters;
+    ``user`` is who the query runs for (see ``admit``). ``timings`` is
+    filled in as by ``execute_query``.
+    """
+    query = visualization.query
+    connection, sql = get_query_source(query)
+    statement, aggregated = build_visualization_statement(visualization, sql)
+    result = cached_execute_query(
+        connection, statement,
+        ttl=query.cache_ttl,
+        refresh=refresh,
+        timeout=query.statement_timeout,
+        params=coerce_parameters(query.parameters, values),
+        user=user,
+        timings=timings
+    )
+    return shape_visualization_data(visualization, result, aggregated, width)
@@ -0,0 +1,13 @@
+"""Visualization model signal handlers"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Visualization
+from queries.models import Query
+from vizly.metadata import invalidate_metadata
+
+
+@receiver(post_save, sender=Visualization)
+@receiver(post_delete, sender=Visualization)
+def invalidate_metadata_on_change(sender, instance, **kwargs):
+    invalidate_metadata(Query.objects.filter(pk=instance.query_id).values_list('user_id', flat=True).first())
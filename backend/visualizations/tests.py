@@ -0,0 +1,121 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from .downsampling import lttb
+from .models import Visualization
+from .services import downsample_rows
+from vizly.testing import VizlyTestCase
+
+
+class DownsampleRowsTests(SimpleTestCase):
+    def rows(self, series, points):
+        return [
+            {'x': point, 'series': index, 'a': (point * 7 + index) % 11, 'b': (point * 3 + index) % 5}
+            for index in range(series) for point in range(points)
+        ]
+
+    def chart(self, y_axis, group_by='series'):
+        return Visualization(type='line', config={'xAxis': 'x', 'yAxis': y_axis, 'groupBy': group_by})
+
+    def test_never_exceeds_the_budget(self):
+        for series in (1, 3, 40, 250):
+            rows = self.rows(series, 20)
+            for y_axis in (['a'], ['a', 'b']):
+                for budget in (1, 2, 5, 50, 100, 1000):
+                    with self.subTest(series=series, y_axis=y_axis, budget=budget):
+                        kept = downsample_rows(self.chart(y_axis), rows, budget)
+                        self.assertLessEqual(len(kept), budget)
+
+    def test_uses_the_budget(self):
+        kept = downsample_rows(self.chart(['a']), self.rows(4, 100), 50)
+        self.assertEqual(len(kept), 50)
+        self.assertEqual({row['series'] for row in kept}, {0, 1, 2, 3})
+        self.assertEqual([row['x'] for row in kept], sorted(row['x'] for row in kept))
+
+    def test_scatter_points_are_thinned(self):
+        chart = Visualization(type='scatter', config={'xAxis': 'x', 'yAxis': 'y'})
+        random = np.random.default_rng(0)
+        cluster = [{'x': x, 'y': y} for x, y in random.uniform(0, 1, (1000, 2))]
+        outliers = [{'x': 100.0, 'y': 100.0}, {'x': -50.0, 'y': 0.5}, {'x': 0.5, 'y': 80.0}]
+        rows = cluster[:500] + outliers + cluster[500:]
+
+        for budget in (1, 4, 50, 500):
+            with self.subTest(budget=budget):
+                self.assertLessEqual(len(downsample_rows(chart, rows, budget)), budget)
+
+        kept = downsample_rows(chart, rows, 100)
+        self.assertLess(len(kept), 100)
+        for outlier in outliers:
+            self.assertIn(outlier, kept)
+        # Kept rows stay in their original order
+        self.assertEqual(kept, [row for row in rows if row in kept])
+
+        uniform = [{'x': x, 'y': y} for x, y in random.uniform(0, 1, (5000, 2))]
+        self.assertGreater(len(downsample_rows(chart, uniform, 100)), 50)
+
+        small = cluster[:20]
+        self.assertIs(downsample_rows(chart, small, 20), small)
+        labels = [{'x': f'label {index}', 'y': index} for index in range(20)]
+        self.assertIs(downsample_rows(chart, labels, 5), labels)
+
+    def test_small_lttb_thresholds(self):
+        x, y = np.arange(10, dtype=float), np.ones(10)
+        self.assertEqual(lttb(x, y, 0).tolist(), [])
+        self.assertEqual(lttb(x, y, 1).tolist(), [0])
+        self.assertEqual(lttb(x, y, 2).tolist(), [0, 9])
+        self.assertEqual(len(lttb(x, y, 3)), 3)
+
+
+class VisualizationDataTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.query = self.create_query(self.create_source(), sql='SELECT id % 3 AS bucket, id, value FROM items')
+
+    def data(self, chart_type='bar', width=None, **config):
+        visualization = Visualization.objects.create(name='Chart', type=chart_type, config=config, query=self.query)
+        return self.client.get(f'/api/visualizations/{visualization.id}/data/', {'width': width} if width else {})
+
+    def test_aggregation_runs_on_the_source(self):
+        response = self.data(xAxis='bucket', yAxis=['value', 'id'], aggregation={'value': 'sum', 'id': 'count'})
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        self.assertTrue(data['aggregated'])
+        self.assertEqual(data['rows'], [
+            {'bucket': 0, 'value': 27.0, 'id': 3},
+            {'bucket': 1, 'value': 33.0, 'id': 4},
+            {'bucket': 2, 'value': 22.5, 'id': 3},
+        ])
+
+    def test_sort_and_limit(self):
+        response = self.data(
+            xAxis='bucket', yAxis='value', aggregation='max', sortBy='value', sortOrder='desc', limit=2
+        )
+        self.assertEqual(response.data['data']['rows'], [{'bucket': 1, 'value': 15.0}, {'bucket': 0, 'value': 13.5}])
+
+    def test_without_aggregation_rows_pass_through(self):
+        response = self.data(xAxis='id', yAxis='value')
+        self.assertFalse(response.data['data']['aggregated'])
+        self.assertEqual(response.data['data']['rowCount'], 10)
+
+    def test_invalid_config(self):
+        for config, message in (
+            ({'xAxis': 'bucket', 'yAxis': 'value', 'aggregation': 'median'}, 'Unsupported aggregation: median'),
+            ({'yAxis': 'value', 'aggregation': 'sum'}, 'Aggregated charts need an xAxis column'),
+            ({'xAxis': 'bucket', 'yAxis': 'value', 'aggregation': 'sum', 'sortBy': 'id'},
+             'Cannot sort by id: not a chart column'),
+        ):
+            with self.subTest(config=config):
+                response = self.data(**config)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['message'], message)
+
+    def test_line_charts_are_downsampled_to_the_width(self):
+        response = self.data('line', width=4, xAxis='id', yAxis='value')
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        self.assertEqual((data['rowCount'], data['sourceRowCount']), (4, 10))
+        # LTTB keeps both ends of the series
+        self.assertEqual((data['rows'][0]['id'], data['rows'][-1]['id']), (1, 10))
+
+        response = self.data('line', width=0, xAxis='id', yAxis='value', maxPoints=-1)
+        self.assertEqual(response.status_code, 400)
@@ -1,27 +1,49 @@
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Visualization
 from .serializers import VisualizationSerializer
+from .services import get_visualization_data
+from connections.admission import AdmissionRejectedError
+from connections.services import QueryTimeoutError
+from queries.runs import RunTracker
+from queries.views import conditional_result_response, get_flag, get_param
+from vizly.fieldsets import SparseFieldsViewSetMixin
+from vizly.metadata import get_cached_metadata
 
 
-class VisualizationViewSet(viewsets.ModelViewSet):
+# Relations joined for each expanded field
+QUERY_RELATIONS = {
+    'query_details': 'query',
+    'query_details.connection_details': 'query__connection',
+    'query_details.extract': 'query__extract',
+}
+
+
+def get_user_visualization(user, pk):
+    """A user's visualization with its query, connection and extract, through the metadata cache"""
+    return get_cached_metadata(
+        user.id, 'visualization', pk,
+        lambda: Visualization.objects.select_related(*QUERY_RELATIONS.values())
+        .defer('query__connection__password').get(pk=pk, query__user=user)
+    )
+
+
+class VisualizationViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for visualizations"""
     serializer_class = VisualizationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Visualization.objects.filter(
-            query__user=self.request.user
-        ).select_related('query__connection')
+        queryset = Visualization.objects.filter(query__user=self.request.user)
+        related = self.expanded_lookups(QUERY_RELATIONS)
+        return queryset.select_related(*related) if related else queryset
 
     def list(self, request):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'status': 'success',
-            'data': {'visualizations': serializer.data}
-        })
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response({'visualizations': serializer.data})
 
     def retrieve(self, request, pk=None):
         try:
@@ -83,3 +105,50 @@ class VisualizationViewSet(viewsets.ModelViewSet):
                 'status': 'error',
                 'message': 'Visualization not found'
             }, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=True, methods=['get', 'post'])
+    def data(self, request, pk=None):
+        """Get chart-ready data, aggregated on the source database"""
+        try:
+            visualization = get_user_visualization(request.user, pk)
+            query = visualization.query
+            with RunTracker('visualization', query_id=query.id, connection=query.connection,
+                            user=request.user) as run:
+                width = get_param(request, 'width')
+                run.result = get_visualization_data(
+                    visualization,
+                    values=request.data.get('params'),
+                    refresh=get_flag(request, 'refresh'),
+                    width=width,
+                    user=request.user,
+                    timings=run.timings
+                )
+                # Shaping depends on the visualization and width as well as the result
+                return run.attach(conditional_result_response(
+                    request, run.result, str(visualization.id), visualization.updated_at, width
+                ))
+        except Visualization.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Visualization not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except QueryTimeoutError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except AdmissionRejectedError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,47 @@
+"""Coroutine handlers for DRF views.
+
+DRF's ``APIView.dispatch`` calls handlers synchronously. ``AsyncAPIView``
+dispatches ``async def`` handlers instead, so Django runs the view on the
+event loop under ASGI. Authentication, permission and throttle checks
+touch the database, so they run in a thread first. The response is
+rendered by Django afterwards, the same as for sync views.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from rest_framework.views import APIView
+
+# Whether the current request came from the ASGI server, whose event loop
+# lives as long as the worker. Under WSGI, Django runs async views on a new
+# event loop per request.
+serving_asgi = ContextVar('serving_asgi', default=False)
+
+
+class AsyncAPIView(APIView):
+    """``APIView`` whose HTTP method handlers are coroutines"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        serving_asgi.set(isinstance(request, ASGIRequest))
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
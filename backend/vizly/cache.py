@@ -0,0 +1,116 @@
+"""File-based cache for hosts without Redis.
+
+Django's ``FileBasedCache`` culls random entries once it's full, and its
+``add`` and ``incr`` are a read followed by a write, so two workers can
+both take the same lock or lose an increment. ``LRUFileBasedCache``
+evicts the least recently used entries instead (a read refreshes the
+entry's mtime) and runs ``add``, ``incr`` and ``decr`` under an exclusive
+lock on the cache directory, held by one process of the host at a time.
+
+Entries are still per host: deployments with more than one host need
+``REDIS_URL``.
+"""
+import os
+import pickle
+import time
+import zlib
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """``FileBasedCache`` with LRU culling and atomic ``add``/``incr`` (see the module docstring)"""
+    lock_name = 'cache.lock'  # Not a cache file (no suffix), so never culled or cleared
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, self.lock_name), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing_key, version)
+        if value is self._missing_key:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except FileNotFoundError:
+            pass
+        return value
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        """Add ``delta`` to the value, keeping its expiry; ValueError if there is none"""
+        with self._locked():
+            try:
+                with open(self._key_to_file(key, version), 'rb') as f:
+                    expiry = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except (FileNotFoundError, EOFError):
+                expiry = 0
+            if expiry is not None and expiry < time.time():
+                raise ValueError(f"Key '{key}' not found")
+
+            value += delta
+            self.set(key, value, None if expiry is None else expiry - time.time(), version)
+            return value
+
+    async def aincr(self, key, delta=1, version=None):
+        return await sync_to_async(self.incr, thread_sensitive=True)(key, delta, version)
+
+    def _is_expired(self, f):
+        """Whether open cache file ``f`` has expired, deleting it if it's still the file at its path"""
+        try:
+            expiry = pickle.load(f)
+        except EOFError:
+            expiry = 0  # An empty file is considered expired
+        if expiry is None or expiry >= time.time():
+            return False
+
+        opened = os.fstat(f.fileno())
+        f.close()
+        try:
+            # add() may have replaced the expired entry since it was opened
+            if os.path.samestat(opened, os.stat(f.name)):
+                self._delete(f.name)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _cull(self):
+        """Once ``MAX_ENTRIES`` is reached, remove expired entries, then the least recently used"""
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+        live = [fname for fname in filelist if not self._file_expired(fname)]
+        live.sort(key=self._last_used)
+        for fname in live[:int(num_entries / self._cull_frequency) - (num_entries - len(live))]:
+            self._delete(fname)
+
+    def _file_expired(self, fname):
+        try:
+            with open(fname, 'rb') as f:
+                return self._is_expired(f)
+        except FileNotFoundError:
+            return True
+
+    @staticmethod
+    def _last_used(fname):
+        try:
+            return os.stat(fname).st_mtime
+        except FileNotFoundError:
+            return 0
@@ -0,0 +1,185 @@
+"""Content-negotiated response compression.
+
+Picks zstd, brotli or gzip from the request's ``Accept-Encoding`` (zstd
+and brotli only when their packages are installed) and compresses JSON,
+NDJSON, Arrow and text responses of at least ``COMPRESSION_MIN_SIZE``
+bytes. Streaming responses are compressed frame by frame, flushing after
+each one so clients can still decode rows as they arrive.
+
+A compressed response is a different representation, so its strong ETag
+gets the encoding appended (``"abc"`` becomes ``"abc-gzip"``);
+``vizly.conditional`` strips it again when matching ``If-None-Match``.
+"""
+import functools
+import re
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/x-ndjson', 'application/vnd.apache.arrow.stream',
+    'text/', 'application/openmetrics-text'
+)
+ETAG_ENCODING_SUFFIX = re.compile(r'-(?:zstd|br|gzip)"$')
+
+
+def _gzip():
+    # wbits 31 writes a gzip header; its mtime is 0, so output is deterministic
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, functools.partial(compressor.flush, zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _brotli():
+    compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return compressor.process, compressor.flush, compressor.finish
+
+
+def _zstd():
+    compressor = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+    return (
+        compressor.compress, functools.partial(compressor.flush, zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compressor.flush
+    )
+
+
+# Content-Encoding: factory returning (compress, flush, finish), or None when not installed
+ENCODERS = {
+    'zstd': _zstd if zstandard else None,
+    'br': _brotli if brotli else None,
+    'gzip': _gzip,
+}
+
+
+def available_encodings():
+    """``COMPRESSION_ENCODINGS`` that can be produced here, in preference order"""
+    return [name for name in settings.COMPRESSION_ENCODINGS if ENCODERS.get(name)]
+
+
+def choose_encoding(accept_encoding):
+    """Pick the encoding for an ``Accept-Encoding`` header, or None for identity.
+
+    The highest q-value wins; ties go to the first in
+    ``COMPRESSION_ENCODINGS``.
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.lower()] = quality
+
+    best, best_quality = None, 0.0
+    for name in available_encodings():
+        quality = accepted.get(name, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def strip_encoding_suffix(etag):
+    """ETag as the view set it, without the suffix added on compression"""
+    return ETAG_ENCODING_SUFFIX.sub('"', etag)
+
+
+class CompressionMiddleware:
+    """Compress responses for clients that accept it (see the module docstring).
+
+    Supports async requests; under ASGI, bodies are compressed in a worker
+    thread so the event loop isn't held up by large results.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        encoding = self.negotiate(request, response)
+        return self.compress(response, encoding) if encoding else response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        encoding = self.negotiate(request, response)
+        if not encoding:
+            return response
+        if response.streaming:
+            return self.compress(response, encoding)
+        return await sync_to_async(self.compress, thread_sensitive=False)(response, encoding)
+
+    def negotiate(self, request, response):
+        """Encoding to compress ``response`` with, or None to leave it as is"""
+        if response.has_header('Content-Encoding') or request.method == 'HEAD':
+            return None
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return None
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return None
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return None
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+    def compress(self, response, encoding):
+        compress, flush, finish = ENCODERS[encoding]()
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self._compress_async_stream(
+                    response.streaming_content, compress, flush, finish
+                )
+            else:
+                response.streaming_content = self._compress_stream(response.streaming_content, compress, flush, finish)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(response.content) + finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response.headers['ETag'] = etag[:-1] + f'-{encoding}"'
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def _compress_stream(chunks, compress, flush, finish):
+        for chunk in chunks:
+            data = compress(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+
+    @staticmethod
+    async def _compress_async_stream(chunks, compress, flush, finish):
+        async for chunk in chunks:
+            data = compress(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
@@ -0,0 +1,77 @@
+"""Strong ETags and 304 Not Modified replies for result and dashboard endpoints.
+
+Views compute an ETag from what the response is built from (a result
+cache fingerprint, model timestamps) and check ``If-None-Match`` before
+serializing anything, so revalidating an unchanged result costs a cache
+lookup instead of rendering and sending it again. Execute is a POST but
+reads like a GET, so it is revalidated the same way.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .compression import strip_encoding_suffix
+
+
+def make_etag(*parts):
+    """Strong ETag for JSON-serializable ``parts``"""
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, cls=DjangoJSONEncoder).encode()).hexdigest()
+    return quote_etag(digest[:40])
+
+
+def matching_etag(request, etag):
+    """The ``If-None-Match`` entry that matches ``etag``, as the client sent it, or None"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return None
+    for candidate in parse_etags(header):
+        if candidate == '*':
+            return etag
+        # If-None-Match uses weak comparison
+        if strip_encoding_suffix(candidate.removeprefix('W/')) == etag:
+            return candidate
+    return None
+
+
+def not_modified(request, etag):
+    """A 304 response when the client already has ``etag``, else None"""
+    matched = matching_etag(request, etag)
+    if matched is None:
+        return None
+    response = Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': matched})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def with_etag(request, response, etag=None):
+    """Tag ``response`` so clients can revalidate it.
+
+    Without ``etag``, it's computed from the rendered content, which
+    spares the client the download of an unchanged response but not the
+    server the rendering.
+    """
+    patch_cache_control(response, private=True, no_cache=True)
+    if etag:
+        response.headers['ETag'] = etag
+        return response
+
+    def tag_content(rendered):
+        if rendered.status_code != status.HTTP_200_OK:
+            return None
+        content_etag = quote_etag(hashlib.sha256(rendered.content).hexdigest()[:40])
+        matched = matching_etag(request, content_etag)
+        if matched is None:
+            rendered.headers['ETag'] = content_etag
+            return None
+        replacement = HttpResponseNotModified(headers={'ETag': matched})
+        patch_cache_control(replacement, private=True, no_cache=True)
+        return replacement
+
+    response.add_post_render_callback(tag_content)
+    return response
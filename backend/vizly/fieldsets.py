@@ -0,0 +1,95 @@
+"""Sparse fieldsets (``?fields=``) and opt-in expansion (``?expand=``) of nested serializers.
+
+Both parameters take comma-separated field names, dotted to reach into
+nested serializers: ``?fields=id,name,items`` keeps three fields, and
+``?expand=items.visualization_details`` includes the dashboard's items
+and, within them, each visualization. Naming a nested field in
+``fields`` expands it too.
+
+List actions leave nested serializers out unless expanded; other actions
+include them all unless ``expand`` is given. Viewsets check
+``is_expanded`` to only join or prefetch the relations that are sent.
+Both only shape responses: writable fields left out are still validated
+and saved on create and update.
+"""
+from rest_framework.serializers import BaseSerializer
+
+
+def parse_field_paths(value):
+    """Turn ``'a,b.c,b.d'`` into ``{'a': {}, 'b': {'c': {}, 'd': {}}}``"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def expand_subtree(expand, name):
+    """What to expand within ``name``; True expands everything"""
+    return True if expand is True else expand.get(name, {})
+
+
+def includes_field(fields, expand, name, nested):
+    """Whether field ``name`` is sent, given this level's ``fields`` and ``expand`` trees"""
+    if fields and name not in fields:
+        return False
+    return not nested or expand is True or name in expand or name in fields
+
+
+class SparseFieldsMixin:
+    """Serializer taking ``fields`` and ``expand`` trees (see ``parse_field_paths``).
+
+    An empty ``fields`` tree keeps every field; ``expand=True`` keeps
+    every nested serializer. Writable fields left out become write-only
+    rather than being removed.
+    """
+
+    def __init__(self, *args, fields=None, expand=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.restrict_fields(fields or {}, expand)
+
+    def restrict_fields(self, fields, expand):
+        for name, field in list(self.fields.items()):
+            nested = isinstance(field, BaseSerializer)
+            if not includes_field(fields, expand, name, nested):
+                if field.read_only:
+                    self.fields.pop(name)
+                else:
+                    field.write_only = True
+            elif nested:
+                child = getattr(field, 'child', field)
+                if isinstance(child, SparseFieldsMixin):
+                    child.restrict_fields(fields.get(name, {}), expand_subtree(expand, name))
+
+
+class SparseFieldsViewSetMixin:
+    """Pass the request's ``fields`` and ``expand`` to the viewset's serializer"""
+
+    def get_fieldsets(self):
+        params = self.request.query_params
+        fields = parse_field_paths(params.get('fields', ''))
+        if 'expand' in params:
+            expand = parse_field_paths(params['expand'])
+        else:
+            expand = {} if self.action == 'list' else True
+        return fields, expand
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_fieldsets()
+        kwargs.setdefault('fields', fields)
+        kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def is_expanded(self, path):
+        """Whether the nested serializer at dotted ``path`` is part of the response"""
+        fields, expand = self.get_fieldsets()
+        for name in path.split('.'):
+            if not includes_field(fields, expand, name, nested=True):
+                return False
+            fields, expand = fields.get(name, {}), expand_subtree(expand, name)
+        return True
+
+    def expanded_lookups(self, relations):
+        """ORM lookups from ``relations`` (``{field path: lookup}``) whose fields are expanded"""
+        return [lookup for path, lookup in relations.items() if self.is_expanded(path)]
@@ -0,0 +1,93 @@
+"""Read-through cache for users and their connections, queries, visualizations and dashboards.
+
+Executions and dashboard views read the same few rows on every request,
+while edits are rare. Those reads go through the default cache (shared
+across workers and hosts with ``REDIS_URL``), holding model instances
+with the relations the hot paths use already loaded, for
+``METADATA_CACHE_TTL`` seconds.
+
+Keys carry a per-user version. Saving or deleting any of a user's
+objects replaces the version once the transaction commits (see each
+app's signals), so a single edit retires every cached object that may
+embed it, such as a dashboard holding the edited query. Retired entries
+are left to expire. Refreshes, which only change a query and its
+extract, drop just the entries embedding that query instead.
+
+Loaders defer connection passwords and users' password hashes, so they
+are never written to the cache; the few code paths that need one
+(building an engine) load it from the database on access.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .metrics import CACHE_LOOKUPS
+
+KEY_PREFIX = 'metadata:1'
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}:version:{user_id}'
+
+
+def _entry_key(user_id, version, kind, pk):
+    return f'{KEY_PREFIX}:{user_id}:{version}:{kind}:{pk}'
+
+
+def get_metadata_version(user_id):
+    """The user's current version, starting one if there is none"""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def get_cached_metadata(user_id, kind, pk, load):
+    """Return ``load()``'s instance through the cache, as of the user's current version.
+
+    ``kind`` and ``pk`` identify the object within the user's metadata.
+    Exceptions from ``load``, such as ``DoesNotExist``, propagate and
+    nothing is cached.
+    """
+    if not settings.METADATA_CACHE_TTL:
+        return load()
+
+    key = _entry_key(user_id, get_metadata_version(user_id), kind, pk)
+    instance = cache.get(key)
+    if instance is not None:
+        CACHE_LOOKUPS.labels('metadata', 'hit').inc()
+        return instance
+
+    CACHE_LOOKUPS.labels('metadata', 'miss').inc()
+    instance = load()
+    cache.set(key, instance, settings.METADATA_CACHE_TTL)
+    return instance
+
+
+def invalidate_metadata(user_id):
+    """Retire the user's cached metadata once the current transaction commits"""
+    if user_id is not None:
+        # Bumped after commit, so a concurrent miss can't cache the old rows under the new version
+        transaction.on_commit(lambda: cache.set(_version_key(user_id), uuid.uuid4().hex, None))
+
+
+def invalidate_metadata_entries(user_id, entries):
+    """Drop single cached objects, given as ``(kind, pk)``, once the current transaction commits.
+
+    For changes that only show in those objects, such as a query's refresh
+    time, where retiring all of the user's metadata would be wasteful.
+    """
+    entries = list(entries)
+    if user_id is None or not entries:
+        return
+
+    def delete_entries():
+        version = cache.get(_version_key(user_id))
+        if version is not None:
+            cache.delete_many([_entry_key(user_id, version, kind, pk) for kind, pk in entries])
+
+    transaction.on_commit(delete_entries)
@@ -0,0 +1,152 @@
+"""Prometheus metrics for the API and query hot paths.
+
+Under Gunicorn, ``gunicorn.conf.py`` points ``PROMETHEUS_MULTIPROC_DIR`` at a
+directory shared by the workers. Each worker then writes its samples to
+memory-mapped files there, and ``/metrics`` aggregates every worker's
+files. Without that variable (``runserver``, management commands) the
+process-local default registry is exposed.
+"""
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+
+# Seconds; API requests and query executions span milliseconds to the longest statement timeouts
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REQUEST_DURATION = Histogram(
+    'vizly_http_request_duration_seconds', 'API request latency by view and action',
+    ['view', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+QUERY_DURATION = Histogram(
+    'vizly_query_duration_seconds', 'Query executions that reached a database, by connection type',
+    ['connection_type', 'source'], buckets=LATENCY_BUCKETS
+)
+QUERY_PHASE_DURATION = Histogram(
+    'vizly_query_phase_duration_seconds', 'Time per execution phase: connect, execute, fetch, serialize',
+    ['connection_type', 'phase'], buckets=LATENCY_BUCKETS
+)
+QUERY_ERRORS = Counter(
+    'vizly_query_errors_total', 'Failed query executions by exception class',
+    ['connection_type', 'error_class']
+)
+ROWS_FETCHED = Counter(
+    'vizly_query_rows_fetched_total', 'Rows fetched from databases', ['connection_type']
+)
+BYTES_SERIALIZED = Counter(
+    'vizly_query_bytes_serialized_total', 'Bytes of query results sent to clients', ['source']
+)
+EXECUTIONS_IN_FLIGHT = Gauge(
+    'vizly_query_executions_in_flight', 'Executions holding a database connection',
+    ['connection_type'], multiprocess_mode='livesum'
+)
+CACHE_LOOKUPS = Counter(
+    'vizly_cache_lookups_total', 'Cache lookups by cache and result (hit or miss)', ['cache', 'result']
+)
+POOL_CHECKOUTS = Counter(
+    'vizly_pool_checkouts_total', 'Connections checked out of engine pools', ['connection_type']
+)
+POOL_CHECKED_OUT = Gauge(
+    'vizly_pool_checked_out', 'Connections currently checked out of engine pools',
+    ['connection_type'], multiprocess_mode='livesum'
+)
+POOL_OVERFLOW = Gauge(
+    'vizly_pool_overflow', 'Connections open beyond pool_size (up to max_overflow)',
+    ['connection_type'], multiprocess_mode='livesum'
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    'vizly_pool_checkout_wait_seconds', 'Time to check a connection out of its engine pool',
+    ['connection_type'], buckets=LATENCY_BUCKETS
+)
+
+
+def observe_pool(engine, connection_type):
+    """Count checkouts, checked-out connections and overflow for an engine's pool"""
+    pool = engine.pool
+    overflow = [0]  # This pool's share of the overflow gauge
+
+    def update_overflow():
+        current = max(pool.overflow(), 0) if hasattr(pool, 'overflow') else 0
+        POOL_OVERFLOW.labels(connection_type).inc(current - overflow[0])
+        overflow[0] = current
+
+    def on_checkout(dbapi_connection, record, proxy):
+        POOL_CHECKOUTS.labels(connection_type).inc()
+        POOL_CHECKED_OUT.labels(connection_type).inc()
+        update_overflow()
+
+    def on_checkin(dbapi_connection, record):
+        POOL_CHECKED_OUT.labels(connection_type).dec()
+        update_overflow()
+
+    event.listen(pool, 'checkout', on_checkout)
+    event.listen(pool, 'checkin', on_checkin)
+
+
+def get_view_label(request):
+    """``ViewSet.action`` for DRF views, else the URL name or view function name"""
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None)
+    actions = getattr(match.func, 'actions', None)
+    if view_class is not None and actions:
+        return f'{view_class.__name__}.{actions.get(request.method.lower(), request.method.lower())}'
+    if view_class is not None:
+        return view_class.__name__
+    return match.url_name or match.func.__name__
+
+
+class MetricsMiddleware:
+    """Time every request into ``vizly_http_request_duration_seconds``.
+
+    Streaming responses are timed until their first frame is ready, not
+    until the client has read them. Supports async requests, so async
+    views under ASGI aren't moved onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.monotonic()
+        response = self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.monotonic()
+        response = await self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    def observe(self, request, response, started):
+        if request.path != '/metrics':
+            REQUEST_DURATION.labels(
+                get_view_label(request), request.method, str(response.status_code)
+            ).observe(time.monotonic() - started)
+
+
+def metrics_view(request):
+    """Prometheus exposition, aggregated across workers in multiprocess mode"""
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponseForbidden()
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
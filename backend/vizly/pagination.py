@@ -0,0 +1,30 @@
+"""Cursor pagination for the list endpoints.
+
+Pages follow the model's default ordering (``-updated_at`` or
+``-created_at``) and each one starts where the previous one ended, with
+a ``WHERE`` on the ordering field instead of an ``OFFSET``, so deep pages
+cost the same as the first. Ties on the ordering field are stepped over
+within the cursor.
+"""
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class ModelCursorPagination(CursorPagination):
+    """``CursorPagination`` on the model's ``Meta.ordering``, in the API envelope"""
+    page_size_query_param = 'page_size'
+
+    @property
+    def max_page_size(self):
+        return settings.API_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(queryset.model._meta.ordering)
+
+    def get_paginated_response(self, data):
+        """Wrap ``data``, the list's payload, with links to the next and previous pages"""
+        return Response({
+            'status': 'success',
+            'data': {**data, 'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        })
@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'vizly.metrics.MetricsMiddleware',
+    'vizly.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -76,6 +78,50 @@ DATABASES = {
     'default': dj_database_url.parse(DATABASE_URL)
 }
 
+# Cache
+# Production runs on Redis: set REDIS_URL so every Gunicorn worker and node
+# shares one cache, locks and counters, and run Redis with maxmemory and
+# "maxmemory-policy allkeys-lru" to bound it (manage.py check --deploy warns
+# when it's unset). Without it an LRU file cache under BASE_DIR/cache, with
+# atomic add/incr, is shared by the workers of one host only.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'query_results': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'results',
+        },
+        'admission': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'admission',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'vizly.cache.LRUFileBasedCache',
+            'LOCATION': BASE_DIR / 'cache' / 'default',
+            'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int)},
+        },
+        'query_results': {
+            'BACKEND': 'vizly.cache.LRUFileBasedCache',
+            'LOCATION': BASE_DIR / 'cache' / 'results',
+            'OPTIONS': {'MAX_ENTRIES': config('QUERY_CACHE_MAX_ENTRIES', default=1000, cast=int)},
+        },
+        # Slot leases and queue counters; culling drops expired entries first, so live ones are never evicted
+        'admission': {
+            'BACKEND': 'vizly.cache.LRUFileBasedCache',
+            'LOCATION': BASE_DIR / 'cache' / 'admission',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -115,14 +161,15 @@ AUTH_USER_MODEL = 'api.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'vizly.pagination.ModelCursorPagination',
     'PAGE_SIZE': 50,
 }
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=500, cast=int)  # Largest ?page_size= for list endpoints
 
 # JWT Settings
 SIMPLE_JWT = {
@@ -143,3 +190,83 @@ CORS_ALLOWED_ORIGINS = config(
 ).split(',')
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ['ETag']  # Read by clients revalidating with If-None-Match
+
+# Response compression (see vizly/compression.py); zstd and br need the zstandard and brotli packages
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)  # Bytes; smaller bodies go as is
+COMPRESSION_ENCODINGS = config('COMPRESSION_ENCODINGS', default='zstd,br,gzip').split(',')  # Preference order
+COMPRESSION_GZIP_LEVEL = config('COMPRESSION_GZIP_LEVEL', default=6, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
+COMPRESSION_ZSTD_LEVEL = config('COMPRESSION_ZSTD_LEVEL', default=3, cast=int)
+
+# Query execution
+QUERY_STREAM_BATCH_SIZE = config('QUERY_STREAM_BATCH_SIZE', default=1000, cast=int)
+QUERY_STATEMENT_TIMEOUT = config('QUERY_STATEMENT_TIMEOUT', default=0, cast=int)  # Seconds, 0 disables
+QUERY_COMPILED_CACHE_SIZE = config('QUERY_COMPILED_CACHE_SIZE', default=500, cast=int)  # Per engine
+QUERY_MAX_PAGE_SIZE = config('QUERY_MAX_PAGE_SIZE', default=10000, cast=int)
+SQLITE_MMAP_SIZE = config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int)  # Bytes, 0 disables
+# Serve execute, execute_raw and connection test with async views on async drivers; set only under ASGI.
+# Under ASGI, every other (sync) view runs on one thread per worker (sync_to_async(thread_sensitive=True)),
+# so run as many workers as the WSGI deployment would have processes.
+ASYNC_QUERY_VIEWS = config('ASYNC_QUERY_VIEWS', default=False, cast=bool)
+
+# Schema catalog (see connections/schema.py)
+SCHEMA_CACHE_TTL = config('SCHEMA_CACHE_TTL', default=7 * 24 * 3600, cast=int)  # Seconds
+SCHEMA_REFRESH_AFTER = config('SCHEMA_REFRESH_AFTER', default=600, cast=int)  # Seconds before a background refresh
+SCHEMA_REFRESH_LOCK_TIMEOUT = config('SCHEMA_REFRESH_LOCK_TIMEOUT', default=600, cast=int)
+SCHEMA_INDEX_CACHE_SIZE = config('SCHEMA_INDEX_CACHE_SIZE', default=32, cast=int)  # Connections per process
+SCHEMA_SEARCH_MIN_SIMILARITY = config('SCHEMA_SEARCH_MIN_SIMILARITY', default=0.3, cast=float)
+
+# Query extracts (see queries/extracts.py); kept outside MEDIA_ROOT, which is served publicly
+EXTRACT_ROOT = config('EXTRACT_ROOT', default=str(BASE_DIR / 'extracts'))
+
+# Metadata cache for users, connections, queries, visualizations and dashboards (see vizly/metadata.py)
+METADATA_CACHE_TTL = config('METADATA_CACHE_TTL', default=3600, cast=int)  # Seconds, 0 disables
+
+# Query result cache (see connections/cache.py)
+QUERY_CACHE_TTL = config('QUERY_CACHE_TTL', default=300, cast=int)  # Seconds, 0 disables
+QUERY_CACHE_MAX_ENTRY_BYTES = config('QUERY_CACHE_MAX_ENTRY_BYTES', default=20 * 1024 * 1024, cast=int)
+QUERY_CACHE_LOCK_TIMEOUT = config('QUERY_CACHE_LOCK_TIMEOUT', default=300, cast=int)
+QUERY_CACHE_WAIT_TIMEOUT = config('QUERY_CACHE_WAIT_TIMEOUT', default=60, cast=int)
+
+# Background query jobs (see queries/jobs.py)
+QUERY_JOB_WORKERS = config('QUERY_JOB_WORKERS', default=4, cast=int)  # Per Gunicorn worker
+QUERY_JOB_QUEUE_SIZE = config('QUERY_JOB_QUEUE_SIZE', default=16, cast=int)
+QUERY_JOB_RETENTION = config('QUERY_JOB_RETENTION', default=3600, cast=int)  # Seconds
+
+# Admission control (see connections/admission.py); slot leases and queue counters live in
+# the 'admission' cache, which must be a backend every worker shares (Redis, with REDIS_URL)
+# for limits to hold across workers and nodes. Without it they are only shared by one host.
+ADMISSION_USER_CONCURRENCY = config('ADMISSION_USER_CONCURRENCY', default=4, cast=int)  # 0 disables
+ADMISSION_CONNECTION_CONCURRENCY = config('ADMISSION_CONNECTION_CONCURRENCY', default=10, cast=int)  # 0 disables
+ADMISSION_QUEUE_SIZE = config('ADMISSION_QUEUE_SIZE', default=32, cast=int)  # Waiting requests per connection
+ADMISSION_WAIT_TIMEOUT = config('ADMISSION_WAIT_TIMEOUT', default=30, cast=int)  # Seconds
+ADMISSION_LEASE_TIMEOUT = config('ADMISSION_LEASE_TIMEOUT', default=3600, cast=int)  # Seconds before a lost slot frees
+ADMISSION_POLL_INTERVAL = config('ADMISSION_POLL_INTERVAL', default=0.5, cast=float)  # Max seconds between checks
+ADMISSION_RETRY_AFTER = config('ADMISSION_RETRY_AFTER', default=5, cast=int)  # Seconds, sent with HTTP 429
+
+# Prometheus metrics at /metrics (see vizly/metrics.py); set a token to require
+# "Authorization: Bearer <token>" from the scraper
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Query run history (see queries/runs.py); written in batches off the request path
+QUERY_RUN_HISTORY = config('QUERY_RUN_HISTORY', default=True, cast=bool)
+QUERY_RUN_BATCH_SIZE = config('QUERY_RUN_BATCH_SIZE', default=500, cast=int)
+QUERY_RUN_FLUSH_INTERVAL = config('QUERY_RUN_FLUSH_INTERVAL', default=2, cast=float)  # Seconds
+QUERY_RUN_QUEUE_SIZE = config('QUERY_RUN_QUEUE_SIZE', default=10000, cast=int)  # Per process; overflow is dropped
+QUERY_RUN_RETENTION_DAYS = config('QUERY_RUN_RETENTION_DAYS', default=30, cast=int)
+
+# Scheduled query refreshes (see queries/scheduler.py)
+SCHEDULER_IN_PROCESS = config('SCHEDULER_IN_PROCESS', default=False, cast=bool)  # Else run manage.py run_scheduler
+SCHEDULER_POLL_INTERVAL = config('SCHEDULER_POLL_INTERVAL', default=30, cast=int)  # Seconds
+SCHEDULER_WORKERS = config('SCHEDULER_WORKERS', default=4, cast=int)
+SCHEDULER_CONNECTION_CONCURRENCY = config('SCHEDULER_CONNECTION_CONCURRENCY', default=2, cast=int)
+SCHEDULER_JITTER = config('SCHEDULER_JITTER', default=30, cast=int)  # Max random delay in seconds
+SCHEDULER_LOCK_TIMEOUT = config('SCHEDULER_LOCK_TIMEOUT', default=3600, cast=int)
+
+# Visualization data (see visualizations/services.py)
+VISUALIZATION_MAX_POINTS = config('VISUALIZATION_MAX_POINTS', default=4000, cast=int)  # Per line/scatter chart
+
+# Dashboard batch execution (see dashboards/services.py)
+DASHBOARD_WORKERS = config('DASHBOARD_WORKERS', default=8, cast=int)  # Per Gunicorn worker
+DASHBOARD_CONNECTION_CONCURRENCY = config('DASHBOARD_CONNECTION_CONCURRENCY', default=4, cast=int)
@@ -0,0 +1,128 @@
+"""Shared setup for the apps' test suites"""
+import asyncio
+import shutil
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.backends.signals import connection_created
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from connections import async_services
+from connections.models import Connection
+from connections.services import dispose_connection_engine, get_connection_url
+from queries.models import Query
+
+# Per-process caches, so tests neither share state through files nor need Redis
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+    for alias in ('default', 'query_results', 'admission')
+}
+
+
+@override_settings(CACHES=TEST_CACHES, QUERY_RUN_HISTORY=False, METADATA_CACHE_TTL=0)
+class VizlyTestCase(TestCase):
+    """Test case with a signed-in API client and SQLite source databases.
+
+    Caches are emptied before each test. Run history and the metadata
+    cache are off unless a test turns them back on.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source_dir = Path(tempfile.mkdtemp())
+        cls.addClassCleanup(shutil.rmtree, cls.source_dir, ignore_errors=True)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.user = self.create_user('owner@example.com')
+        self.client = self.client_for(self.user)
+
+    @staticmethod
+    def create_user(email, **extra):
+        return get_user_model().objects.create_user(
+            username=email.split('@')[0], email=email, name=email, password='password', **extra
+        )
+
+    @staticmethod
+    def client_for(user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    @contextmanager
+    def assertNoWorkerQueries(self):
+        """Fail if a thread other than the test's connects to the internal database within the block.
+
+        Engines built meanwhile read their connection's password, as they do
+        for server databases, so a deferred password would be loaded there.
+        """
+        test_thread = threading.current_thread()
+        connected = []
+
+        def record(sender, **kwargs):
+            if threading.current_thread() is not test_thread:
+                connected.append(threading.current_thread().name)
+
+        def connection_url(connection, *args, **kwargs):
+            connection.password
+            return get_connection_url(connection, *args, **kwargs)
+
+        connection_created.connect(record, weak=False)
+        try:
+            with mock.patch('connections.services.get_connection_url', side_effect=connection_url):
+                yield
+        finally:
+            connection_created.disconnect(record)
+        self.assertEqual(connected, [], 'Worker threads queried the internal database')
+
+    async def call_view(self, view, factory, path, data=None, user=None, **kwargs):
+        """POST ``data`` to an ``AsyncAPIView`` and return the rendered response.
+
+        ``factory`` is an ``AsyncRequestFactory`` for requests as the ASGI
+        server makes them, or a ``RequestFactory`` for WSGI ones. Requests
+        are made as ``user``, or this test's user; pass ``user=False`` for
+        anonymous ones.
+        """
+        request = factory.post(path, data or {}, content_type='application/json')
+        if user is not False:
+            request._force_auth_user = user or self.user
+        response = await view.as_view()(request, **kwargs)
+        return response.render()
+
+    @staticmethod
+    async def dispose_async_engines():
+        """Dispose the async engines of the running loop; pooled aiosqlite connections each keep a thread alive"""
+        for _, engine in async_services._engines.pop(asyncio.get_running_loop(), {}).values():
+            await engine.dispose()
+
+    def create_source(self, rows=10, name='source', user=None, **fields):
+        """A SQLite connection whose ``items`` table holds ``rows`` rows (``id``, ``name``, ``value``)"""
+        path = self.source_dir / f'{name}.sqlite3'
+        with sqlite3.connect(path) as db:
+            db.execute('DROP TABLE IF EXISTS items')
+            db.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, value REAL)')
+            db.executemany(
+                'INSERT INTO items VALUES (?, ?, ?)',
+                [(index, f'item {index}', index * 1.5) for index in range(1, rows + 1)]
+            )
+        db.close()
+
+        connection = Connection.objects.create(
+            name=name, type='sqlite', database=str(path), user=user or self.user, **fields
+        )
+        self.addCleanup(dispose_connection_engine, connection.pk)
+        return connection
+
+    def create_query(self, connection, sql='SELECT id, name, value FROM items ORDER BY id', **fields):
+        return Query.objects.create(
+            name='Items', sql=sql, connection=connection, user=connection.user, **fields
+        )
@@ -0,0 +1,236 @@
+import gzip
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from prometheus_client import REGISTRY
+
+from . import compression
+from .cache import LRUFileBasedCache
+from .compression import CompressionMiddleware, choose_encoding
+from .testing import VizlyTestCase
+
+
+class LRUFileBasedCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.cache = self.create_cache()
+
+    def create_cache(self, **options):
+        return LRUFileBasedCache(self.dir, {'OPTIONS': options})
+
+    def age(self, key, seconds):
+        then = time.time() - seconds
+        os.utime(self.cache._key_to_file(key), (then, then))
+
+    def expiry(self, key):
+        with open(self.cache._key_to_file(key), 'rb') as f:
+            return pickle.load(f)
+
+    def test_add_is_atomic_across_handles(self):
+        # Each call gets its own cache instance, as separate workers would
+        with ThreadPoolExecutor(8) as executor:
+            added = list(executor.map(lambda _: self.create_cache().add('lock', 'token', 30), range(16)))
+        self.assertEqual(added.count(True), 1)
+
+    def test_add_replaces_an_expired_entry(self):
+        self.cache.set('lock', 'old', 30)
+        self.cache.set('lock', 'old', -1)
+        self.assertTrue(self.cache.add('lock', 'new', 30))
+        self.assertEqual(self.cache.get('lock'), 'new')
+
+    def test_incr_is_atomic_across_handles(self):
+        self.cache.add('counter', 0, 30)
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda _: self.create_cache().incr('counter'), range(200)))
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_incr_keeps_the_expiry(self):
+        self.cache.set('counter', 1, 30)
+        expiry = self.expiry('counter')
+        self.assertEqual(self.cache.decr('counter'), 0)
+        self.assertAlmostEqual(self.expiry('counter'), expiry, delta=1)
+
+    def test_incr_of_a_missing_key_raises(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('expired', 1, -1)
+        with self.assertRaises(ValueError):
+            self.cache.incr('expired')
+
+    def test_cull_evicts_the_least_recently_used(self):
+        cache = self.create_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        for index, key in enumerate(['a', 'b', 'c']):
+            cache.set(key, key)
+            self.age(key, 100 - index)
+        cache.get('a')
+
+        cache.set('d', 'd')
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']), {'a': 'a', 'c': 'c', 'd': 'd'})
+
+    def test_cull_evicts_expired_entries_first(self):
+        cache = self.create_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        for index, key in enumerate(['a', 'b']):
+            cache.set(key, key)
+            self.age(key, 100 - index)
+        cache.set('c', 'c', -1)
+
+        cache.set('d', 'd')
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']), {'a': 'a', 'b': 'b', 'd': 'd'})
+
+
+class MetricsTests(VizlyTestCase):
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_execute_is_measured(self):
+        query = self.create_query(self.create_source())
+        request_labels = {'view': 'QueryViewSet.execute', 'method': 'POST', 'status': '200'}
+        requests = self.sample('vizly_http_request_duration_seconds_count', **request_labels)
+        executions = self.sample('vizly_query_duration_seconds_count', connection_type='sqlite', source='execute')
+        rows = self.sample('vizly_query_rows_fetched_total', connection_type='sqlite')
+
+        self.client.post(f'/api/queries/{query.id}/execute/', {}, format='json')
+        # Cache hits don't reach the database
+        self.client.post(f'/api/queries/{query.id}/execute/', {}, format='json')
+
+        self.assertEqual(self.sample('vizly_http_request_duration_seconds_count', **request_labels), requests + 2)
+        self.assertEqual(
+            self.sample('vizly_query_duration_seconds_count', connection_type='sqlite', source='execute'),
+            executions + 1
+        )
+        self.assertEqual(self.sample('vizly_query_rows_fetched_total', connection_type='sqlite'), rows + 10)
+
+    def test_exposition(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE vizly_query_duration_seconds histogram', response.content)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+
+@override_settings(COMPRESSION_ENCODINGS=['br', 'gzip'], COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = json.dumps([{'id': index, 'name': f'item {index}'} for index in range(50)]).encode()
+
+    def respond(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, body=body, **headers):
+        return HttpResponse(body, content_type='application/json', headers=headers)
+
+    def test_negotiation(self):
+        for accept_encoding, encoding in (
+            ('gzip', 'gzip'),
+            ('GZIP;q=0.5', 'gzip'),
+            ('gzip;q=1, br;q=0.5', 'gzip'),
+            ('br;q=0, gzip', 'gzip'),
+            ('*;q=0.5, br;q=0', 'gzip'),
+            ('identity', None),
+            ('gzip;q=0', None),
+            ('*;q=0', None),
+            ('', None),
+        ):
+            with self.subTest(accept_encoding=accept_encoding):
+                self.assertEqual(choose_encoding(accept_encoding), encoding)
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        self.assertEqual(choose_encoding('gzip, br'), 'br')
+        response = self.respond(self.json_response(), 'gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), self.body)
+
+    def test_gzip(self):
+        response = self.respond(self.json_response())
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_identity_still_varies(self):
+        response = self.respond(self.json_response(), 'identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, self.body)
+
+    def test_left_as_is(self):
+        for response in (
+            self.json_response(b'{}'),  # Below COMPRESSION_MIN_SIZE
+            self.json_response(**{'Content-Encoding': 'br'}),
+            self.json_response(**{'Cache-Control': 'no-transform'}),
+            HttpResponse(self.body, content_type='image/png'),
+        ):
+            with self.subTest(response=response):
+                content = response.content
+                response = self.respond(response)
+                self.assertEqual(response.content, content)
+                self.assertNotEqual(response.get('Content-Encoding'), 'gzip')
+                self.assertFalse(response.has_header('Vary'))
+
+    def test_etag_suffix(self):
+        response = self.respond(self.json_response(ETag='"abc"'))
+        self.assertEqual(response['ETag'], '"abc-gzip"')
+        self.assertEqual(compression.strip_encoding_suffix(response['ETag']), '"abc"')
+
+        # Weak ETags don't promise byte-identical bodies, so they stay as they are
+        response = self.respond(self.json_response(ETag='W/"abc"'))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    def test_streams_are_flushed_per_chunk(self):
+        lines = [json.dumps({'row': index}).encode() + b'\n' for index in range(3)]
+        response = self.respond(StreamingHttpResponse(iter(lines), content_type='application/x-ndjson'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        decompressor = zlib.decompressobj(31)
+        chunks = list(response.streaming_content)
+        # Each line can be decoded as soon as its chunk arrives
+        self.assertEqual([decompressor.decompress(chunk) for chunk in chunks[:3]], lines)
+        self.assertEqual(decompressor.decompress(chunks[3]) + decompressor.flush(), b'')
+
+
+@override_settings(COMPRESSION_ENCODINGS=['gzip'], COMPRESSION_MIN_SIZE=100, QUERY_STREAM_BATCH_SIZE=20)
+class CompressedResponseTests(VizlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.query = self.create_query(self.create_source(rows=50))
+
+    def execute(self, path='execute', **headers):
+        return self.client.post(f'/api/queries/{self.query.id}/{path}/', {}, format='json', **headers)
+
+    def test_compressed_results_revalidate(self):
+        plain = self.execute()
+        response = self.execute(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = json.loads(gzip.decompress(response.content))['data']['rows']
+        self.assertEqual(rows, plain.data['data']['rows'])
+        self.assertEqual(response['ETag'], plain['ETag'][:-1] + '-gzip"')
+
+        response = self.execute(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], plain['ETag'][:-1] + '-gzip"')
+        # The uncompressed representation matches too
+        self.assertEqual(self.execute(HTTP_IF_NONE_MATCH=plain['ETag']).status_code, 304)
+
+    def test_ndjson_stream(self):
+        response = self.execute('stream', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        frames = [json.loads(line) for line in lines]
+        self.assertEqual(sum(len(frame.get('rows', [])) for frame in frames), 50)
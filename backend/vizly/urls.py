@@ -7,6 +7,8 @@ from django.http import JsonResponse
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 
 def health_check(request):
     """Health check endpoint"""
@@ -19,6 +21,7 @@ def health_check(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('health/', health_check),
+    path('metrics', metrics_view),
     path('api/auth/', include('api.urls')),
     path('api/connections/', include('connections.urls')),
     path('api/queries/', include('queries.urls')),
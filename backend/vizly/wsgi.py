@@ -9,3 +9,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vizly.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.SCHEDULER_IN_PROCESS:
+    from queries.scheduler import start_scheduler_thread
+    start_scheduler_thread()
@@ -0,0 +1,21 @@
+interface LoadMoreButtonProps {
+  onClick: () => void;
+  loading: boolean;
+}
+
+const LoadMoreButton = ({ onClick, loading }: LoadMoreButtonProps) => {
+  return (
+    <div className="px-4 py-3 border-t border-gray-200 dark:border-gray-700 text-center">
+      <button
+        type="button"
+        onClick={onClick}
+        disabled={loading}
+        className="inline-flex items-center gap-2 px-4 py-2 border border-gray-300 dark:border-gray-600 rounded-md shadow-sm text-sm font-medium text-gray-700 dark:text-gray-300 bg-white dark:bg-gray-700 hover:bg-gray-50 dark:hover:bg-gray-600 disabled:opacity-50"
+      >
+        {loading ? 'Loading...' : 'Load more'}
+      </button>
+    </div>
+  );
+};
+
+export default LoadMoreButton;
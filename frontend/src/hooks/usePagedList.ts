@@ -0,0 +1,51 @@
+import { useCallback, useState } from 'react';
+import toast from 'react-hot-toast';
+import { Page } from '../types';
+
+// <select> option value that asks for the next page of options
+export const LOAD_MORE_OPTION = '__load_more__';
+
+// A cursor-paginated list: `load` fetches the first page, `loadMore` the one after the last loaded
+export const usePagedList = <T>(
+  fetchPage: (cursor?: string | null) => Promise<Page<T>>,
+  errorMessage: string
+) => {
+  const [items, setItems] = useState<T[]>([]);
+  const [next, setNext] = useState<string | null>(null);
+  const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const load = useCallback(async () => {
+    try {
+      setLoading(true);
+      const page = await fetchPage();
+      setItems(page.items);
+      setNext(page.next);
+      return page.items;
+    } catch (error: any) {
+      toast.error(error.response?.data?.message || errorMessage);
+      setItems([]);
+      setNext(null);
+      return [];
+    } finally {
+      setLoading(false);
+    }
+  }, [fetchPage, errorMessage]);
+
+  const loadMore = useCallback(async () => {
+    if (!next) return;
+
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage(next);
+      setItems(items => [...items, ...page.items]);
+      setNext(page.next);
+    } catch (error: any) {
+      toast.error(error.response?.data?.message || errorMessage);
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [fetchPage, errorMessage, next]);
+
+  return { items, next, loading, loadingMore, load, loadMore };
+};
@@ -4,12 +4,15 @@ import toast from 'react-hot-toast';
 import Modal from '../components/Modal';
 import Table from '../components/Table';
 import Spinner from '../components/Spinner';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { Connection } from '../types';
 import { connectionsAPI } from '../services/connections';
+import { usePagedList } from '../hooks/usePagedList';
 
 const ConnectionsPage = () => {
-  const [connections, setConnections] = useState<Connection[]>([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: connections, next, loading, loadingMore, load: loadConnections, loadMore,
+  } = usePagedList(connectionsAPI.list, 'Failed to load connections');
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [editingConnection, setEditingConnection] = useState<Connection | null>(null);
   const [testingId, setTestingId] = useState<string | null>(null);
@@ -29,18 +32,6 @@ const ConnectionsPage = () => {
     loadConnections();
   }, []);
 
-  const loadConnections = async () => {
-    try {
-      setLoading(true);
-      const data = await connectionsAPI.getAll();
-      setConnections(data);
-    } catch (error: any) {
-      toast.error(error.response?.data?.message || 'Failed to load connections');
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     try {
@@ -204,6 +195,7 @@ const ConnectionsPage = () => {
           loading={loading}
           emptyMessage="No database connections yet. Add your first connection to get started."
         />
+        {next && <LoadMoreButton onClick={loadMore} loading={loadingMore} />}
       </div>
 
       <Modal
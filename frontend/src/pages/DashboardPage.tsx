@@ -4,12 +4,15 @@ import { Link } from 'react-router-dom';
 import toast from 'react-hot-toast';
 import Modal from '../components/Modal';
 import Table from '../components/Table';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { Dashboard } from '../types';
 import { dashboardsAPI } from '../services/dashboards';
+import { usePagedList } from '../hooks/usePagedList';
 
 const DashboardPage = () => {
-  const [dashboards, setDashboards] = useState<Dashboard[]>([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: dashboards, next, loading, loadingMore, load: loadDashboards, loadMore,
+  } = usePagedList(dashboardsAPI.list, 'Failed to load dashboards');
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [editingDashboard, setEditingDashboard] = useState<Dashboard | null>(null);
 
@@ -23,19 +26,6 @@ const DashboardPage = () => {
     loadDashboards();
   }, []);
 
-  const loadDashboards = async () => {
-    try {
-      setLoading(true);
-      const data = await dashboardsAPI.getAll();
-      setDashboards(Array.isArray(data) ? data : []);
-    } catch (error: any) {
-      toast.error(error.response?.data?.message || 'Failed to load dashboards');
-      setDashboards([]);
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     try {
@@ -258,6 +248,7 @@ const DashboardPage = () => {
           loading={loading}
           emptyMessage="No dashboards yet. Create your first dashboard to get started."
         />
+        {next && <LoadMoreButton onClick={loadMore} loading={loadingMore} />}
       </div>
 
       <Modal
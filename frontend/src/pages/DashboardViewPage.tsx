@@ -6,10 +6,11 @@ import { LineChart, Line, BarChart, Bar, PieChart, Pie, AreaChart, Area, Scatter
 import toast from 'react-hot-toast';
 import Modal from '../components/Modal';
 import Spinner from '../components/Spinner';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { Dashboard, Visualization } from '../types';
 import { dashboardsAPI } from '../services/dashboards';
 import { visualizationsAPI } from '../services/visualizations';
-import { queriesAPI } from '../services/queries';
+import { usePagedList } from '../hooks/usePagedList';
 import 'react-grid-layout/css/styles.css';
 import 'react-resizable/css/styles.css';
 
@@ -20,7 +21,11 @@ const DashboardViewPage = () => {
   const { id } = useParams<{ id: string }>();
   const navigate = useNavigate();
   const [dashboard, setDashboard] = useState<Dashboard | null>(null);
-  const [visualizations, setVisualizations] = useState<Visualization[]>([]);
+  const {
+    items: visualizations, next, loadingMore, load: loadVisualizations, loadMore,
+  } = usePagedList(visualizationsAPI.list, 'Failed to load visualizations');
+  // Visualizations on the dashboard, which may be on pages of the list not loaded yet
+  const [tileVisualizations, setTileVisualizations] = useState<Record<string, Visualization>>({});
   const [loading, setLoading] = useState(true);
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [selectedVisualizations, setSelectedVisualizations] = useState<string[]>([]);
@@ -56,35 +61,58 @@ const DashboardViewPage = () => {
     }
   };
 
-  const loadVisualizations = async () => {
-    try {
-      const data = await visualizationsAPI.getAll();
-      setVisualizations(data);
-    } catch (error: any) {
-      toast.error(error.response?.data?.message || 'Failed to load visualizations');
-    }
+  const findVisualization = (vizId: string) =>
+    tileVisualizations[vizId] || visualizations.find(v => v.id === vizId);
+
+  const loadTileVisualizations = async (vizIds: string[]) => {
+    const loaded = await Promise.all(vizIds.map(async vizId => {
+      try {
+        return await visualizationsAPI.getById(vizId);
+      } catch (error: any) {
+        console.error('Failed to load visualization:', error);
+        return null;
+      }
+    }));
+    setTileVisualizations(current => {
+      const updated = { ...current };
+      loaded.forEach(viz => {
+        if (viz) updated[viz.id] = viz;
+      });
+      return updated;
+    });
   };
 
-  const loadVisualizationData = async (vizId: string) => {
+  useEffect(() => {
+    const missing = layout.map(item => item.i).filter(vizId => !findVisualization(vizId));
+    if (missing.length) {
+      loadTileVisualizations(missing);
+    }
+  }, [layout]);
+
+  const loadDashboardData = async () => {
     try {
-      const viz = visualizations.find(v => v.id === vizId);
-      if (viz) {
-        const result = await queriesAPI.execute(viz.queryId);
-        setVizData(prev => ({ ...prev, [vizId]: result }));
-      }
+      // One request for every tile; tiles sharing a query run it once
+      const tiles = await dashboardsAPI.getData(id!);
+      const data: Record<string, any> = {};
+      tiles.forEach(tile => {
+        if (tile.error) {
+          console.error('Failed to load visualization data:', tile.error);
+        } else {
+          data[tile.visualization] = tile.data;
+        }
+      });
+      setVizData(data);
     } catch (error: any) {
-      console.error('Failed to load visualization data:', error);
+      console.error('Failed to load dashboard data:', error);
     }
   };
 
   useEffect(() => {
     // Load data for all visualizations in the dashboard
-    if (dashboard?.items) {
-      dashboard.items.forEach(item => {
-        loadVisualizationData(item.visualizationId);
-      });
+    if (dashboard?.items?.length) {
+      loadDashboardData();
     }
-  }, [dashboard, visualizations]);
+  }, [dashboard]);
 
   const handleAddVisualizations = async () => {
     if (selectedVisualizations.length === 0) {
@@ -249,10 +277,7 @@ const DashboardViewPage = () => {
     );
   }
 
-  const dashboardVisualizations = layout.map(item => {
-    const viz = visualizations.find(v => v.id === item.i);
-    return viz;
-  }).filter(Boolean) as Visualization[];
+  const dashboardVisualizations = layout.map(item => findVisualization(item.i)).filter(Boolean) as Visualization[];
 
   return (
     <div className="px-4 py-6 sm:px-0">
@@ -375,11 +400,12 @@ const DashboardViewPage = () => {
                       {viz.name}
                     </p>
                     <p className="text-xs text-gray-500 dark:text-gray-400">
-                      {viz.type} • {viz.query?.name}
+                      {viz.type} • {viz.query_details?.name}
                     </p>
                   </div>
                 </label>
               ))}
+              {next && <LoadMoreButton onClick={loadMore} loading={loadingMore} />}
             </div>
           )}
 
@@ -6,15 +6,24 @@ import toast from 'react-hot-toast';
 import Modal from '../components/Modal';
 import Table from '../components/Table';
 import Spinner from '../components/Spinner';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { Query, Connection, QueryResult } from '../types';
 import { queriesAPI } from '../services/queries';
 import { connectionsAPI } from '../services/connections';
+import { LOAD_MORE_OPTION, usePagedList } from '../hooks/usePagedList';
+
+const RESULT_PAGE_SIZE = 500;
 
 const QueriesPage = () => {
-  const [queries, setQueries] = useState<Query[]>([]);
-  const [connections, setConnections] = useState<Connection[]>([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: queries, next: nextQueries, loading, loadingMore: loadingMoreQueries, load: loadQueries, loadMore: loadMoreQueries,
+  } = usePagedList(queriesAPI.list, 'Failed to load queries');
+  const {
+    items: connections, next: nextConnections, loadingMore: loadingMoreConnections,
+    load: loadConnections, loadMore: loadMoreConnections,
+  } = usePagedList(connectionsAPI.list, 'Failed to load connections');
   const [executing, setExecuting] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [editingQuery, setEditingQuery] = useState<Query | null>(null);
   const [selectedConnectionId, setSelectedConnectionId] = useState<string>('');
@@ -33,21 +42,25 @@ const QueriesPage = () => {
   }, []);
 
   const loadData = async () => {
-    try {
-      setLoading(true);
-      const [queriesData, connectionsData] = await Promise.all([
-        queriesAPI.getAll(),
-        connectionsAPI.getAll(),
-      ]);
-      setQueries(queriesData);
-      setConnections(connectionsData);
-      if (connectionsData.length > 0 && !selectedConnectionId) {
-        setSelectedConnectionId(connectionsData[0].id);
-      }
-    } catch (error: any) {
-      toast.error(error.response?.data?.message || 'Failed to load data');
-    } finally {
-      setLoading(false);
+    const [, connectionsData] = await Promise.all([loadQueries(), loadConnections()]);
+    if (connectionsData.length > 0 && !selectedConnectionId) {
+      setSelectedConnectionId(connectionsData[0].id);
+    }
+  };
+
+  // Saved queries can use connections from pages not loaded yet
+  const connectionOptions = [
+    ...connections,
+    ...queries
+      .map(query => query.connection_details)
+      .filter((conn): conn is Connection => !!conn && !connections.some(c => c.id === conn.id)),
+  ].filter((conn, index, all) => all.findIndex(c => c.id === conn.id) === index);
+
+  const selectConnection = (value: string, select: (id: string) => void) => {
+    if (value === LOAD_MORE_OPTION) {
+      loadMoreConnections();
+    } else {
+      select(value);
     }
   };
 
@@ -64,9 +77,9 @@ const QueriesPage = () => {
 
     try {
       setExecuting(true);
-      const result = await queriesAPI.executeRaw(selectedConnectionId, sqlCode);
+      const result = await queriesAPI.executeRaw(selectedConnectionId, sqlCode, { page_size: RESULT_PAGE_SIZE });
       setQueryResult(result);
-      toast.success(`Query executed successfully. ${result.rowCount} rows returned.`);
+      toast.success(`Query executed successfully. ${result.rowCount}${result.nextCursor ? '+' : ''} rows returned.`);
     } catch (error: any) {
       toast.error(error.response?.data?.message || 'Query execution failed');
       setQueryResult(null);
@@ -75,6 +88,27 @@ const QueriesPage = () => {
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!queryResult?.nextCursor) return;
+
+    try {
+      setLoadingMore(true);
+      const page = await queriesAPI.executeRaw(selectedConnectionId, sqlCode, {
+        page_size: RESULT_PAGE_SIZE,
+        cursor: queryResult.nextCursor,
+      });
+      setQueryResult({
+        ...page,
+        rows: [...queryResult.rows, ...page.rows],
+        rowCount: queryResult.rowCount + page.rowCount,
+      });
+    } catch (error: any) {
+      toast.error(error.response?.data?.message || 'Failed to load more rows');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSave = () => {
     if (!selectedConnectionId) {
       toast.error('Please select a database connection');
@@ -101,7 +135,7 @@ const QueriesPage = () => {
       }
       setIsModalOpen(false);
       resetForm();
-      loadData();
+      loadQueries();
     } catch (error: any) {
       toast.error(error.response?.data?.message || 'Failed to save query');
     }
@@ -131,7 +165,7 @@ const QueriesPage = () => {
     try {
       await queriesAPI.delete(id);
       toast.success('Query deleted successfully');
-      loadData();
+      loadQueries();
     } catch (error: any) {
       toast.error(error.response?.data?.message || 'Failed to delete query');
     }
@@ -209,15 +243,20 @@ const QueriesPage = () => {
             <div className="flex items-center gap-3">
               <select
                 value={selectedConnectionId}
-                onChange={(e) => setSelectedConnectionId(e.target.value)}
+                onChange={(e) => selectConnection(e.target.value, setSelectedConnectionId)}
                 className="px-3 py-2 border border-gray-300 dark:border-gray-600 rounded-md shadow-sm focus:ring-blue-500 focus:border-blue-500 dark:bg-gray-700 dark:text-white"
               >
                 <option value="">Select Connection</option>
-                {connections.map((conn) => (
+                {connectionOptions.map((conn) => (
                   <option key={conn.id} value={conn.id}>
                     {conn.name}
                   </option>
                 ))}
+                {nextConnections && (
+                  <option value={LOAD_MORE_OPTION}>
+                    {loadingMoreConnections ? 'Loading...' : 'Load more connections...'}
+                  </option>
+                )}
               </select>
               <button
                 onClick={handleSave}
@@ -255,7 +294,7 @@ const QueriesPage = () => {
         <div className="bg-white dark:bg-gray-800 shadow overflow-hidden sm:rounded-lg">
           <div className="px-4 py-5 sm:px-6 border-b border-gray-200 dark:border-gray-700">
             <h3 className="text-lg font-medium text-gray-900 dark:text-white">
-              Results ({queryResult.rowCount} rows)
+              Results ({queryResult.rowCount}{queryResult.nextCursor ? '+' : ''} rows)
             </h3>
           </div>
           <div className="overflow-x-auto">
@@ -265,6 +304,17 @@ const QueriesPage = () => {
               emptyMessage="No results"
             />
           </div>
+          {queryResult.nextCursor && (
+            <div className="px-4 py-3 border-t border-gray-200 dark:border-gray-700 text-center">
+              <button
+                onClick={handleLoadMore}
+                disabled={loadingMore}
+                className="inline-flex items-center gap-2 px-4 py-2 border border-gray-300 dark:border-gray-600 rounded-md shadow-sm text-sm font-medium text-gray-700 dark:text-gray-300 bg-white dark:bg-gray-700 hover:bg-gray-50 dark:hover:bg-gray-600 disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       )}
 
@@ -281,6 +331,7 @@ const QueriesPage = () => {
           loading={loading}
           emptyMessage="No saved queries yet. Create your first query to explore your data."
         />
+        {nextQueries && <LoadMoreButton onClick={loadMoreQueries} loading={loadingMoreQueries} />}
       </div>
 
       {/* Save Query Modal */}
@@ -327,15 +378,20 @@ const QueriesPage = () => {
             <select
               required
               value={formData.connection}
-              onChange={(e) => setFormData({ ...formData, connection: e.target.value })}
+              onChange={(e) => selectConnection(e.target.value, connection => setFormData({ ...formData, connection }))}
               className="w-full px-3 py-2 border border-gray-300 dark:border-gray-600 rounded-md shadow-sm focus:ring-blue-500 focus:border-blue-500 dark:bg-gray-700 dark:text-white"
             >
               <option value="">Select Connection</option>
-              {connections.map((conn) => (
+              {connectionOptions.map((conn) => (
                 <option key={conn.id} value={conn.id}>
                   {conn.name}
                 </option>
               ))}
+              {nextConnections && (
+                <option value={LOAD_MORE_OPTION}>
+                  {loadingMoreConnections ? 'Loading...' : 'Load more connections...'}
+                </option>
+              )}
             </select>
           </div>
 
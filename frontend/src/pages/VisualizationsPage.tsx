@@ -5,9 +5,11 @@ import Modal from '../components/Modal';
 import Table from '../components/Table';
 import ChartRenderer from '../components/ChartRenderer';
 import AdvancedTable from '../components/AdvancedTable';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { Visualization, Query } from '../types';
 import { visualizationsAPI } from '../services/visualizations';
 import { queriesAPI } from '../services/queries';
+import { LOAD_MORE_OPTION, usePagedList } from '../hooks/usePagedList';
 
 const CHART_TYPES = [
   { value: 'table', label: 'Table', category: 'Table' },
@@ -35,9 +37,12 @@ const CHART_TYPES = [
 ];
 
 const VisualizationsPage = () => {
-  const [visualizations, setVisualizations] = useState<Visualization[]>([]);
-  const [queries, setQueries] = useState<Query[]>([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: visualizations, next, loading, loadingMore, load: loadVisualizations, loadMore,
+  } = usePagedList(visualizationsAPI.list, 'Failed to load visualizations');
+  const {
+    items: queries, next: nextQueries, loadingMore: loadingMoreQueries, load: loadQueries, loadMore: loadMoreQueries,
+  } = usePagedList(queriesAPI.list, 'Failed to load queries');
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [isViewModalOpen, setIsViewModalOpen] = useState(false);
   const [editingVisualization, setEditingVisualization] = useState<Visualization | null>(null);
@@ -52,26 +57,17 @@ const VisualizationsPage = () => {
   });
 
   useEffect(() => {
-    loadData();
+    loadVisualizations();
+    loadQueries();
   }, []);
 
-  const loadData = async () => {
-    try {
-      setLoading(true);
-      const [visualizationsData, queriesData] = await Promise.all([
-        visualizationsAPI.getAll(),
-        queriesAPI.getAll(),
-      ]);
-      setVisualizations(Array.isArray(visualizationsData) ? visualizationsData : []);
-      setQueries(Array.isArray(queriesData) ? queriesData : []);
-    } catch (error: any) {
-      toast.error(error.response?.data?.message || 'Failed to load data');
-      setVisualizations([]);
-      setQueries([]);
-    } finally {
-      setLoading(false);
-    }
-  };
+  // Saved visualizations can use queries from pages not loaded yet
+  const queryOptions = [
+    ...queries,
+    ...visualizations
+      .map(viz => viz.query_details)
+      .filter((query): query is Query => !!query && !queries.some(q => q.id === query.id)),
+  ].filter((query, index, all) => all.findIndex(q => q.id === query.id) === index);
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -100,7 +96,7 @@ const VisualizationsPage = () => {
       }
       setIsModalOpen(false);
       resetForm();
-      loadData();
+      loadVisualizations();
     } catch (error: any) {
       toast.error(error.response?.data?.message || 'Failed to save visualization');
     }
@@ -120,7 +116,7 @@ const VisualizationsPage = () => {
   const handleView = async (visualization: Visualization) => {
     try {
       setViewingVisualization(visualization);
-      const result = await queriesAPI.execute(visualization.query);
+      const result = await visualizationsAPI.getData(visualization.id, undefined, window.innerWidth);
       setQueryResult(result);
       setIsViewModalOpen(true);
     } catch (error: any) {
@@ -134,7 +130,7 @@ const VisualizationsPage = () => {
     try {
       await visualizationsAPI.delete(id);
       toast.success('Visualization deleted successfully');
-      loadData();
+      loadVisualizations();
     } catch (error: any) {
       toast.error(error.response?.data?.message || 'Failed to delete visualization');
     }
@@ -253,6 +249,7 @@ const VisualizationsPage = () => {
           loading={loading}
           emptyMessage="No visualizations yet. Create charts and graphs from your query results."
         />
+        {next && <LoadMoreButton onClick={loadMore} loading={loadingMore} />}
       </div>
 
       {/* Create/Edit Modal */}
@@ -308,15 +305,26 @@ const VisualizationsPage = () => {
             <select
               required
               value={formData.query}
-              onChange={(e) => setFormData({ ...formData, query: e.target.value })}
+              onChange={(e) => {
+                if (e.target.value === LOAD_MORE_OPTION) {
+                  loadMoreQueries();
+                } else {
+                  setFormData({ ...formData, query: e.target.value });
+                }
+              }}
               className="w-full px-3 py-2 border border-gray-300 dark:border-gray-600 rounded-md shadow-sm focus:ring-purple-500 focus:border-purple-500 dark:bg-gray-700 dark:text-white"
             >
               <option value="">Select Query</option>
-              {queries.map((query) => (
+              {queryOptions.map((query) => (
                 <option key={query.id} value={query.id}>
                   {query.name}
                 </option>
               ))}
+              {nextQueries && (
+                <option value={LOAD_MORE_OPTION}>
+                  {loadingMoreQueries ? 'Loading...' : 'Load more queries...'}
+                </option>
+              )}
             </select>
           </div>
 
@@ -1,5 +1,6 @@
 import axios from 'axios';
 import { useAuthStore } from '../stores/authStore';
+import { Page } from '../types';
 
 const api = axios.create({
   baseURL: '/api',
@@ -27,4 +28,21 @@ api.interceptors.response.use(
   }
 );
 
+export const LIST_PAGE_SIZE = 50;
+
+// List endpoints are cursor-paginated; `next` is the cursor of the page after this one
+export const getPage = async <T>(
+  path: string,
+  key: string,
+  cursor?: string | null,
+  params?: Record<string, any>
+): Promise<Page<T>> => {
+  const response = await api.get(path, { params: { ...params, cursor, page_size: LIST_PAGE_SIZE } });
+  const data = response.data.data;
+  return {
+    items: data[key],
+    next: data.next ? new URL(data.next).searchParams.get('cursor') : null,
+  };
+};
+
 export default api;
@@ -1,10 +1,9 @@
-import api from './api';
-import { Connection } from '../types';
+import api, { getPage } from './api';
+import { Connection, SchemaMatch, SchemaSnapshot, Page } from '../types';
 
 export const connectionsAPI = {
-  getAll: async (): Promise<Connection[]> => {
-    const response = await api.get('/connections/');
-    return response.data.data?.connections || response.data;
+  list: async (cursor?: string | null): Promise<Page<Connection>> => {
+    return getPage<Connection>('/connections/', 'connections', cursor);
   },
 
   getById: async (id: string): Promise<Connection> => {
@@ -30,4 +29,14 @@ export const connectionsAPI = {
     const response = await api.post(`/connections/${id}/test/`);
     return response.data.data || response.data;
   },
+
+  getSchema: async (id: string, refresh = false): Promise<SchemaSnapshot> => {
+    const response = await api.get(`/connections/${id}/schema/`, { params: refresh ? { refresh: true } : {} });
+    return response.data.data.schema;
+  },
+
+  searchSchema: async (id: string, q: string, limit = 50): Promise<SchemaMatch[]> => {
+    const response = await api.get(`/connections/${id}/schema/`, { params: { q, limit } });
+    return response.data.data.matches;
+  },
 };
@@ -1,10 +1,9 @@
-import api from './api';
-import { Dashboard } from '../types';
+import api, { getPage } from './api';
+import { Dashboard, DashboardTileData, Page } from '../types';
 
 export const dashboardsAPI = {
-  getAll: async (): Promise<Dashboard[]> => {
-    const response = await api.get('/dashboards/');
-    return response.data.data?.dashboards || response.data;
+  list: async (cursor?: string | null): Promise<Page<Dashboard>> => {
+    return getPage<Dashboard>('/dashboards/', 'dashboards', cursor);
   },
 
   getById: async (id: string): Promise<Dashboard> => {
@@ -25,4 +24,9 @@ export const dashboardsAPI = {
   delete: async (id: string): Promise<void> => {
     await api.delete(`/dashboards/${id}/`);
   },
+
+  getData: async (id: string, params?: Record<string, any>): Promise<DashboardTileData[]> => {
+    const response = await api.post(`/dashboards/${id}/data/`, { params });
+    return response.data.data.items;
+  },
 };
@@ -1,10 +1,9 @@
-import api from './api';
-import { Query, QueryResult } from '../types';
+import api, { getPage } from './api';
+import { Query, QueryExtract, QueryResult, QueryRunStats, PageOptions, Page } from '../types';
 
 export const queriesAPI = {
-  getAll: async (): Promise<Query[]> => {
-    const response = await api.get('/queries/');
-    return response.data.data?.queries || response.data;
+  list: async (cursor?: string | null): Promise<Page<Query>> => {
+    return getPage<Query>('/queries/', 'queries', cursor, { expand: 'connection_details' });
   },
 
   getById: async (id: string): Promise<Query> => {
@@ -26,15 +25,31 @@ export const queriesAPI = {
     await api.delete(`/queries/${id}/`);
   },
 
-  execute: async (id: string): Promise<QueryResult> => {
-    const response = await api.post(`/queries/${id}/execute/`);
+  execute: async (id: string, page?: PageOptions, params?: Record<string, any>): Promise<QueryResult> => {
+    const response = await api.post(`/queries/${id}/execute/`, { ...page, params });
     return response.data.data || response.data;
   },
 
-  executeRaw: async (connectionId: string, sql: string): Promise<QueryResult> => {
+  refreshExtract: async (id: string): Promise<QueryExtract> => {
+    const response = await api.post(`/queries/${id}/refresh_extract/`);
+    return response.data.data.extract;
+  },
+
+  getStats: async (window?: number): Promise<QueryRunStats[]> => {
+    const response = await api.get('/queries/stats/', { params: { window } });
+    return response.data.data.queries;
+  },
+
+  getQueryStats: async (id: string, window?: number): Promise<QueryRunStats | null> => {
+    const response = await api.get(`/queries/${id}/stats/`, { params: { window } });
+    return response.data.data.stats;
+  },
+
+  executeRaw: async (connectionId: string, sql: string, page?: PageOptions): Promise<QueryResult> => {
     const response = await api.post('/queries/execute_raw/', {
       connection_id: connectionId,
       sql,
+      ...page,
     });
     return response.data.data || response.data;
   },
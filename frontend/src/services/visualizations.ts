@@ -1,10 +1,9 @@
-import api from './api';
-import { Visualization } from '../types';
+import api, { getPage } from './api';
+import { Visualization, VisualizationData, Page } from '../types';
 
 export const visualizationsAPI = {
-  getAll: async (): Promise<Visualization[]> => {
-    const response = await api.get('/visualizations/');
-    return response.data.data?.visualizations || response.data;
+  list: async (cursor?: string | null): Promise<Page<Visualization>> => {
+    return getPage<Visualization>('/visualizations/', 'visualizations', cursor, { expand: 'query_details' });
   },
 
   getById: async (id: string): Promise<Visualization> => {
@@ -25,4 +24,9 @@ export const visualizationsAPI = {
   delete: async (id: string): Promise<void> => {
     await api.delete(`/visualizations/${id}/`);
   },
+
+  getData: async (id: string, params?: Record<string, any>, width?: number): Promise<VisualizationData> => {
+    const response = await api.post(`/visualizations/${id}/data/`, { params, width });
+    return response.data.data;
+  },
 };
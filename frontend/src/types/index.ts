@@ -15,21 +15,98 @@ export interface Connection {
   database: string;
   username?: string;
   ssl: boolean;
+  pool_size?: number;
+  max_overflow?: number;
+  pool_recycle?: number;
+  pool_pre_ping?: boolean;
+  statement_timeout?: number | null;
+  preflight_mode?: 'off' | 'warn' | 'limit' | 'reject';
+  preflight_max_rows?: number | null;
+  preflight_max_cost?: number | null;
+  max_concurrency?: number | null;
   createdAt: string;
   updatedAt: string;
 }
 
+export interface SchemaTable {
+  schema: string | null;
+  name: string;
+  type: 'table' | 'view';
+  rowEstimate: number | null;
+  columns: { name: string; type: string; nullable: boolean }[];
+}
+
+export interface SchemaSnapshot {
+  introspectedAt: number;
+  tables: SchemaTable[];
+}
+
+export interface SchemaMatch {
+  kind: 'table' | 'column';
+  schema: string | null;
+  table: string;
+  column?: string;
+  type?: string;
+  tableType?: 'table' | 'view';
+  rowEstimate?: number | null;
+  score: number;
+}
+
 export interface Query {
   id: string;
   name: string;
   description?: string;
   sql: string;
+  parameters?: QueryParameter[];
+  cache_ttl?: number | null;
+  statement_timeout?: number | null;
+  mode?: 'live' | 'extract';
+  extract?: QueryExtract | null;
+  refresh_interval?: number | null;
+  refresh_cron?: string;
+  last_refreshed_at?: string | null;
   connection: string;
   connection_details?: Connection;
   createdAt: string;
   updatedAt: string;
 }
 
+export interface QueryExtract {
+  id: string;
+  columns: { name: string; type: string }[];
+  row_count: number;
+  size_bytes: number;
+  refresh_duration: number;
+  refreshed_at: string;
+}
+
+export interface Distribution {
+  p50: number;
+  p95: number;
+  p99: number;
+  max: number;
+  total?: number;
+}
+
+export interface QueryRunStats {
+  queryId: string;
+  queryName: string;
+  runs: number;
+  errors: number;
+  cacheHitRate: number;
+  latencyMs: Distribution;
+  phaseMedianMs: Record<'connect' | 'execute' | 'fetch' | 'serialize', number | null>;
+  rowCount: Distribution | null;
+  payloadBytes: Distribution | null;
+}
+
+export interface QueryParameter {
+  name: string;
+  type: 'string' | 'integer' | 'float' | 'boolean' | 'date' | 'datetime';
+  default?: any;
+  required?: boolean;
+}
+
 export interface Visualization {
   id: string;
   name: string;
@@ -62,7 +139,32 @@ export interface DashboardItem {
 }
 
 export interface QueryResult {
-  columns: { name: string; dataType: number }[];
+  columns: { name: string; type: string }[];
   rows: any[];
   rowCount: number;
+  nextCursor?: string | null;
+  cache?: { hit: boolean; age: number };
+}
+
+export interface VisualizationData extends QueryResult {
+  aggregated: boolean;
+  sourceRowCount: number;
+}
+
+export interface DashboardTileData {
+  item: string;
+  visualization: string;
+  data?: VisualizationData;
+  error?: string;
+}
+
+export interface PageOptions {
+  page_size?: number;
+  cursor?: string | null;
+  order_by?: string;
+}
+
+export interface Page<T> {
+  items: T[];
+  next: string | null;
 }